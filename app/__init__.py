@@ -8,19 +8,113 @@ import os
 db = SQLAlchemy()
 login_manager = LoginManager()
 
-def create_app():
+def check_web_workers(config, workers):
+    """Refuse a per-process face index when more than one worker serves
+    requests: the other workers would keep deleted faces and miss new ones."""
+    if workers > 1 and config['FACE_INDEX_BACKEND'] != 'shared':
+        raise RuntimeError(
+            f"FACE_INDEX_BACKEND={config['FACE_INDEX_BACKEND']!r} keeps the face index in one process; "
+            f"use 'shared' with {workers} web workers."
+        )
+
+
+def create_app(config=None):
     app = Flask(__name__)
 
     # Configuration
     app.config['SECRET_KEY'] = 'supersecret'
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///../instance/smartbank.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # gunicorn worker processes; gunicorn.conf.py checks the real count
+    app.config['WEB_WORKERS'] = int(os.environ.get('WEB_CONCURRENCY', 1))
+    app.config['FACE_MATCH_TOLERANCE'] = 0.5
+    # exact and ivf keep the index in each worker's memory, which only sees
+    # that worker's enrolments and deletions; several workers need 'shared'
+    app.config['FACE_INDEX_BACKEND'] = os.environ.get('FACE_INDEX_BACKEND', 'shared')
+    app.config['FACE_STORE_DIR'] = os.environ.get('FACE_STORE_DIR', os.path.join(app.instance_path, 'face_store'))
+    app.config['FACE_INDEX_PATH'] = os.environ.get('FACE_INDEX_PATH')
+    app.config['FACE_INDEX_NLIST'] = int(os.environ.get('FACE_INDEX_NLIST', 0))
+    app.config['FACE_INDEX_NPROBE'] = int(os.environ.get('FACE_INDEX_NPROBE', 8))
+    # Face encoder processes per web worker. Every web worker starts its own
+    # pool with the dlib models loaded in each process, so the default (0)
+    # splits the CPUs between the WEB_WORKERS: cpu_count // WEB_WORKERS.
+    app.config['FACE_POOL_WORKERS'] = int(os.environ.get('FACE_POOL_WORKERS', 0))
+    app.config['FACE_POOL_MAX_PENDING'] = int(os.environ.get('FACE_POOL_MAX_PENDING', 8))
+    app.config['FACE_POOL_TIMEOUT'] = float(os.environ.get('FACE_POOL_TIMEOUT', 10))
+    app.config['FACE_WARMUP'] = os.environ.get('FACE_WARMUP') == '1'
+    app.config['FACE_MAX_IMAGE_BYTES'] = int(os.environ.get('FACE_MAX_IMAGE_BYTES', 2 * 1024 * 1024))
+    app.config['FACE_MAX_IMAGE_PIXELS'] = int(os.environ.get('FACE_MAX_IMAGE_PIXELS', 25_000_000))
+    app.config['FACE_MAX_DECODE_SIDE'] = int(os.environ.get('FACE_MAX_DECODE_SIDE', 1280))
+    app.config['FACE_DETECT_SIZE'] = int(os.environ.get('FACE_DETECT_SIZE', 320))
+
+    # Transaction history rows per page
+    app.config['TRANSACTIONS_PAGE_SIZE'] = int(os.environ.get('TRANSACTIONS_PAGE_SIZE', 50))
+    # Transaction search counts matches up to this many, then reports "more than"
+    app.config['SEARCH_COUNT_CAP'] = int(os.environ.get('SEARCH_COUNT_CAP', 1000))
+
+    # Statements: rows fetched per query, and the PDF size limit
+    app.config['STATEMENT_CHUNK_SIZE'] = int(os.environ.get('STATEMENT_CHUNK_SIZE', 1000))
+    app.config['STATEMENT_PDF_MAX_ROWS'] = int(os.environ.get('STATEMENT_PDF_MAX_ROWS', 20_000))
+
+    # Idempotency-Key replay window (seconds), front cache size, and how
+    # often a worker deletes expired keys itself
+    app.config['IDEMPOTENCY_TTL'] = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 3600))
+    app.config['IDEMPOTENCY_CACHE_SIZE'] = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10_000))
+    app.config['IDEMPOTENCY_PURGE_INTERVAL'] = int(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL', 600))
+    # Seconds after which a key reserved by a request that never finished
+    # (worker killed) is taken over by a retry; above gunicorn's timeout
+    app.config['IDEMPOTENCY_LOCK_TIMEOUT'] = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+    # Account numbers reserved per worker in one sequence UPDATE
+    app.config['ACCOUNT_NUMBER_BLOCK_SIZE'] = int(os.environ.get('ACCOUNT_NUMBER_BLOCK_SIZE', 100))
+
+    # Recipient lookups cached per worker for transfers and payouts
+    app.config['RECIPIENT_CACHE_SIZE'] = int(os.environ.get('RECIPIENT_CACHE_SIZE', 10_000))
+    app.config['RECIPIENT_CACHE_TTL'] = int(os.environ.get('RECIPIENT_CACHE_TTL', 300))
+
+    # Savings goals loaded per NumPy pass for analytics and reports
+    app.config['GOAL_PROGRESS_CHUNK_SIZE'] = int(os.environ.get('GOAL_PROGRESS_CHUNK_SIZE', 50_000))
+
+    # Loan quotes: memoized quotes per worker, and quotes (or grid cells) per API call
+    app.config['LOAN_QUOTE_CACHE_SIZE'] = int(os.environ.get('LOAN_QUOTE_CACHE_SIZE', 4096))
+    app.config['LOAN_QUOTE_MAX_BATCH'] = int(os.environ.get('LOAN_QUOTE_MAX_BATCH', 10_000))
+
+    # Terms given to loans at approval, and loan groups projected per NumPy pass
+    app.config['LOAN_DEFAULT_RATE'] = float(os.environ.get('LOAN_DEFAULT_RATE', 12.0))
+    app.config['LOAN_DEFAULT_TENURE'] = int(os.environ.get('LOAN_DEFAULT_TENURE', 12))
+    app.config['LOAN_PROJECTION_CHUNK_SIZE'] = int(os.environ.get('LOAN_PROJECTION_CHUNK_SIZE', 2000))
+
+    # Bulk payouts: rows accepted per upload
+    app.config['PAYOUT_MAX_ROWS'] = int(os.environ.get('PAYOUT_MAX_ROWS', 10_000))
+
+    # Overrides for scripts and benchmarks (e.g. a scratch database)
+    if config:
+        app.config.update(config)
+
+    check_web_workers(app.config, app.config['WEB_WORKERS'])
 
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
     migrate = Migrate(app, db)
 
+    from .face_pool import encoder_pool, pool_size
+    encoder_pool.configure(
+        workers=pool_size(app.config),
+        max_pending=app.config['FACE_POOL_MAX_PENDING'],
+        timeout=app.config['FACE_POOL_TIMEOUT'],
+        detect_size=app.config['FACE_DETECT_SIZE'],
+        max_side=app.config['FACE_MAX_DECODE_SIDE'],
+        max_pixels=app.config['FACE_MAX_IMAGE_PIXELS'],
+    )
+
+    from . import idempotency
+    idempotency.configure(app.config['IDEMPOTENCY_CACHE_SIZE'], app.config['IDEMPOTENCY_TTL'])
+    from . import recipients
+    recipients.configure(app.config['RECIPIENT_CACHE_SIZE'], app.config['RECIPIENT_CACHE_TTL'])
+    from .account_numbers import allocator
+    allocator.block_size = app.config['ACCOUNT_NUMBER_BLOCK_SIZE']
+
     # Login Manager setup
     login_manager.login_view = 'customer.login'
     login_manager.login_message_category = 'info'
@@ -37,4 +131,7 @@ def create_app():
     app.register_blueprint(customer_bp)
     app.register_blueprint(staff_bp)
 
+    from .commands import register_commands
+    register_commands(app)
+
     return app
@@ -0,0 +1,106 @@
+import os
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .models import AccountNumberSequence, db
+
+sequences = AccountNumberSequence.__table__
+SEQUENCE = "account"
+# Serials are 10 digits; with the check digit, numbers are 11 digits and
+# can never collide with the older 10-digit random or "SB" numbers.
+FIRST_SERIAL = 1_000_000_000
+
+
+def luhn_digit(digits):
+    """Luhn check digit for a string of digits."""
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if i % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_valid(number):
+    """True if `number` is an allocator-issued number with a correct check digit."""
+    return len(number) == 11 and number.isdigit() and luhn_digit(number[:-1]) == number[-1]
+
+
+# -- Allocator --
+class AccountNumberAllocator:
+    """Hands out account numbers from blocks reserved in the sequence table.
+
+    Reserving a block is one UPDATE; the numbers inside a block are then
+    handed out from memory, so creating an account costs no lookup query
+    and can never collide. Each process (gunicorn worker) holds its own
+    block; numbers left over when a worker exits are simply skipped.
+
+    The UPDATE runs in the caller's transaction, on the session's own
+    connection: a second connection would wait behind (on SQLite, fail
+    with "database is locked" on) the write lock that transaction may
+    already hold. Until that transaction commits the block belongs to it
+    alone, and a rollback gives the block up.
+    """
+
+    def __init__(self, block_size=100):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._pid = None
+        self._owner = None  # session whose uncommitted transaction reserved the block
+
+    def _reserve(self):
+        conn = db.session.connection()
+        conn.execute(
+            sequences.update()
+            .where(sequences.c.name == SEQUENCE)
+            .values(next_value=sequences.c.next_value + self.block_size)
+        )
+        end = conn.execute(
+            db.select(sequences.c.next_value).where(sequences.c.name == SEQUENCE)
+        ).scalar()
+        if end is None:
+            # Databases built with create_all() have no sequence row yet
+            end = FIRST_SERIAL + self.block_size
+            conn.execute(sequences.insert().values(name=SEQUENCE, next_value=end))
+        return end - self.block_size, end
+
+    def next(self):
+        session = db.session()
+        with self._lock:
+            usable = self._owner is None or self._owner is session
+            if self._pid != os.getpid() or self._next >= self._end or not usable:
+                self._next, self._end = self._reserve()
+                self._pid = os.getpid()
+                self._owner = session
+            serial = str(self._next)
+            self._next += 1
+        return serial + luhn_digit(serial)
+
+    def _committed(self, session):
+        with self._lock:
+            if self._owner is session:
+                self._owner = None
+
+    def _ended(self, session, transaction):
+        # Any end other than a commit (rollback, close) undid the UPDATE
+        if transaction.parent is not None:
+            return
+        with self._lock:
+            if self._owner is session:
+                self._next = self._end = 0
+                self._owner = None
+
+
+allocator = AccountNumberAllocator()
+event.listen(Session, "after_commit", allocator._committed)
+event.listen(Session, "after_transaction_end", allocator._ended)
+
+
+def next_account_number():
+    return allocator.next()
@@ -0,0 +1,133 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from flask import current_app, has_app_context
+
+# NumPy is imported inside the array functions below, so validating terms
+# with parse_terms() (and importing this module) stays cheap at start-up.
+
+MAX_TENURE = 600  # months
+MAX_RATE = 100.0  # annual percent
+
+Quote = namedtuple("Quote", "emi total_payment total_interest")
+
+
+class QuoteError(ValueError):
+    """Loan terms that cannot be quoted; the message is safe to show."""
+
+
+def parse_terms(principal, rate, tenure):
+    """(principal, annual rate %, tenure in months) from user input."""
+    try:
+        principal, rate = float(principal), float(rate)
+        tenure = int(tenure)
+    except (TypeError, ValueError):
+        raise QuoteError("Invalid input. Please enter valid numbers.")
+    if not principal > 0:
+        raise QuoteError("Loan amount must be positive.")
+    if not 0 <= rate <= MAX_RATE:
+        raise QuoteError(f"Interest rate must be between 0 and {MAX_RATE:g}%.")
+    if not 1 <= tenure <= MAX_TENURE:
+        raise QuoteError(f"Tenure must be between 1 and {MAX_TENURE} months.")
+    return principal, rate, tenure
+
+
+# -- Vectorized maths --
+# Every function takes scalars or arrays (broadcast together) of principal,
+# annual rate in percent and tenure in months. A 0% rate is an even split
+# of the principal rather than a division by zero.
+
+def emi(principal, rate, tenure):
+    import numpy as np
+    principal, rate, tenure = np.broadcast_arrays(
+        np.asarray(principal, dtype=np.float64),
+        np.asarray(rate, dtype=np.float64) / 1200.0,
+        np.asarray(tenure, dtype=np.float64),
+    )
+    growth = (1.0 + rate) ** tenure
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(rate > 0, principal * rate * growth / (growth - 1.0), principal / tenure)
+
+
+def pricing_grid(principal, rates, tenures):
+    """EMI for every (rate, tenure) pair: rows follow `rates`, columns `tenures`."""
+    import numpy as np
+    rates = np.asarray(rates, dtype=np.float64)[:, None]
+    tenures = np.asarray(tenures, dtype=np.float64)[None, :]
+    return emi(principal, rates, tenures)
+
+
+def schedules(principal, rate, tenure):
+    """Month-by-month schedules for a batch of loans.
+
+    Returns (payment, interest, principal_paid, balance) arrays shaped
+    (loans, longest tenure); months after a loan matures are zero. The
+    balance after month k is the closed form P(1+r)^k - EMI((1+r)^k - 1)/r,
+    so the whole batch is a handful of array operations.
+    """
+    import numpy as np
+    principal, rate, tenure = (np.atleast_1d(a) for a in np.broadcast_arrays(
+        np.asarray(principal, dtype=np.float64),
+        np.asarray(rate, dtype=np.float64),
+        np.asarray(tenure, dtype=np.int64),
+    ))
+    payment = emi(principal, rate, tenure)[:, None]
+    monthly = (rate / 1200.0)[:, None]
+    months = np.arange(1, int(tenure.max(initial=0)) + 1)[None, :]
+    active = months <= tenure[:, None]
+
+    growth = (1.0 + monthly) ** months
+    with np.errstate(divide="ignore", invalid="ignore"):
+        repaid = np.where(monthly > 0, payment * (growth - 1.0) / monthly, payment * months)
+    balance = np.where(active, np.maximum(principal[:, None] * growth - repaid, 0.0), 0.0)
+    balance[months == tenure[:, None]] = 0.0
+
+    opening = np.concatenate([principal[:, None], balance[:, :-1]], axis=1)
+    interest = np.where(active, opening * monthly, 0.0)
+    principal_paid = np.where(active, opening - balance, 0.0)
+    payment = principal_paid + interest
+    return payment, interest, principal_paid, balance
+
+
+def schedule(principal, rate, tenure):
+    """One loan's schedule as rows for templates and JSON."""
+    payment, interest, principal_paid, balance = (a[0].round(2).tolist() for a in schedules(principal, rate, tenure))
+    return [
+        {"month": month, "payment": p, "interest": i, "principal": pp, "balance": b}
+        for month, (p, i, pp, b) in enumerate(zip(payment, interest, principal_paid, balance), start=1)
+    ]
+
+
+# -- Quotes --
+def _quote(principal, rate, tenure):
+    monthly = float(emi(principal, rate, tenure))
+    total = monthly * tenure
+    return Quote(round(monthly, 2), round(total, 2), round(total - principal, 2))
+
+
+# Built on first use, sized from LOAN_QUOTE_CACHE_SIZE
+_cached_quote = None
+
+
+def quote(principal, rate, tenure):
+    """EMI and totals for validated terms, memoized: the same quote asked
+    for again costs a dictionary lookup."""
+    global _cached_quote
+    if _cached_quote is None:
+        size = current_app.config["LOAN_QUOTE_CACHE_SIZE"] if has_app_context() else 4096
+        _cached_quote = lru_cache(maxsize=size)(_quote)
+    return _cached_quote(round(principal, 2), round(rate, 4), tenure)
+
+
+def quotes(terms):
+    """Quotes for a list of (principal, rate, tenure), computed as one batch."""
+    if not terms:
+        return []
+    import numpy as np
+    principal, rate, tenure = (np.array(column, dtype=np.float64) for column in zip(*terms))
+    monthly = emi(principal, rate, tenure)
+    total = monthly * tenure
+    return [
+        Quote(*values)
+        for values in zip(monthly.round(2).tolist(), total.round(2).tolist(), (total - principal).round(2).tolist())
+    ]
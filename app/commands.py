@@ -0,0 +1,196 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .models import db
+
+face_cli = AppGroup("face", help="Face login maintenance.")
+
+
+@face_cli.command("reencode")
+@click.option("--chunk-size", default=1000, show_default=True, help="Rows rewritten per commit.")
+def reencode_faces(chunk_size):
+    """Rewrite pickled face encodings in the compact binary format."""
+    from .face_codec import reencode_legacy_rows
+
+    converted = 0
+    for count in reencode_legacy_rows(db.session, chunk_size):
+        db.session.commit()
+        converted += count
+    click.echo(f"Re-encoded {converted} face encodings.")
+
+
+@face_cli.command("index-build")
+def build_face_index():
+    """Rebuild the face index from the user table and persist it."""
+    from .face_index import face_index
+
+    face_index.rebuild()
+    click.echo(f"Indexed {len(face_index)} faces with the {face_index.backend.name} backend.")
+
+
+@face_cli.command("index-check")
+@click.option("--sample", default=500, show_default=True, help="Number of probe queries.")
+@click.option("--noise", default=0.02, show_default=True, help="Gaussian noise added to each probe.")
+def check_face_index(sample, noise):
+    """Measure recall and latency of the configured backend against exact search."""
+    from .face_index import face_index, measure_recall
+
+    result = measure_recall(face_index.backend, sample_size=sample, noise=noise)
+    if not result["queries"]:
+        click.echo("No enrolled faces to check.")
+        return
+    click.echo(
+        f"{face_index.backend.name}: recall {result['recall']:.3f} over {result['queries']} queries, "
+        f"median {result['backend_ms']:.3f} ms (exact {result['exact_ms']:.3f} ms)"
+    )
+
+
+payouts_cli = AppGroup("payouts", help="Bulk transfers.")
+
+
+@payouts_cli.command("run")
+@click.argument("sender_account")
+@click.argument("payout_file", type=click.File("r", encoding="utf-8-sig"))
+@click.option("--output", type=click.File("w"), default="-", help="Where to write the per-row results (CSV).")
+def run_payout_file(sender_account, payout_file, output):
+    """Pay every (recipient_account, amount) row of a CSV or JSON file from SENDER_ACCOUNT."""
+    from .models import Account
+    from .payouts import parse_csv, parse_json, results_csv, run_payouts
+
+    sender = Account.query.filter_by(account_number=sender_account).first()
+    if sender is None:
+        raise click.ClickException(f"No account {sender_account}.")
+    text = payout_file.read()
+    rows = parse_json(text) if payout_file.name.lower().endswith(".json") else parse_csv(text)
+
+    results = run_payouts(sender.user_id, rows)
+    output.write(results_csv(results))
+    posted = sum(1 for result in results if result["status"] == "posted")
+    click.echo(f"Posted {posted} of {len(results)} payouts.", err=True)
+
+
+ledger_cli = AppGroup("ledger", help="Journal and balance snapshots.")
+
+
+@ledger_cli.command("compact")
+@click.option("--chunk-size", default=1000, show_default=True, help="Account ids rolled forward per commit.")
+def compact_ledger(chunk_size):
+    """Roll balance snapshots forward to the latest journal entry."""
+    from .ledger import compact
+
+    click.echo(f"Rolled {compact(chunk_size)} snapshots forward.")
+
+
+@ledger_cli.command("verify")
+@click.option("--limit", default=50, show_default=True, help="Mismatches to list.")
+def verify_ledger(limit):
+    """List accounts whose stored balance disagrees with the journal."""
+    from .ledger import drift
+
+    rows = drift(limit)
+    for account_id, stored, journal_balance in rows:
+        click.echo(f"account {account_id}: balance {stored:.2f}, journal {journal_balance:.2f}")
+    if rows:
+        raise click.ClickException(f"{len(rows)} accounts out of balance.")
+    click.echo("All balances agree with the journal.")
+
+
+queries_cli = AppGroup("queries", help="Database query checks.")
+
+
+@queries_cli.command("check-plans")
+@click.option("--verbose", is_flag=True, help="Print every plan, not only the failing ones.")
+def check_query_plans(verbose):
+    """Fail if any hot query would scan a whole table (SQLite only)."""
+    from .query_plans import check_plans
+
+    if db.engine.dialect.name != "sqlite":
+        raise click.ClickException("EXPLAIN QUERY PLAN checks only run against SQLite.")
+    failed = 0
+    for name, results in check_plans().items():
+        scans = any(scans for _, _, scans in results)
+        if scans:
+            failed += 1
+        if scans or verbose:
+            click.echo(f"{'FAIL' if scans else 'ok  '} {name}")
+            for sql, plan, _ in results:
+                click.echo(f"       {' '.join(sql.split())}")
+                for line in plan:
+                    click.echo(f"         {line}")
+    if failed:
+        raise click.ClickException(f"{failed} queries fall back to a full table scan.")
+    click.echo("All hot queries use an index.")
+
+
+rollups_cli = AppGroup("rollups", help="Monthly account summaries.")
+
+
+@rollups_cli.command("backfill")
+@click.option("--chunk-size", default=1000, show_default=True, help="Account ids rebuilt per commit.")
+def backfill_rollups(chunk_size):
+    """Rebuild monthly_account_summary from the transaction table."""
+    from .rollups import backfill
+
+    click.echo(f"Wrote {backfill(chunk_size)} monthly summary rows.")
+
+
+idempotency_cli = AppGroup("idempotency", help="Idempotency-Key records.")
+
+
+@idempotency_cli.command("purge")
+def purge_idempotency_keys():
+    """Delete stored responses older than IDEMPOTENCY_TTL."""
+    from .idempotency import purge_expired
+
+    deleted = purge_expired(current_app.config["IDEMPOTENCY_TTL"])
+    click.echo(f"Deleted {deleted} expired idempotency keys.")
+
+
+goals_cli = AppGroup("goals", help="Savings goal progress.")
+
+
+@goals_cli.command("report")
+@click.option("--output", type=click.File("w"), default="-", help="Where to write the report (CSV).")
+def goal_report(output):
+    """Write every goal's expected savings, progress and projected completion."""
+    import csv
+
+    from .goal_progress import REPORT_COLUMNS, report_rows
+
+    writer = csv.writer(output)
+    writer.writerow(REPORT_COLUMNS)
+    written = 0
+    for row in report_rows(current_app.config["GOAL_PROGRESS_CHUNK_SIZE"]):
+        writer.writerow(row)
+        written += 1
+    click.echo(f"Reported on {written} goals.", err=True)
+
+
+@goals_cli.command("advance-locks")
+@click.option("--chunk-size", default=500, show_default=True, help="Customers refreshed per commit.")
+def advance_goal_locks(chunk_size):
+    """Recompute locked savings on accounts whose lock has come due."""
+    from .goal_progress import advance_locks
+
+    click.echo(f"Refreshed locked savings for {advance_locks(chunk_size)} customers.")
+
+
+@goals_cli.command("sweep")
+@click.option("--chunk-size", default=1000, show_default=True, help="Goals posted per commit.")
+def sweep_goal_contributions(chunk_size):
+    """Move due saving-goal contributions from accounts into their goals."""
+    from .goal_sweeps import run
+
+    sweep = run(chunk_size)
+    click.echo(f"Sweep {sweep['id']}: {sweep['goals_swept']} contributions, ₹{sweep['amount_swept']:.2f}.")
+
+
+def register_commands(app):
+    app.cli.add_command(face_cli)
+    app.cli.add_command(payouts_cli)
+    app.cli.add_command(ledger_cli)
+    app.cli.add_command(queries_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(idempotency_cli)
+    app.cli.add_command(goals_cli)
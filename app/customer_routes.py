@@ -1,9 +1,10 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_user, login_required, logout_user, current_user
 from .forms import LoginForm, RegisterForm, TransferForm, DepositForm, WithdrawForm
 from .models import User, Account
 from flask_login import login_user
 from app.utils import nocache
+from .idempotency import idempotent
 
 customer_bp = Blueprint('customer', __name__, url_prefix='/customer')
 
@@ -41,14 +42,14 @@ def logout():
     flash('Logged out successfully.', 'success')
     return redirect(url_for('customer.login'))
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_user
 from app import db
 from app.models import User, Account
-import base64, numpy as np, face_recognition, pickle
-from io import BytesIO
-from PIL import Image
-import random
+from . import ledger, posting, recipients, rollups
+from .account_numbers import next_account_number
+from .face_pool import encoder_pool, EncoderBusy
+from .face_preprocess import decode_data_url, ImageRejected
 
 @customer_bp.route('/register', methods=['GET', 'POST'])
 def register():
@@ -73,15 +74,20 @@ def register():
             return render_template("register.html", form=form)
 
         try:
-            header, encoded = face_data_url.split(",", 1)
-            img_bytes = base64.b64decode(encoded)
-            img = Image.open(BytesIO(img_bytes)).convert('RGB')
-            img_np = np.array(img)
-            face_encodings = face_recognition.face_encodings(img_np)
-            if not face_encodings:
+            img_bytes = decode_data_url(face_data_url, current_app.config["FACE_MAX_IMAGE_BYTES"])
+            face_encoding, timings = encoder_pool.encode(img_bytes)
+            current_app.logger.info(
+                "register face timings (ms): %s", ", ".join(f"{k}={v:.1f}" for k, v in timings.items())
+            )
+            if face_encoding is None:
                 flash("No face detected", "danger")
                 return render_template("register.html", form=form)
-            face_encoding = face_encodings[0]
+        except ImageRejected as e:
+            flash(str(e), "danger")
+            return render_template("register.html", form=form)
+        except EncoderBusy:
+            flash("Face capture is busy right now. Please try again in a moment.", "warning")
+            return render_template("register.html", form=form), 503
         except Exception as e:
             flash("Face processing failed", "danger")
             return render_template("register.html", form=form)
@@ -90,13 +96,15 @@ def register():
         user = User(username=username, email=email, name=full_name,
                     place=place, mobile_number=mobile_number)
         user.set_password(password)
-        user.face_encoding = pickle.dumps(face_encoding)
+        from .face_codec import encode_face
+        from .face_index import face_index
+        user.face_encoding = encode_face(face_encoding)
 
         db.session.add(user)
         db.session.commit()
+        face_index.add(user.id, face_encoding)
 
-        account_number = "SB" + str(random.randint(10000000, 99999999))
-        account = Account(user_id=user.id, account_number=account_number, balance=0.0)
+        account = Account(user_id=user.id, account_number=next_account_number(), balance=0.0)
         db.session.add(account)
         db.session.commit()
 
@@ -109,34 +117,41 @@ def register():
 @login_required
 def emi_calculator():
     emi = None
+    schedule = None
     if request.method == 'POST':
+        from . import amortization
         try:
-            principal = float(request.form['principal'])
-            rate = float(request.form['interest_rate']) / 12 / 100
-            tenure = int(request.form['tenure'])
-            emi = (principal * rate * (1 + rate) ** tenure) / ((1 + rate) ** tenure - 1)
-        except Exception:
-            flash('Invalid input. Please enter valid numbers.', 'danger')
-    return render_template('emi_calculator.html', emi=emi)
+            principal, rate, tenure = amortization.parse_terms(
+                request.form.get('principal'), request.form.get('interest_rate'), request.form.get('tenure'),
+            )
+            emi = amortization.quote(principal, rate, tenure).emi
+            schedule = amortization.schedule(principal, rate, tenure)
+        except amortization.QuoteError as e:
+            flash(str(e), 'danger')
+    return render_template('emi_calculator.html', emi=emi, schedule=schedule)
 
 @customer_bp.route('/deposit', methods=['GET', 'POST'])
 @login_required
+@idempotent
 def deposit():
     form = DepositForm()
     if form.validate_on_submit():
-        amount = float(form.amount.data)
-        account = current_user.account
+        account = posting.account_row(current_user.id)
         if account:
-            account.balance += amount
-            db.session.commit()
-            flash('Deposit successful!', 'success')
-            return redirect(url_for('customer.dashboard'))
+            try:
+                posting.deposit(account.id, current_user.id, form.amount.data)
+            except posting.PostingError as e:
+                flash(str(e), 'danger')
+            else:
+                flash('Deposit successful!', 'success')
+                return redirect(url_for('customer.dashboard'))
         else:
             flash('No account found.', 'danger')
     return render_template('deposit.html', form=form)
 
 @customer_bp.route('/withdraw', methods=['GET', 'POST'])
 @login_required
+@idempotent
 def withdraw():
     form = WithdrawForm()
     if form.validate_on_submit():
@@ -146,23 +161,15 @@ def withdraw():
 
 @customer_bp.route('/transfer', methods=['GET', 'POST'])
 @login_required
+@idempotent
 def transfer():
     form = TransferForm()
     if form.validate_on_submit():
-        recipient_acc_num = form.recipient_account.data
-        amount = float(form.amount.data)
-
-        sender_account = current_user.account
-        recipient_account = Account.query.filter_by(account_number=recipient_acc_num).first()
-
-        if not recipient_account:
-            flash("Recipient account not found.", "danger")
-        elif sender_account.balance < amount:
-            flash("Insufficient funds.", "danger")
+        try:
+            posting.transfer(current_user.id, form.recipient_account.data, form.amount.data)
+        except posting.PostingError as e:
+            flash(str(e), "danger")
         else:
-            sender_account.balance -= amount
-            recipient_account.balance += amount
-            db.session.commit()
             flash("Transfer successful!", "success")
             return redirect(url_for('customer.dashboard'))
 
@@ -172,11 +179,19 @@ def transfer():
 @login_required
 def delete_account():
     user = current_user
+    user_id = user.id
     account = user.account
+    account_number = account.account_number if account else None
     if account:
+        ledger.close([account.id])
+        rollups.forget([account.id])
         db.session.delete(account)
     db.session.delete(user)
     db.session.commit()
+    from .face_index import face_index
+    face_index.remove(user_id)
+    if account_number:
+        recipients.invalidate(account_number)
     logout_user()
     flash("Your account has been deleted.", "success")
     return redirect(url_for('main.landing'))  # or your homepage
@@ -186,22 +201,63 @@ def delete_account():
 def interest_calculator():
     result = None
     if request.method == 'POST':
+        from . import amortization
         try:
-            principal = float(request.form['principal'])
-            rate = float(request.form['rate']) / 12 / 100  # Monthly rate
-            time = int(request.form['time'])  # In months
-
-            emi = (principal * rate * pow(1 + rate, time)) / (pow(1 + rate, time) - 1)
-            total_payment = emi * time
-            total_interest = total_payment - principal
-
-            result = {
-                'emi': round(emi, 2),
-                'total_payment': round(total_payment, 2),
-                'total_interest': round(total_interest, 2)
-            }
-        except Exception as e:
-            flash("Invalid input. Please enter valid numbers.", "danger")
+            principal, rate, time = amortization.parse_terms(
+                request.form.get('principal'), request.form.get('rate'), request.form.get('time'),  # time in months
+            )
+            result = amortization.quote(principal, rate, time)._asdict()
+        except amortization.QuoteError as e:
+            flash(str(e), "danger")
 
     return render_template("interest_calculator.html", result=result)
 
+# -- Loan quote API --
+# JSON for the loan desk's quote tool. A single quote is memoized; a list
+# of terms is priced in one vectorized batch.
+@customer_bp.route('/api/loan_quote', methods=['POST'])
+@login_required
+def loan_quote_api():
+    from . import amortization
+    payload = request.get_json(silent=True)
+    batch = payload if isinstance(payload, list) else [payload]
+    if not batch or len(batch) > current_app.config['LOAN_QUOTE_MAX_BATCH']:
+        return jsonify(error=f"Send between 1 and {current_app.config['LOAN_QUOTE_MAX_BATCH']} quotes."), 400
+    try:
+        terms = [
+            amortization.parse_terms(item.get('principal'), item.get('rate'), item.get('tenure'))
+            for item in batch if isinstance(item, dict)
+        ]
+        if len(terms) != len(batch):
+            raise amortization.QuoteError("Each quote must be an object with principal, rate and tenure.")
+    except amortization.QuoteError as e:
+        return jsonify(error=str(e)), 400
+
+    if not isinstance(payload, list):
+        principal, rate, tenure = terms[0]
+        quote = amortization.quote(principal, rate, tenure)._asdict()
+        if payload.get('schedule'):
+            quote['schedule'] = amortization.schedule(principal, rate, tenure)
+        return jsonify(quote)
+    return jsonify(quotes=[quote._asdict() for quote in amortization.quotes(terms)])
+
+@customer_bp.route('/api/loan_pricing_grid', methods=['POST'])
+@login_required
+def loan_pricing_grid_api():
+    from . import amortization
+    payload = request.get_json(silent=True) or {}
+    rates, tenures = payload.get('rates'), payload.get('tenures')
+    limit = current_app.config['LOAN_QUOTE_MAX_BATCH']
+    if not isinstance(rates, list) or not isinstance(tenures, list) or not rates or not tenures:
+        return jsonify(error="rates and tenures must be non-empty lists."), 400
+    if len(rates) * len(tenures) > limit:
+        return jsonify(error=f"The grid may have at most {limit} cells."), 400
+    try:
+        principal = amortization.parse_terms(payload.get('principal'), 0, 1)[0]
+        rates = [amortization.parse_terms(principal, rate, 1)[1] for rate in rates]
+        tenures = [amortization.parse_terms(principal, 0, tenure)[2] for tenure in tenures]
+    except amortization.QuoteError as e:
+        return jsonify(error=str(e)), 400
+    grid = amortization.pricing_grid(principal, rates, tenures)
+    return jsonify(principal=principal, rates=rates, tenures=tenures, emi=grid.round(2).tolist())
+
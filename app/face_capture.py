@@ -1,34 +1,186 @@
+import argparse
+import os
+import time
+
 import cv2
-import face_recognition
-
-def capture_face_encoding():
-    video_capture = cv2.VideoCapture(0)
-    if not video_capture.isOpened():
-        print("Camera not detected.")
-        return None
-
-    print("[INFO] Capturing face. Press 'q' to cancel.")
-
-    encoding = None
-    while True:
-        ret, frame = video_capture.read()
-        if not ret:
-            break
-
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
-
-        if face_locations:
-            encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-            if encodings:
-                encoding = encodings[0]
-                print("[INFO] Face encoding captured.")
-                break
-
-        cv2.imshow('Face Authentication', frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    video_capture.release()
-    cv2.destroyAllWindows()
-    return encoding
+
+# face_recognition (dlib) is imported in the methods that use it, as in
+# face_preprocess
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+class ImageDirectorySource:
+    """Frames read from the image files of a directory, in name order,
+    behind the same read()/release() interface as cv2.VideoCapture."""
+
+    def __init__(self, path):
+        self._paths = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+        )
+        self._next = 0
+
+    def isOpened(self):
+        return bool(self._paths)
+
+    def read(self):
+        while self._next < len(self._paths):
+            frame = cv2.imread(self._paths[self._next])
+            self._next += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def release(self):
+        self._next = len(self._paths)
+
+
+def open_source(source):
+    """Camera index, video file or image directory."""
+    if isinstance(source, int) or str(source).isdigit():
+        return cv2.VideoCapture(int(source))
+    if os.path.isdir(source):
+        return ImageDirectorySource(source)
+    return cv2.VideoCapture(source)
+
+
+def _iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / (aw * ah + bw * bh - inter)
+
+
+class FaceCaptureEngine:
+    """Captures one face encoding from a stream of frames.
+
+    HOG detection runs on a downscaled frame every `detect_every` frames,
+    face or no face; in between, a face box is followed by a MIL tracker
+    on the same small frame, and frames without one are skipped. The
+    (expensive) encoding is computed once, from the full resolution frame,
+    after the box has stayed put for `stable_frames` consecutive frames.
+    """
+
+    def __init__(self, detect_every=5, scale=0.25, stable_frames=5, stable_iou=0.7, display=True):
+        self.detect_every = detect_every
+        self.scale = scale
+        self.stable_frames = stable_frames
+        self.stable_iou = stable_iou
+        self.display = display
+        self.stats = {}
+
+    def _downscale(self, frame):
+        return cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def _detect(self, small_rgb):
+        import face_recognition
+
+        locations = face_recognition.face_locations(small_rgb)
+        if not locations:
+            return None
+        top, right, bottom, left = max(locations, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+        return left, top, right - left, bottom - top
+
+    def _encode(self, frame, box):
+        import face_recognition
+
+        x, y, w, h = (int(round(v / self.scale)) for v in box)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        encodings = face_recognition.face_encodings(rgb, known_face_locations=[(y, x + w, y + h, x)])
+        return encodings[0] if encodings else None
+
+    def run(self, source, max_frames=None):
+        capture = open_source(source)
+        if not capture.isOpened():
+            print("Camera not detected.")
+            return None
+
+        stats = {"frames": 0, "detections": 0, "tracked": 0, "skipped": 0, "encodings": 0}
+        self.stats = stats
+        tracker, box, steady = None, None, 0
+        encoding = None
+        start = time.perf_counter()
+        try:
+            while max_frames is None or stats["frames"] < max_frames:
+                ret, frame = capture.read()
+                if not ret:
+                    break
+                stats["frames"] += 1
+
+                previous = box
+                if (stats["frames"] - 1) % self.detect_every == 0:
+                    stats["detections"] += 1
+                    small = self._downscale(frame)
+                    box = self._detect(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+                    tracker = None
+                    if box is not None:
+                        tracker = cv2.TrackerMIL_create()
+                        tracker.init(small, box)
+                elif tracker is not None:
+                    stats["tracked"] += 1
+                    found, tracked = tracker.update(self._downscale(frame))
+                    box = tuple(int(v) for v in tracked) if found else None
+                    if box is None:
+                        tracker = None
+                else:
+                    # No face to follow: wait for the next scheduled detection
+                    stats["skipped"] += 1
+
+                if box is not None and previous is not None and _iou(box, previous) >= self.stable_iou:
+                    steady += 1
+                else:
+                    steady = 0
+
+                if steady >= self.stable_frames:
+                    stats["encodings"] += 1
+                    encoding = self._encode(frame, box)
+                    if encoding is not None:
+                        print("[INFO] Face encoding captured.")
+                        break
+                    steady = 0
+
+                if self.display:
+                    if box is not None:
+                        x, y, w, h = (int(round(v / self.scale)) for v in box)
+                        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                    cv2.imshow('Face Authentication', frame)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+        finally:
+            capture.release()
+            if self.display:
+                cv2.destroyAllWindows()
+
+        elapsed = time.perf_counter() - start
+        stats["seconds"] = elapsed
+        stats["fps"] = stats["frames"] / elapsed if elapsed else 0.0
+        return encoding
+
+
+def capture_face_encoding(source=0, display=True, **options):
+    if display:
+        print("[INFO] Capturing face. Press 'q' to cancel.")
+    return FaceCaptureEngine(display=display, **options).run(source)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture a face encoding from a camera, video file or image directory.")
+    parser.add_argument("source", nargs="?", default="0")
+    parser.add_argument("--headless", action="store_true", help="Do not open a preview window.")
+    parser.add_argument("--detect-every", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=0.25)
+    parser.add_argument("--stable-frames", type=int, default=5)
+    parser.add_argument("--max-frames", type=int, default=None)
+    args = parser.parse_args()
+
+    engine = FaceCaptureEngine(
+        detect_every=args.detect_every, scale=args.scale,
+        stable_frames=args.stable_frames, display=not args.headless,
+    )
+    result = engine.run(args.source, max_frames=args.max_frames)
+    print("captured" if result is not None else "no encoding", engine.stats)
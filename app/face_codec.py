@@ -0,0 +1,99 @@
+import io
+import pickle
+import struct
+
+import numpy as np
+import sqlalchemy as sa
+
+# Stored layout of User.face_encoding:
+#   2 bytes  magic b"FE"
+#   1 byte   format version
+#   1 byte   reserved (0)
+#   128 x little-endian float32
+MAGIC = b"FE"
+VERSION = 1
+ENCODING_DIM = 128
+HEADER = struct.Struct("<2sBx")
+HEADER_SIZE = HEADER.size
+PAYLOAD_DTYPE = np.dtype("<f4")
+BLOB_SIZE = HEADER_SIZE + ENCODING_DIM * PAYLOAD_DTYPE.itemsize
+_HEADER_BYTES = HEADER.pack(MAGIC, VERSION)
+
+
+def encode_face(encoding):
+    vector = np.asarray(encoding, dtype=PAYLOAD_DTYPE).reshape(ENCODING_DIM)
+    return _HEADER_BYTES + vector.tobytes()
+
+
+def is_current(blob):
+    return blob is not None and len(blob) == BLOB_SIZE and bytes(blob[:HEADER_SIZE]) == _HEADER_BYTES
+
+
+def decode_face(blob):
+    """Zero-copy read-only view over a stored encoding."""
+    if not is_current(blob):
+        raise ValueError("Unsupported face encoding format")
+    return np.frombuffer(blob, dtype=PAYLOAD_DTYPE, count=ENCODING_DIM, offset=HEADER_SIZE)
+
+
+def decode_many(blobs):
+    """Stack stored encodings into an (N, 128) float32 matrix in one pass."""
+    payload = b"".join(memoryview(blob)[HEADER_SIZE:] for blob in blobs)
+    return np.frombuffer(payload, dtype=PAYLOAD_DTYPE).reshape(-1, ENCODING_DIM)
+
+
+# -- Legacy pickle rows --
+class _LegacyUnpickler(pickle.Unpickler):
+    # Old rows are pickled ndarrays; refuse anything else so a crafted
+    # blob in the database cannot run arbitrary code during the migration.
+    ALLOWED = {
+        ("numpy", "ndarray"),
+        ("numpy", "dtype"),
+        ("numpy.core.multiarray", "_reconstruct"),
+        ("numpy._core.multiarray", "_reconstruct"),
+        ("numpy.core.numeric", "_frombuffer"),
+        ("numpy._core.numeric", "_frombuffer"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"Refusing to load {module}.{name}")
+        return super().find_class(module, name)
+
+
+def load_legacy(blob):
+    return _LegacyUnpickler(io.BytesIO(blob)).load()
+
+
+def reencode_legacy_rows(executor, chunk_size=1000):
+    """Rewrite pickled user.face_encoding rows in the binary format.
+
+    Walks the table by primary key in chunks and yields the number of
+    rows converted per chunk, so the caller decides when to commit.
+    `executor` is anything with .execute(): a Connection or a Session.
+    """
+    users = sa.table("user", sa.column("id", sa.Integer), sa.column("face_encoding", sa.LargeBinary))
+    update = (
+        users.update()
+        .where(users.c.id == sa.bindparam("user_id"))
+        .values(face_encoding=sa.bindparam("blob"))
+    )
+    last_id = 0
+    while True:
+        rows = executor.execute(
+            sa.select(users.c.id, users.c.face_encoding)
+            .where(users.c.id > last_id, users.c.face_encoding.isnot(None))
+            .order_by(users.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        updates = [
+            {"user_id": user_id, "blob": encode_face(load_legacy(blob))}
+            for user_id, blob in rows
+            if not is_current(blob)
+        ]
+        if updates:
+            executor.execute(update, updates)
+        yield len(updates)
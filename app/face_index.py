@@ -0,0 +1,474 @@
+import os
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+
+from .face_codec import ENCODING_DIM, decode_face, decode_many, is_current
+from .face_store import SharedFaceStore
+from .models import User, db
+
+
+def _as_vector(encoding):
+    return np.asarray(encoding, dtype=np.float32).reshape(ENCODING_DIM)
+
+
+def _sq_norms(matrix):
+    return np.einsum("ij,ij->i", matrix, matrix)
+
+
+# -- Exact (brute-force) search --
+class ExactSearch:
+    """Every encoding in one float32 matrix, scanned with a single
+    matrix-vector product per query."""
+
+    name = "exact"
+    shared = False
+
+    def __init__(self, **options):
+        self._reset(0)
+
+    def _reset(self, capacity):
+        # One tuple swapped atomically, so a concurrent search never pairs
+        # the rows of one generation with the ids of another
+        self._data = (
+            np.empty((capacity, ENCODING_DIM), dtype=np.float32),
+            np.empty(capacity, dtype=np.float32),
+            np.empty(capacity, dtype=np.int64),
+            0,
+        )
+
+    def __len__(self):
+        return self._data[3]
+
+    def build(self, ids, matrix):
+        size = len(ids)
+        self._reset(max(size, 64))
+        buf_matrix, buf_sq_norms, buf_ids, _ = self._data
+        buf_matrix[:size] = matrix
+        buf_sq_norms[:size] = _sq_norms(buf_matrix[:size])
+        buf_ids[:size] = ids
+        self._data = (buf_matrix, buf_sq_norms, buf_ids, size)
+
+    def add(self, user_id, vector):
+        matrix, sq_norms, ids, size = self._data
+        if size == len(ids):
+            # Grow into fresh buffers; readers keep using the old ones
+            capacity = max(2 * len(ids), 64)
+            grown = (
+                np.empty((capacity, ENCODING_DIM), dtype=np.float32),
+                np.empty(capacity, dtype=np.float32),
+                np.empty(capacity, dtype=np.int64),
+            )
+            grown[0][:size], grown[1][:size], grown[2][:size] = matrix[:size], sq_norms[:size], ids[:size]
+            matrix, sq_norms, ids = grown
+
+        # Rows past `size` are invisible to readers until the swap below
+        matrix[size] = vector
+        sq_norms[size] = vector @ vector
+        ids[size] = user_id
+        self._data = (matrix, sq_norms, ids, size + 1)
+
+    def remove(self, user_id):
+        matrix, sq_norms, ids, size = self._data
+        keep = ids[:size] != user_id
+        self._data = (matrix[:size][keep], sq_norms[:size][keep], ids[:size][keep], int(keep.sum()))
+
+    def search(self, query):
+        """Return (user_id, squared distance) of the nearest encoding."""
+        matrix, sq_norms, ids, size = self._data
+        if size == 0:
+            return None, np.inf
+        # |a - b|^2 = |a|^2 - 2ab + |b|^2
+        sq_dist = sq_norms[:size] - 2.0 * (matrix[:size] @ query)
+        best = int(np.argmin(sq_dist))
+        return int(ids[best]), max(float(sq_dist[best] + query @ query), 0.0)
+
+    def export(self):
+        matrix, _, ids, size = self._data
+        return ids[:size].copy(), matrix[:size].copy()
+
+    def state(self):
+        ids, matrix = self.export()
+        return {"ids": ids, "vectors": matrix}
+
+    def restore(self, state):
+        self.build(state["ids"], state["vectors"])
+
+
+# -- IVF (k-means partitioned) search --
+def _nearest_centroid(data, centroids, chunk_size=65536):
+    c_sq = _sq_norms(centroids)
+    assign = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        block = data[start:start + chunk_size]
+        assign[start:start + chunk_size] = np.argmin(c_sq - 2.0 * (block @ centroids.T), axis=1)
+    return assign
+
+
+def _kmeans(data, k, iterations=10, sample_size=50000, seed=0):
+    rng = np.random.default_rng(seed)
+    if len(data) > sample_size:
+        data = data[rng.choice(len(data), sample_size, replace=False)]
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest_centroid(data, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class IVFSearch:
+    """Inverted-file index: encodings are bucketed by their nearest k-means
+    centroid and a query only scans the `nprobe` closest buckets.
+
+    `nprobe` is the recall/latency knob: probing every bucket is exact,
+    probing a handful keeps latency flat as enrolment grows. Inserts go to
+    the nearest existing bucket; rebuild (`flask face index-build`) after
+    heavy growth so the partitions stay balanced.
+    """
+
+    name = "ivf"
+    shared = False
+
+    def __init__(self, nlist=0, nprobe=8, **options):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._centroids = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        self._c_sq_norms = np.empty(0, dtype=np.float32)
+        self._lists = []
+
+    def __len__(self):
+        return sum(len(ids) for ids, _, _ in self._lists)
+
+    def build(self, ids, matrix):
+        if len(ids) == 0:
+            self.__init__(self.nlist, self.nprobe)
+            return
+        nlist = self.nlist or int(4 * np.sqrt(len(ids)))
+        nlist = max(1, min(nlist, len(ids)))
+        centroids = _kmeans(np.asarray(matrix, dtype=np.float32), nlist)
+        self._fill(centroids, np.asarray(ids, dtype=np.int64), matrix, _nearest_centroid(matrix, centroids))
+
+    def _fill(self, centroids, ids, matrix, assign):
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(1, len(centroids)))
+        lists = []
+        for part in np.split(order, bounds):
+            vectors = np.ascontiguousarray(matrix[part], dtype=np.float32)
+            lists.append((ids[part], vectors, _sq_norms(vectors)))
+        self._centroids = centroids
+        self._c_sq_norms = _sq_norms(centroids)
+        self._lists = lists
+
+    def add(self, user_id, vector):
+        if not self._lists:
+            self.build(np.array([user_id], dtype=np.int64), vector[None, :])
+            return
+        i = int(_nearest_centroid(vector[None, :], self._centroids)[0])
+        ids, vectors, sq_norms = self._lists[i]
+        # Replace the bucket wholesale so concurrent readers see old or new, never half
+        self._lists[i] = (
+            np.append(ids, user_id),
+            np.vstack([vectors, vector[None, :]]),
+            np.append(sq_norms, vector @ vector),
+        )
+
+    def remove(self, user_id):
+        for i, (ids, vectors, sq_norms) in enumerate(self._lists):
+            keep = ids != user_id
+            if not keep.all():
+                self._lists[i] = (ids[keep], vectors[keep], sq_norms[keep])
+
+    def search(self, query):
+        if not self._lists:
+            return None, np.inf
+        c_dist = self._c_sq_norms - 2.0 * (self._centroids @ query)
+        nprobe = min(self.nprobe, len(self._lists))
+        probe = np.argpartition(c_dist, nprobe - 1)[:nprobe] if nprobe < len(self._lists) else range(len(self._lists))
+
+        best_id, best_dist = None, np.inf
+        for i in probe:
+            ids, vectors, sq_norms = self._lists[i]
+            if len(ids) == 0:
+                continue
+            sq_dist = sq_norms - 2.0 * (vectors @ query)
+            j = int(np.argmin(sq_dist))
+            if sq_dist[j] < best_dist:
+                best_id, best_dist = int(ids[j]), float(sq_dist[j])
+        if best_id is None:
+            return None, np.inf
+        return best_id, max(best_dist + float(query @ query), 0.0)
+
+    def export(self):
+        if not self._lists:
+            return np.empty(0, dtype=np.int64), np.empty((0, ENCODING_DIM), dtype=np.float32)
+        return (
+            np.concatenate([ids for ids, _, _ in self._lists]),
+            np.concatenate([vectors for _, vectors, _ in self._lists]),
+        )
+
+    def state(self):
+        ids, vectors = self.export()
+        assign = np.repeat(np.arange(len(self._lists)), [len(ids) for ids, _, _ in self._lists])
+        return {"ids": ids, "vectors": vectors, "assign": assign, "centroids": self._centroids}
+
+    def restore(self, state):
+        self._fill(state["centroids"], state["ids"], state["vectors"], state["assign"])
+
+
+# -- Exact search over the memory-mapped store shared by all workers --
+class SharedSearch:
+    """Exact search reading straight from a SharedFaceStore. Writes go to
+    the store, so every worker sees them at its next lookup."""
+
+    name = "shared"
+    shared = True
+
+    def __init__(self, store_dir, **options):
+        self.store = SharedFaceStore(store_dir)
+
+    def __len__(self):
+        _, _, ids, count = self.store.snapshot()
+        return int((ids[:count] >= 0).sum())
+
+    def build(self, ids, matrix):
+        self.store.rebuild(ids, matrix)
+
+    def add(self, user_id, vector):
+        self.store.append([user_id], vector[None, :])
+
+    def remove(self, user_id):
+        self.store.remove(user_id)
+
+    def search(self, query):
+        matrix, sq_norms, ids, count = self.store.snapshot()
+        if count == 0:
+            return None, np.inf
+        # Deleted rows carry an infinite norm and can never win
+        sq_dist = sq_norms - 2.0 * (matrix @ query)
+        best = int(np.argmin(sq_dist))
+        if not np.isfinite(sq_dist[best]):
+            return None, np.inf
+        return int(ids[best]), max(float(sq_dist[best] + query @ query), 0.0)
+
+    def export(self):
+        matrix, _, ids, count = self.store.snapshot()
+        live = ids >= 0
+        return np.array(ids[live]), np.array(matrix[live])
+
+
+BACKENDS = {backend.name: backend for backend in (ExactSearch, IVFSearch, SharedSearch)}
+
+
+def make_backend(config):
+    name = config["FACE_INDEX_BACKEND"]
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown face index backend {name!r}")
+    return BACKENDS[name](
+        nlist=config["FACE_INDEX_NLIST"],
+        nprobe=config["FACE_INDEX_NPROBE"],
+        store_dir=config["FACE_STORE_DIR"],
+    )
+
+
+# -- Process-wide face embedding index --
+class FaceIndex:
+    """Front for the configured search backend (FACE_INDEX_BACKEND).
+
+    Built from the user table on first use, or restored from
+    FACE_INDEX_PATH when set and then reconciled with the user table
+    (rows enrolled, deleted or re-enrolled since the file was written).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backend = None
+
+    def __len__(self):
+        return len(self._backend) if self._backend is not None else 0
+
+    @property
+    def backend(self):
+        self.ensure_loaded()
+        return self._backend
+
+    def _read_enrolled(self, after_id=0):
+        rows = db.session.execute(
+            db.select(User.id, User.face_encoding)
+            .where(User.face_encoding.isnot(None), User.id > after_id)
+            .order_by(User.id)
+        ).all()
+        current = [(user_id, blob) for user_id, blob in rows if is_current(blob)]
+        if len(current) < len(rows):
+            current_app.logger.warning(
+                "Skipped %d face encodings in the legacy format; run `flask face reencode`.",
+                len(rows) - len(current),
+            )
+        ids = np.array([user_id for user_id, _ in current], dtype=np.int64)
+        matrix = decode_many(blob for _, blob in current)
+        return ids, matrix
+
+    def _restore(self, backend, path):
+        with np.load(path, allow_pickle=False) as saved:
+            if str(saved["backend"]) != backend.name:
+                return False
+            backend.restore({key: saved[key] for key in saved.files if key != "backend"})
+
+        # Reconcile every row with the user table, not just the ids above
+        # the newest saved one: SQLite hands a deleted user's id to the next
+        # user, so an id can stay enrolled with someone else's face.
+        saved_ids, saved_matrix = backend.export()
+        order = np.argsort(saved_ids)
+        saved_ids, saved_matrix = saved_ids[order], saved_matrix[order]
+        ids, matrix = self._read_enrolled()
+        if len(saved_ids):
+            at = np.minimum(np.searchsorted(saved_ids, ids), len(saved_ids) - 1)
+            same = (saved_ids[at] == ids) & (saved_matrix[at] == matrix).all(axis=1)
+        else:
+            same = np.zeros(len(ids), dtype=bool)
+        stale = np.setdiff1d(saved_ids, ids[same])
+        if len(stale) + int((~same).sum()) > max(len(ids) // 10, 100):
+            # Too far behind to patch up row by row
+            return False
+        for user_id in stale.tolist():
+            backend.remove(user_id)
+        for user_id, vector in zip(ids[~same].tolist(), matrix[~same]):
+            backend.add(user_id, vector)
+        return True
+
+    def _open_shared(self, backend):
+        if not backend.store.exists():
+            backend.build(*self._read_enrolled())
+            return
+        # Pick up anyone enrolled while no worker was around to append them
+        new_ids, new_matrix = self._read_enrolled(after_id=backend.store.max_id())
+        if len(new_ids):
+            backend.store.append(new_ids, new_matrix)
+
+    def ensure_loaded(self):
+        if self._backend is not None:
+            return
+        with self._lock:
+            if self._backend is not None:
+                return
+            config = current_app.config
+            backend = make_backend(config)
+            path = config.get("FACE_INDEX_PATH")
+            if backend.shared:
+                self._open_shared(backend)
+            elif not (path and os.path.exists(path) and self._restore(backend, path)):
+                backend.build(*self._read_enrolled())
+                if path:
+                    self._save(backend, path)
+            self._backend = backend
+
+    def reset(self):
+        """Forget the loaded backend; the next lookup loads it again."""
+        with self._lock:
+            self._backend = None
+
+    def rebuild(self):
+        """Rebuild from the user table and persist if FACE_INDEX_PATH is set."""
+        # Built aside so lookups keep using the old backend until the swap
+        backend = make_backend(current_app.config)
+        backend.build(*self._read_enrolled())
+        path = current_app.config.get("FACE_INDEX_PATH")
+        with self._lock:
+            self._backend = backend
+            if path and not backend.shared:
+                self._save(backend, path)
+
+    def save(self, path=None):
+        path = path or current_app.config.get("FACE_INDEX_PATH")
+        with self._lock:
+            self._save(self.backend, path)
+
+    @staticmethod
+    def _save(backend, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, backend=np.array(backend.name), **backend.state())
+        os.replace(tmp_path, path)
+
+    def _skip_write(self):
+        # An in-process index not built yet will read the row from the
+        # database anyway; a shared store must always see the write.
+        if self._backend is not None:
+            return False
+        if BACKENDS[current_app.config["FACE_INDEX_BACKEND"]].shared:
+            self.ensure_loaded()
+            return False
+        return True
+
+    def add(self, user_id, encoding):
+        """Enroll a new face without rebuilding the index."""
+        if self._skip_write():
+            return
+        with self._lock:
+            self._backend.add(user_id, _as_vector(encoding))
+
+    def remove(self, user_id):
+        if self._skip_write():
+            return
+        with self._lock:
+            self._backend.remove(user_id)
+
+    def match(self, encoding, tolerance):
+        """Return the id of the closest enrolled user within `tolerance`
+        (euclidean distance, as face_recognition.compare_faces uses), or None."""
+        self.ensure_loaded()
+        user_id, sq_dist = self._backend.search(_as_vector(encoding))
+        if user_id is not None and sq_dist <= tolerance * tolerance:
+            return user_id
+        return None
+
+
+def matches_stored(blob, encoding, tolerance):
+    """Whether `encoding` is within `tolerance` of a user's stored
+    face_encoding. An index match is only a candidate: the index may lag
+    the user table (ids reused, another worker's writes), the row decides."""
+    if not is_current(blob):
+        return False
+    diff = decode_face(blob) - _as_vector(encoding)
+    return float(diff @ diff) <= tolerance * tolerance
+
+
+def measure_recall(backend, sample_size=500, noise=0.02, seed=0):
+    """Compare `backend` against exact search on perturbed enrolled faces.
+
+    Returns recall (share of queries where both agree on the nearest user)
+    and median per-query latency of each, in milliseconds.
+    """
+    ids, matrix = backend.export()
+    if len(ids) == 0:
+        return {"queries": 0, "recall": None, "backend_ms": None, "exact_ms": None}
+    exact = ExactSearch()
+    exact.build(ids, matrix)
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(ids), min(sample_size, len(ids)), replace=False)
+    queries = (matrix[picks] + rng.normal(0.0, noise, (len(picks), ENCODING_DIM))).astype(np.float32)
+
+    hits, backend_times, exact_times = 0, [], []
+    for query in queries:
+        start = time.perf_counter()
+        found, _ = backend.search(query)
+        backend_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        expected, _ = exact.search(query)
+        exact_times.append(time.perf_counter() - start)
+        hits += found == expected
+    return {
+        "queries": len(queries),
+        "recall": hits / len(queries),
+        "backend_ms": 1000 * float(np.median(backend_times)),
+        "exact_ms": 1000 * float(np.median(exact_times)),
+    }
+
+
+face_index = FaceIndex()
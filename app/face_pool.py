@@ -0,0 +1,118 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, wait
+from concurrent.futures.process import BrokenProcessPool
+import time
+
+
+class EncoderBusy(Exception):
+    """The encoding pool is saturated or the job timed out."""
+
+
+# -- Runs inside the pool processes --
+def _encode_image(img_bytes, options):
+    from .face_preprocess import encode_face_image
+
+    return encode_face_image(img_bytes, **options)
+
+
+def _warm_up():
+    # Importing face_recognition loads the dlib detector and embedding models
+    import face_recognition  # noqa: F401
+    return os.getpid()
+
+
+# -- Bounded process pool for face encoding --
+class FaceEncoderPool:
+    """Runs face detection and embedding off the request thread.
+
+    At most `max_pending` jobs may be queued or running per web worker;
+    beyond that `encode` raises EncoderBusy immediately instead of letting
+    requests pile up behind the CPU-bound work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._workers = None
+        self._slots = None
+        self._timeout = None
+        self._options = {}
+
+    def configure(self, workers, max_pending, timeout, **options):
+        with self._lock:
+            self._shutdown()
+            self._workers = workers
+            self._slots = threading.BoundedSemaphore(max_pending)
+            self._timeout = timeout
+            self._options = options
+
+    def resize(self, workers):
+        """Use `workers` processes from the next job on."""
+        with self._lock:
+            if workers != self._workers:
+                self._shutdown()
+                self._workers = workers
+
+    def _get_executor(self):
+        # gunicorn forks after import, so each web worker starts its own pool
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(max_workers=self._workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def encode(self, img_bytes):
+        """Return (encoding of the largest face or None, stage timings in ms)."""
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            raise EncoderBusy("Face encoder is saturated")
+        try:
+            future = self._get_executor().submit(_encode_image, img_bytes, self._options)
+        except BrokenProcessPool:
+            # A crashed child poisons the executor; start a fresh one next time
+            self._slots.release()
+            with self._lock:
+                self._executor = None
+            raise EncoderBusy("Face encoder restarting")
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            encoding, timings = future.result(timeout=self._timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise EncoderBusy("Face encoding timed out")
+        timings["total"] = (time.perf_counter() - start) * 1000
+        timings["queue"] = timings["total"] - sum(v for k, v in timings.items() if k != "total")
+        return encoding, timings
+
+    def warm_up(self):
+        """Start the pool processes and load the models in each of them."""
+        executor = self._get_executor()
+        wait([executor.submit(_warm_up) for _ in range(self._workers)])
+
+
+encoder_pool = FaceEncoderPool()
+
+
+def pool_size(config):
+    """FACE_POOL_WORKERS, or by default this worker's share of the CPUs."""
+    return config["FACE_POOL_WORKERS"] or max(1, (os.cpu_count() or 1) // config["WEB_WORKERS"])
+
+
+def warm_up(app):
+    """Optional start-up hook (FACE_WARMUP): pay the model loading and the
+    face index build before the first face request instead of during it."""
+    with app.app_context():
+        from .face_index import face_index
+        face_index.ensure_loaded()
+    encoder_pool.warm_up()
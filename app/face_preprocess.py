@@ -0,0 +1,80 @@
+import base64
+import binascii
+import time
+from io import BytesIO
+
+
+class ImageRejected(ValueError):
+    """The uploaded face image is malformed or too large to process."""
+
+
+def decode_data_url(data_url, max_bytes):
+    """Base64-decode a `data:image/...;base64,` URL, refusing payloads over
+    `max_bytes` before any decoding work is done."""
+    try:
+        header, encoded = data_url.split(",", 1)
+    except ValueError:
+        raise ImageRejected("Malformed image data")
+    if len(encoded) * 3 // 4 > max_bytes:
+        raise ImageRejected("Image too large")
+    try:
+        return base64.b64decode(encoded, validate=True)
+    except binascii.Error:
+        raise ImageRejected("Malformed image data")
+
+
+def _scale_box(box, scale, margin, width, height):
+    top, right, bottom, left = (int(round(v * scale)) for v in box)
+    pad_y = int((bottom - top) * margin)
+    pad_x = int((right - left) * margin)
+    return (
+        max(top - pad_y, 0),
+        min(right + pad_x, width),
+        min(bottom + pad_y, height),
+        max(left - pad_x, 0),
+    )
+
+
+def encode_face_image(img_bytes, detect_size=320, max_side=1280, max_pixels=25_000_000, margin=0.25):
+    """Find the largest face on a downscaled copy and encode only its crop.
+
+    Returns (encoding or None, {stage: milliseconds}).
+    """
+    import face_recognition
+    import numpy as np
+    from PIL import Image
+
+    timings = {}
+    start = time.perf_counter()
+
+    img = Image.open(BytesIO(img_bytes))
+    if img.width * img.height > max_pixels:
+        raise ImageRejected("Image dimensions too large")
+    ratio = max_side / max(img.size)
+    if ratio < 1:
+        # JPEG only: let libjpeg decode straight at 1/2, 1/4 or 1/8 scale
+        img.draft("RGB", (int(img.width * ratio), int(img.height * ratio)))
+    img = img.convert("RGB")
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side))
+    stamp = time.perf_counter()
+    timings["decode"] = (stamp - start) * 1000
+
+    small = img.copy()
+    small.thumbnail((detect_size, detect_size))
+    locations = face_recognition.face_locations(np.asarray(small))
+    now = time.perf_counter()
+    timings["detect"], stamp = (now - stamp) * 1000, now
+    if not locations:
+        return None, timings
+
+    largest = max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+    top, right, bottom, left = _scale_box(largest, img.width / small.width, margin, img.width, img.height)
+    crop = np.asarray(img.crop((left, top, right, bottom)))
+    # Face box relative to the crop, with the margin taken back off
+    inner = _scale_box(largest, img.width / small.width, 0, img.width, img.height)
+    encodings = face_recognition.face_encodings(
+        crop, known_face_locations=[(inner[0] - top, inner[1] - left, inner[2] - top, inner[3] - left)]
+    )
+    timings["encode"] = (time.perf_counter() - stamp) * 1000
+    return (encodings[0] if encodings else None), timings
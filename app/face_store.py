@@ -0,0 +1,179 @@
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from .face_codec import ENCODING_DIM
+
+try:
+    import fcntl
+except ImportError:  # Windows dev server: single process, a thread lock is enough
+    fcntl = None
+
+META = struct.Struct("<qqq")  # generation, row count, epoch
+LEGACY_META = struct.Struct("<qq")  # stores written before epochs: epoch 0
+FILES = ("vectors.f32", "norms.f32", "ids.i64")
+
+
+# -- Face encodings shared by every worker through memory-mapped files --
+class SharedFaceStore:
+    """Enrolled encodings kept in flat files under `path`:
+
+        vectors.<epoch>.f32  N x 128 float32 rows, append-only
+        norms.<epoch>.f32    squared norm per row; +inf marks a deleted row
+        ids.<epoch>.i64      user id per row; -1 marks a deleted row
+        meta                 (generation, row count, epoch), replaced atomically
+
+    Workers map the files read-only, so the page cache holds one copy no
+    matter how many workers there are. Writers take an exclusive file lock,
+    write the rows, then bump the generation; readers compare generations
+    on each lookup and remap only when it changed. A rebuild writes a new
+    epoch's files beside the old ones and publishes them only through the
+    meta replace, so a reader never pairs one epoch's vectors with
+    another's ids.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._generation = None
+        self._view = None
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _data_file(self, name, epoch):
+        if not epoch:
+            return self._file(name)
+        stem, ext = os.path.splitext(name)
+        return self._file(f"{stem}.{epoch}{ext}")
+
+    def exists(self):
+        return os.path.exists(self._file("meta"))
+
+    @contextmanager
+    def _write_lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        with self._thread_lock, open(self._file("lock"), "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        try:
+            with open(self._file("meta"), "rb") as f:
+                data = f.read(META.size)
+        except FileNotFoundError:
+            return 0, 0, 0
+        if len(data) == LEGACY_META.size:
+            return (*LEGACY_META.unpack(data), 0)
+        return META.unpack(data)
+
+    def _write_meta(self, generation, count, epoch):
+        tmp_path = f"{self._file('meta')}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(META.pack(generation, count, epoch))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._file("meta"))
+
+    def snapshot(self):
+        """(vectors, norms, ids, count) for the current generation."""
+        generation, count, epoch = self._read_meta()
+        if generation != self._generation:
+            if count:
+                try:
+                    view = self._map(count, epoch)
+                except FileNotFoundError:
+                    # A rebuild replaced that epoch after the meta was read
+                    return self.snapshot()
+            else:
+                view = (
+                    np.empty((0, ENCODING_DIM), dtype=np.float32),
+                    np.empty(0, dtype=np.float32),
+                    np.empty(0, dtype=np.int64),
+                    0,
+                )
+            self._view, self._generation = view, generation
+        return self._view
+
+    def _map(self, count, epoch):
+        vectors, norms, ids = (self._data_file(name, epoch) for name in FILES)
+        return (
+            np.memmap(vectors, dtype=np.float32, mode="r", shape=(count, ENCODING_DIM)),
+            np.memmap(norms, dtype=np.float32, mode="r", shape=(count,)),
+            np.memmap(ids, dtype=np.int64, mode="r", shape=(count,)),
+            count,
+        )
+
+    def rebuild(self, ids, matrix):
+        """Replace the whole store, e.g. on first start or after drift."""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._write_lock():
+            generation, _, old_epoch = self._read_meta()
+            # Numbered by generation, so never the name of a live epoch
+            epoch = generation + 1
+            norms = np.einsum("ij,ij->i", matrix, matrix).astype(np.float32)
+            for name, data in zip(FILES, (matrix, norms, ids)):
+                with open(self._data_file(name, epoch), "wb") as f:
+                    f.write(data.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._write_meta(generation + 1, len(ids), epoch)
+            # Workers still mapping the old files keep reading the old inodes
+            for name in FILES:
+                try:
+                    os.remove(self._data_file(name, old_epoch))
+                except FileNotFoundError:
+                    pass
+
+    def append(self, ids, matrix):
+        """Append rows for users not already live in the store."""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._write_lock():
+            generation, count, epoch = self._read_meta()
+            if count:
+                live = np.fromfile(self._data_file("ids.i64", epoch), dtype=np.int64, count=count)
+                fresh = ~np.isin(ids, live)
+                ids, matrix = ids[fresh], matrix[fresh]
+            if not len(ids):
+                return
+            norms = np.einsum("ij,ij->i", matrix, matrix).astype(np.float32)
+            # Write at the committed row count so a crashed writer's tail is overwritten
+            for name, data in zip(FILES, (matrix, norms, ids)):
+                path = self._data_file(name, epoch)
+                with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+                    f.seek(count * data.itemsize * (ENCODING_DIM if data.ndim == 2 else 1))
+                    f.write(data.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._write_meta(generation + 1, count + len(ids), epoch)
+
+    def remove(self, user_id):
+        with self._write_lock():
+            generation, count, epoch = self._read_meta()
+            if not count:
+                return
+            ids = np.memmap(self._data_file("ids.i64", epoch), dtype=np.int64, mode="r+", shape=(count,))
+            rows = np.flatnonzero(ids == user_id)
+            if not len(rows):
+                return
+            norms = np.memmap(self._data_file("norms.f32", epoch), dtype=np.float32, mode="r+", shape=(count,))
+            norms[rows] = np.inf
+            ids[rows] = -1
+            norms.flush()
+            ids.flush()
+            del ids, norms
+            self._write_meta(generation + 1, count, epoch)
+
+    def max_id(self):
+        _, _, ids, count = self.snapshot()
+        return int(ids.max()) if count else 0
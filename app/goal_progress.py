@@ -0,0 +1,353 @@
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import String, type_coerce
+
+from .models import Account, FinancialGoal, SavingMode, db
+
+goals = FinancialGoal.__table__
+accounts = Account.__table__
+
+MODES = ("NONE", "DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+NONE, DAILY, WEEKLY, MONTHLY, YEARLY = range(len(MODES))
+_MODE_CODES = {name: code for code, name in enumerate(MODES)}
+# Projections further out than this are reported as "never"; it also keeps
+# the datetime64 arithmetic far from overflow for tiny saving amounts.
+MAX_PERIODS = {DAILY: 100 * 366, WEEKLY: 100 * 53, MONTHLY: 100 * 12, YEARLY: 100}
+REPORT_COLUMNS = (
+    "goal_id", "user_id", "saving_mode", "target_amount", "saved_amount", "expected", "actual",
+    "shortfall", "on_track", "projected_completion", "deadline",
+)
+
+
+# -- Loading --
+def _day(column):
+    # Dates come back as 'YYYY-MM-DD' text, which NumPy parses in bulk far
+    # faster than it converts datetime objects one by one
+    if db.session.get_bind().dialect.name == "postgresql":
+        return db.func.to_char(column, "YYYY-MM-DD")
+    return type_coerce(db.func.date(column), String)
+
+
+def _select(*where):
+    return db.select(
+        goals.c.id, goals.c.user_id, type_coerce(goals.c.saving_mode, String),
+        goals.c.target_amount, goals.c.daily_amount, goals.c.weekly_amount,
+        goals.c.monthly_amount, goals.c.yearly_amount, goals.c.saved_amount,
+        _day(goals.c.created_at), _day(goals.c.deadline),
+    ).where(*where)
+
+
+def _balances(*where):
+    """(user ids, balances), sorted by user id, for lookups with _balance_of."""
+    rows = db.session.execute(
+        db.select(accounts.c.user_id, db.func.sum(accounts.c.balance))
+        .where(*where)
+        .group_by(accounts.c.user_id)
+        .order_by(accounts.c.user_id)
+    ).all()
+    user_ids, balances = zip(*rows) if rows else ((), ())
+    return np.array(user_ids, dtype=np.int64), _floats(balances)
+
+
+def _balance_of(user_ids, balances):
+    known, amounts = balances
+    if not len(known):
+        return np.zeros(len(user_ids))
+    at = np.minimum(np.searchsorted(known, user_ids), len(known) - 1)
+    return np.where(known[at] == user_ids, amounts[at], 0.0)
+
+
+def _floats(values):
+    return np.nan_to_num(np.array(values, dtype=np.float64))
+
+
+def _arrays(rows, balances):
+    """Column arrays for a list of rows from _select()."""
+    if rows:
+        (ids, user_ids, modes, targets, daily, weekly, monthly, yearly, saved,
+         created, deadlines) = zip(*rows)
+    else:
+        ids = user_ids = modes = targets = daily = weekly = monthly = yearly = saved = created = deadlines = ()
+    user_ids = np.array(user_ids, dtype=np.int64)
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "user_id": user_ids,
+        "mode": np.array([_MODE_CODES.get(mode, NONE) for mode in modes], dtype=np.int8),
+        "target": _floats(targets),
+        "daily": _floats(daily),
+        "weekly": _floats(weekly),
+        "monthly": _floats(monthly),
+        "yearly": _floats(yearly),
+        "saved": _floats(saved),
+        "created": np.array(created, dtype="datetime64[D]"),
+        "deadline": np.array(deadlines, dtype="datetime64[D]"),
+        "balance": _balance_of(user_ids, balances),
+    }
+
+
+def load_user(user_id):
+    """Arrays for one customer's goals, oldest first."""
+    rows = db.session.execute(_select(goals.c.user_id == user_id)).all()
+    cols = _arrays(rows, _balances(accounts.c.user_id == user_id))
+    # Sorted here rather than in SQL, which would need a temp B-tree
+    order = np.lexsort((cols["id"], cols["created"]))
+    return {key: values[order] for key, values in cols.items()}
+
+
+def iter_chunks(chunk_size=50_000):
+    """Arrays for every goal, `chunk_size` goals at a time in id order.
+    Balances are read once up front, one GROUP BY over all accounts."""
+    balances = _balances()
+    after = 0
+    while True:
+        rows = db.session.execute(
+            _select(goals.c.id > after).order_by(goals.c.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        yield _arrays(rows, balances)
+        after = rows[-1][0]
+
+
+# -- Computation --
+def _add_months(start, months, day):
+    """`start` (datetime64[M]) + `months`, on `day` of that month, clipped
+    to the month's last day."""
+    month = start + months
+    first = month.astype("datetime64[D]")
+    last = (month + 1).astype("datetime64[D]") - 1
+    return np.minimum(first + (day - 1), last)
+
+
+def compute(cols, today=None):
+    """Progress for every goal in `cols` in one pass.
+
+    Periods elapsed since the goal was created are counted per saving
+    mode (days, whole weeks, calendar months, calendar years); expected
+    savings are the mode's amount times those periods, capped at the
+    target. Actual progress is what has been swept into the goal plus
+    the customer's balance, capped at the target. The projected
+    completion date assumes the remainder is saved at the mode's rate
+    from today; it is NaT when nothing is being saved or the goal would
+    take more than a century.
+    """
+    today = np.datetime64(today or datetime.utcnow().date(), "D")
+    mode, target, created = cols["mode"], cols["target"], cols["created"]
+    created = np.where(np.isnat(created), today, created)
+
+    days = (today - created).astype(np.int64)
+    months = (today.astype("datetime64[M]") - created.astype("datetime64[M]")).astype(np.int64)
+    years = (today.astype("datetime64[Y]") - created.astype("datetime64[Y]")).astype(np.int64)
+    is_mode = [mode == DAILY, mode == WEEKLY, mode == MONTHLY, mode == YEARLY]
+
+    periods = np.maximum(np.select(is_mode, [days, days // 7, months, years], 0), 0)
+    rate = np.select(is_mode, [cols["daily"], cols["weekly"], cols["monthly"], cols["yearly"]], 0.0)
+
+    expected = np.minimum(rate * periods, target)
+    actual = np.clip(cols["saved"] + np.maximum(cols["balance"], 0.0), 0.0, target)
+    shortfall = np.maximum(expected - actual, 0.0)
+    remaining = target - actual
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        needed = np.ceil(np.where(rate > 0, remaining / rate, np.inf))
+    limit = np.select(is_mode, [MAX_PERIODS[m] for m in (DAILY, WEEKLY, MONTHLY, YEARLY)], 0)
+    reachable = (rate > 0) & (needed <= limit)
+    needed = np.where(reachable, needed, 0).astype(np.int64)
+
+    day_of_month = (today - today.astype("datetime64[M]")).astype(np.int64) + 1
+    this_month = today.astype("datetime64[M]")
+    projected = np.select(
+        is_mode,
+        [
+            today + needed,
+            today + 7 * needed,
+            _add_months(this_month, needed, day_of_month),
+            _add_months(this_month, 12 * needed, day_of_month),
+        ],
+        np.datetime64("NaT", "D"),
+    ).astype("datetime64[D]")
+    done = remaining <= 0
+    projected = np.where(done, today, np.where(reachable, projected, np.datetime64("NaT", "D")))
+
+    # When expected savings next go up: the start of the next period, or
+    # NaT once they have reached the target or nothing is being saved
+    next_increase = np.select(
+        is_mode,
+        [
+            np.broadcast_to(today + 1, mode.shape),
+            created + 7 * (periods + 1),
+            np.broadcast_to((this_month + 1).astype("datetime64[D]"), mode.shape),
+            np.broadcast_to((today.astype("datetime64[Y]") + 1).astype("datetime64[D]"), mode.shape),
+        ],
+        np.datetime64("NaT", "D"),
+    ).astype("datetime64[D]")
+    next_increase = np.where((rate > 0) & (expected < target), next_increase, np.datetime64("NaT", "D"))
+
+    return {
+        "expected": expected,
+        "actual": actual,
+        "shortfall": shortfall,
+        "on_track": actual >= expected,
+        "completed": done,
+        "projected": projected,
+        "next_increase": next_increase,
+    }
+
+
+def _dates(values):
+    return [None if value is None else value.isoformat() for value in values.tolist()]
+
+
+def _columns(cols, result):
+    """Per-goal values as plain Python lists, keyed by REPORT_COLUMNS."""
+    return {
+        "goal_id": cols["id"].tolist(),
+        "user_id": cols["user_id"].tolist(),
+        "saving_mode": [MODES[code] for code in cols["mode"].tolist()],
+        "target_amount": cols["target"].tolist(),
+        "saved_amount": cols["saved"].round(2).tolist(),
+        "expected": result["expected"].round(2).tolist(),
+        "actual": result["actual"].round(2).tolist(),
+        "shortfall": result["shortfall"].round(2).tolist(),
+        "on_track": result["on_track"].tolist(),
+        "projected_completion": _dates(result["projected"]),
+        "deadline": _dates(cols["deadline"]),
+    }
+
+
+def goal_dicts(cols, result):
+    """Per-goal rows for JSON and the analytics page."""
+    columns = _columns(cols, result)
+    return [dict(zip(REPORT_COLUMNS, row)) for row in zip(*(columns[name] for name in REPORT_COLUMNS))]
+
+
+# -- Uses --
+def user_progress(user_id, today=None):
+    cols = load_user(user_id)
+    return goal_dicts(cols, compute(cols, today))
+
+
+# -- Locked savings --
+# Account.locked_amount is what the customer's most recent saving goal
+# expects to be set aside by now, less what sweeps already moved into it,
+# and locked_until is when that amount next goes up. Withdrawals compare
+# against the column directly (see posting.withdraw); the amount is
+# recomputed when goals change and, once locked_until has passed, by
+# `flask goals advance-locks`.
+_NO_BALANCES = (np.empty(0, dtype=np.int64), np.empty(0))
+
+
+def _midnight(day):
+    return None if day is None else datetime(day.year, day.month, day.day)
+
+
+def next_increase(goal, today=None):
+    """When `goal`'s expected savings next go up, as a datetime (None if
+    they never will); sweeps contribute at the same moments."""
+    row = (
+        goal.id or 0, goal.user_id, goal.saving_mode.name if goal.saving_mode else "NONE",
+        goal.target_amount, goal.daily_amount, goal.weekly_amount, goal.monthly_amount,
+        goal.yearly_amount, goal.saved_amount, goal.created_at, goal.deadline,
+    )
+    return _midnight(compute(_arrays([row], _NO_BALANCES), today)["next_increase"][0].tolist())
+
+
+def refresh_locks(user_ids, today=None):
+    """Recompute the locks on the accounts of `user_ids`, in the caller's
+    transaction."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    rows = db.session.execute(
+        _select(goals.c.user_id.in_(user_ids), goals.c.saving_mode != SavingMode.NONE)
+    ).all()
+    cols = _arrays(rows, _NO_BALANCES)
+    result = compute(cols, today)
+    # Group by user, oldest goal first; each user's last goal sets the lock
+    order = np.lexsort((cols["id"], cols["created"], cols["user_id"]))
+    grouped = cols["user_id"][order]
+    last = order[np.append(grouped[1:] != grouped[:-1], True)] if rows else []
+
+    locks = dict.fromkeys(user_ids, (0.0, None))
+    for user_id, amount, until in zip(
+        cols["user_id"][last].tolist(),
+        np.maximum(result["expected"] - cols["saved"], 0.0)[last].tolist(),
+        result["next_increase"][last].tolist(),
+    ):
+        locks[user_id] = (amount, _midnight(until))
+    db.session.execute(
+        accounts.update()
+        .where(accounts.c.user_id == db.bindparam("b_user_id"))
+        .values(locked_amount=db.bindparam("b_amount"), locked_until=db.bindparam("b_until")),
+        [
+            {"b_user_id": user_id, "b_amount": amount, "b_until": until}
+            for user_id, (amount, until) in locks.items()
+        ],
+    )
+
+
+def due_locks(now, after=0, limit=500):
+    """Customers after `after` whose lock has come due, in id order."""
+    return (
+        db.select(accounts.c.user_id)
+        .where(accounts.c.locked_until <= now, accounts.c.user_id > after)
+        .group_by(accounts.c.user_id)
+        .order_by(accounts.c.user_id)
+        .limit(limit)
+    )
+
+
+def advance_locks(chunk_size=500, now=None):
+    """Refresh every account whose lock has come due, one commit per
+    `chunk_size` customers; returns the number of customers refreshed."""
+    now = now or datetime.utcnow()
+    refreshed, after = 0, 0
+    while True:
+        user_ids = db.session.execute(due_locks(now, after, chunk_size)).scalars().all()
+        if not user_ids:
+            return refreshed
+        refresh_locks(user_ids, now.date())
+        db.session.commit()
+        refreshed += len(user_ids)
+        after = user_ids[-1]
+
+
+def analytics(chunk_size=50_000, top=20, today=None):
+    """Bank-wide goal totals plus the `top` goals furthest behind schedule,
+    computed chunk by chunk so memory stays flat."""
+    totals = {
+        "goals": 0, "on_track": 0, "completed": 0, "late": 0,
+        "target": 0.0, "expected": 0.0, "actual": 0.0, "shortfall": 0.0,
+    }
+    by_mode = {name: 0 for name in MODES}
+    behind = []
+    for cols in iter_chunks(chunk_size):
+        result = compute(cols, today)
+        # Unfinished goals that will not make their deadline at the current rate
+        late = ~result["completed"] & ~np.isnat(cols["deadline"]) & (
+            np.isnat(result["projected"]) | (result["projected"] > cols["deadline"])
+        )
+        totals["goals"] += len(cols["id"])
+        totals["on_track"] += int(result["on_track"].sum())
+        totals["completed"] += int(result["completed"].sum())
+        totals["late"] += int(late.sum())
+        totals["target"] += float(cols["target"].sum())
+        for key in ("expected", "actual", "shortfall"):
+            totals[key] += float(result[key].sum())
+        for code, count in zip(*np.unique(cols["mode"], return_counts=True)):
+            by_mode[MODES[code]] += int(count)
+
+        worst = np.argsort(-result["shortfall"], kind="stable")[:top]
+        worst = worst[result["shortfall"][worst] > 0]
+        picked = {key: value[worst] for key, value in cols.items()}
+        behind += goal_dicts(picked, {key: value[worst] for key, value in result.items()})
+        behind = sorted(behind, key=lambda goal: -goal["shortfall"])[:top]
+    return {"totals": totals, "by_mode": by_mode, "behind": behind}
+
+
+def report_rows(chunk_size=50_000, today=None):
+    """Every goal's progress as CSV-ready tuples, in goal id order."""
+    for cols in iter_chunks(chunk_size):
+        columns = _columns(cols, compute(cols, today))
+        yield from zip(*(columns[name] for name in REPORT_COLUMNS))
@@ -0,0 +1,206 @@
+from datetime import datetime
+
+from . import goal_progress, ledger, posting
+from .models import Account, FinancialGoal, GoalSweep, GoalSweepItem, JournalEntry, SavingMode, Transaction, db
+
+goals = FinancialGoal.__table__
+accounts = Account.__table__
+sweeps = GoalSweep.__table__
+items = GoalSweepItem.__table__
+journal = JournalEntry.__table__
+transactions = Transaction.__table__
+
+CONTRIBUTION = "Goal Contribution"
+REFUND = "Goal Refund"
+_PERIODS = {
+    SavingMode.DAILY: ("daily_amount", "+1 day", "1 day"),
+    SavingMode.WEEKLY: ("weekly_amount", "+7 days", "7 days"),
+    SavingMode.MONTHLY: ("monthly_amount", "+1 month", "1 month"),
+    SavingMode.YEARLY: ("yearly_amount", "+1 year", "1 year"),
+}
+
+
+# -- Scheduling --
+def schedule(goal):
+    """Set when `goal` is first due: the next moment its expected savings
+    go up, so each contribution keeps pace with the withdrawal lock."""
+    goal.next_contribution_at = goal_progress.next_increase(goal)
+
+
+def _advanced(column):
+    """`column` moved on by one period of the goal's saving mode."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        steps = {mode: db.func.datetime(column, sqlite_step) for mode, (_, sqlite_step, _) in _PERIODS.items()}
+    elif dialect == "postgresql":
+        steps = {mode: column + db.literal_column(f"INTERVAL '{interval}'") for mode, (_, _, interval) in _PERIODS.items()}
+    else:
+        raise RuntimeError(f"goal sweeps need date arithmetic for {dialect}")
+    return db.case(*((goals.c.saving_mode == mode, step) for mode, step in steps.items()), else_=None)
+
+
+def _contribution():
+    """This period's amount for each goal, never past its target."""
+    rate = db.case(
+        *((goals.c.saving_mode == mode, db.func.coalesce(goals.c[column], 0.0)) for mode, (column, _, _) in _PERIODS.items()),
+        else_=0.0,
+    )
+    remaining = goals.c.target_amount - goals.c.saved_amount
+    return db.case((rate < remaining, rate), else_=remaining)
+
+
+# -- Sweeping --
+# A sweep walks the due goals in id order, `chunk_size` at a time. Each
+# chunk is one transaction of set-based statements over a staging table:
+# stage the contributions, mark those whose account can cover all of its
+# goals, debit the accounts, credit the goals, journal and record them,
+# move every staged goal to its first due date after as_of, then advance
+# the checkpoint and empty the staging rows.
+
+def _open_sweep(now):
+    sweep = db.session.execute(
+        db.select(sweeps).where(sweeps.c.finished_at.is_(None)).order_by(sweeps.c.id).limit(1)
+    ).mappings().first()
+    if sweep is None:
+        sweep_id = db.session.execute(
+            sweeps.insert().values(as_of=now, last_goal_id=0, goals_swept=0, amount_swept=0.0, started_at=now)
+        ).inserted_primary_key[0]
+        db.session.commit()
+        sweep = db.session.execute(db.select(sweeps).where(sweeps.c.id == sweep_id)).mappings().first()
+    return sweep
+
+
+def _sweep_chunk(sweep, chunk_size):
+    """Post one chunk; returns the id of its last goal, or None when done."""
+    due = (
+        goals.c.id > sweep["last_goal_id"],
+        goals.c.saving_mode != SavingMode.NONE,
+        goals.c.next_contribution_at <= sweep["as_of"],
+        goals.c.saved_amount < goals.c.target_amount,
+    )
+    chunk = db.select(goals.c.id).where(*due).order_by(goals.c.id).limit(chunk_size).subquery()
+    upper = db.session.execute(db.select(db.func.max(chunk.c.id))).scalar()
+    if upper is None:
+        return None
+    in_chunk = (*due, goals.c.id <= upper)
+    staged = items.c.sweep_id == sweep["id"]
+    now = datetime.utcnow()
+
+    account_id = (
+        db.select(db.func.min(accounts.c.id)).where(accounts.c.user_id == goals.c.user_id).scalar_subquery()
+    )
+    db.session.execute(items.insert().from_select(
+        ["sweep_id", "goal_id", "account_id", "user_id", "amount", "funded"],
+        db.select(db.literal(sweep["id"]), goals.c.id, account_id, goals.c.user_id, _contribution(), db.false())
+        .where(*in_chunk, _contribution() > 0, account_id.isnot(None)),
+    ))
+
+    # Lock the accounts involved (a no-op on SQLite, where the INSERT above
+    # already holds the write lock)
+    db.session.execute(
+        db.select(accounts.c.id)
+        .where(accounts.c.id.in_(db.select(items.c.account_id).where(staged)))
+        .with_for_update()
+    ).all()
+
+    # An account pays all of its goals in this chunk or none of them
+    other = items.alias("other")
+    needed = (
+        db.select(db.func.sum(other.c.amount))
+        .where(other.c.sweep_id == sweep["id"], other.c.account_id == items.c.account_id)
+        .scalar_subquery()
+    )
+    balance = db.select(accounts.c.balance).where(accounts.c.id == items.c.account_id).scalar_subquery()
+    db.session.execute(items.update().where(staged, balance >= needed).values(funded=True))
+
+    funded = db.and_(staged, items.c.funded.is_(True))
+    db.session.execute(
+        accounts.update()
+        .where(accounts.c.id.in_(db.select(items.c.account_id).where(funded)))
+        .values(balance=accounts.c.balance - (
+            db.select(db.func.sum(items.c.amount))
+            .where(funded, items.c.account_id == accounts.c.id)
+            .scalar_subquery()
+        ))
+    )
+    # Missed contributions (no funds, or periods that passed with no sweep)
+    # are not retried: the lock keeps the gap in the account until the
+    # customer catches up. Every staged goal moves past as_of, so running
+    # the same as_of again posts nothing.
+    while db.session.execute(
+        goals.update().where(*in_chunk).values(next_contribution_at=_advanced(goals.c.next_contribution_at))
+    ).rowcount:
+        pass
+    db.session.execute(
+        goals.update()
+        .where(goals.c.id.in_(db.select(items.c.goal_id).where(funded)))
+        .values(saved_amount=goals.c.saved_amount + (
+            db.select(items.c.amount).where(funded, items.c.goal_id == goals.c.id).scalar_subquery()
+        ))
+    )
+
+    ref = db.literal("gs") + db.cast(items.c.sweep_id, db.String) + "-" + db.cast(items.c.goal_id, db.String)
+    for entry_account, entry_amount in ((items.c.account_id, -items.c.amount), (db.null(), items.c.amount)):
+        db.session.execute(journal.insert().from_select(
+            ["posting_ref", "account_id", "amount", "kind", "created_at"],
+            db.select(ref, entry_account, entry_amount, db.literal(CONTRIBUTION), db.literal(now)).where(funded),
+        ))
+    db.session.execute(transactions.insert().from_select(
+        ["type", "amount", "user_id", "timestamp", "is_fraud", "reported"],
+        db.select(db.literal(CONTRIBUTION), items.c.amount, items.c.user_id, db.literal(now), db.false(), db.false())
+        .where(funded),
+    ))
+
+    user_ids = db.session.execute(db.select(items.c.user_id).where(staged).distinct()).scalars().all()
+    goal_progress.refresh_locks(user_ids, sweep["as_of"].date())
+
+    count, total = db.session.execute(
+        db.select(db.func.count(), db.func.coalesce(db.func.sum(items.c.amount), 0.0)).where(funded)
+    ).one()
+    db.session.execute(
+        sweeps.update().where(sweeps.c.id == sweep["id"]).values(
+            last_goal_id=upper,
+            goals_swept=sweeps.c.goals_swept + count,
+            amount_swept=sweeps.c.amount_swept + total,
+        )
+    )
+    db.session.execute(items.delete().where(staged))
+    db.session.commit()
+    return upper
+
+
+def run(chunk_size=1000, now=None):
+    """Sweep every due goal, resuming an unfinished sweep if there is one.
+    Returns the finished GoalSweep row."""
+    sweep = _open_sweep(now or datetime.utcnow())
+    try:
+        while True:
+            upper = _sweep_chunk(sweep, chunk_size)
+            if upper is None:
+                break
+            sweep = {**sweep, "last_goal_id": upper}
+    except Exception:
+        db.session.rollback()
+        raise
+    db.session.execute(
+        sweeps.update().where(sweeps.c.id == sweep["id"]).values(finished_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return db.session.execute(db.select(sweeps).where(sweeps.c.id == sweep["id"])).mappings().first()
+
+
+# -- Refunds --
+def refund(goal):
+    """Move a goal's savings back to the customer's account, in the
+    caller's transaction (used when the goal is deleted)."""
+    amount = goal.saved_amount or 0.0
+    if amount <= 0:
+        return
+    account = posting.account_row(goal.user_id)
+    if account is None:
+        raise posting.AccountNotFound("No account found.")
+    now = datetime.utcnow()
+    posting.credit(account.id, amount)
+    ledger.append(REFUND, [(account.id, amount), (None, -amount)])
+    db.session.execute(transactions.insert().values(type=REFUND, amount=amount, user_id=goal.user_id, timestamp=now))
+    goal.saved_amount = 0.0
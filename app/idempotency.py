@@ -0,0 +1,198 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, current_app, jsonify, make_response, request
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+
+from .models import IdempotencyKey, db
+from .utils import TTLCache
+
+keys = IdempotencyKey.__table__
+HEADER = "Idempotency-Key"
+
+# (user_id, key) -> completed response; in front of the table so retry
+# storms are answered without a database round trip
+_cache = TTLCache()
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+def configure(maxsize, ttl):
+    _cache.maxsize = maxsize
+    _cache.ttl = ttl
+    _cache.clear()
+
+
+def _request_hash():
+    form = sorted((k, v) for k, v in request.form.items(multi=True) if k != "csrf_token")
+    payload = json.dumps([request.method, request.path, form, request.get_json(silent=True)], default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(stored):
+    response = Response(stored["body"], status=stored["status_code"], content_type=stored["content_type"])
+    if stored["location"]:
+        response.headers["Location"] = stored["location"]
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _load(user_id, key, ttl):
+    row = db.session.execute(
+        db.select(keys).where(keys.c.user_id == user_id, keys.c.key == key)
+    ).mappings().first()
+    if row is not None and row["created_at"] < datetime.utcnow() - timedelta(seconds=ttl):
+        db.session.execute(keys.delete().where(keys.c.user_id == user_id, keys.c.key == key))
+        db.session.commit()
+        return None
+    return row
+
+
+def _take_over(user_id, key, created_at):
+    """Claim a reservation whose request never finished (its worker was
+    killed mid-request) once it is older than IDEMPOTENCY_LOCK_TIMEOUT.
+    Returns the new reservation time, or None if it may still be running."""
+    timeout = current_app.config["IDEMPOTENCY_LOCK_TIMEOUT"]
+    now = datetime.utcnow()
+    if created_at > now - timedelta(seconds=timeout):
+        return None
+    # Conditional on the old time, so of several retries only one wins
+    result = db.session.execute(
+        keys.update()
+        .where(
+            keys.c.user_id == user_id, keys.c.key == key,
+            keys.c.status_code.is_(None), keys.c.created_at == created_at,
+        )
+        .values(created_at=now)
+    )
+    db.session.commit()
+    return now if result.rowcount == 1 else None
+
+
+def _remember(cache_key, stored, ttl):
+    # Only for what is left of the key's IDEMPOTENCY_TTL, so retries cannot
+    # keep it alive here after the table row has expired
+    remaining = ttl - (datetime.utcnow() - stored["created_at"]).total_seconds()
+    if remaining > 0:
+        _cache.set(cache_key, dict(stored), ttl=min(remaining, _cache.ttl))
+
+
+def _conflict(message):
+    return jsonify(error=message), 409
+
+
+def idempotent(view):
+    """Replay the first response to retries carrying the same Idempotency-Key.
+
+    POSTs without the header run as before. The first request with a key
+    reserves it (a row with no status yet), runs the view and stores the
+    response; retries within IDEMPOTENCY_TTL get that response back
+    without running the view, concurrent duplicates get 409, and reusing
+    a key for a different request gets 422. A reservation still without
+    a response after IDEMPOTENCY_LOCK_TIMEOUT is taken over by the retry.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER, "").strip()
+        if request.method != "POST" or not key or not current_user.is_authenticated:
+            return view(*args, **kwargs)
+        if len(key) > 100:
+            return jsonify(error=f"{HEADER} must be at most 100 characters."), 400
+
+        ttl = current_app.config["IDEMPOTENCY_TTL"]
+        cache_key = (current_user.id, key)
+        request_hash = _request_hash()
+
+        stored = _cache.get(cache_key)
+        cached = stored is not None
+        if not cached:
+            stored = _load(current_user.id, key, ttl)
+        if stored is None:
+            created_at = datetime.utcnow()
+            try:
+                db.session.execute(keys.insert().values(
+                    user_id=current_user.id, key=key, endpoint=request.endpoint,
+                    request_hash=request_hash, created_at=created_at,
+                ))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                stored = _load(current_user.id, key, ttl)
+                if stored is None:
+                    return _conflict("A request with this Idempotency-Key is still being processed.")
+
+        if stored is not None:
+            if stored["endpoint"] != request.endpoint or stored["request_hash"] != request_hash:
+                return jsonify(error=f"{HEADER} was already used for a different request."), 422
+            if stored["status_code"] is not None:
+                if not cached:
+                    _remember(cache_key, stored, ttl)
+                return _replay(stored)
+            created_at = _take_over(current_user.id, key, stored["created_at"])
+            if created_at is None:
+                return _conflict("A request with this Idempotency-Key is still being processed.")
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            _release(current_user.id, key)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            _release(current_user.id, key)
+            return response
+
+        stored = {
+            "endpoint": request.endpoint,
+            "request_hash": request_hash,
+            "status_code": response.status_code,
+            "location": response.headers.get("Location"),
+            "content_type": response.content_type,
+            "body": response.get_data(),
+            "created_at": created_at,
+        }
+        db.session.execute(
+            keys.update()
+            .where(keys.c.user_id == current_user.id, keys.c.key == key)
+            .values(**{name: stored[name] for name in ("status_code", "location", "content_type", "body")})
+        )
+        db.session.commit()
+        _remember(cache_key, stored, ttl)
+        _maybe_purge(ttl)
+        return response
+    return wrapper
+
+
+def _release(user_id, key):
+    db.session.execute(keys.delete().where(keys.c.user_id == user_id, keys.c.key == key))
+    db.session.commit()
+
+
+# -- Purging --
+def purge_expired(ttl):
+    """Delete keys older than `ttl` seconds; returns the number deleted."""
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+    result = db.session.execute(keys.delete().where(keys.c.created_at < cutoff))
+    db.session.commit()
+    _cache.purge()
+    return result.rowcount
+
+
+def _maybe_purge(ttl):
+    # Opportunistic: at most once per IDEMPOTENCY_PURGE_INTERVAL per worker,
+    # for deployments without a scheduler for `flask idempotency purge`
+    global _last_purge
+    interval = current_app.config["IDEMPOTENCY_PURGE_INTERVAL"]
+    now = time.monotonic()
+    if now - _last_purge < interval or not _purge_lock.acquire(blocking=False):
+        return
+    try:
+        _last_purge = now
+        purge_expired(ttl)
+    finally:
+        _purge_lock.release()
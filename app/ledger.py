@@ -0,0 +1,136 @@
+import uuid
+from datetime import datetime
+
+from .models import Account, BalanceSnapshot, JournalEntry, db
+
+journal = JournalEntry.__table__
+snapshots = BalanceSnapshot.__table__
+accounts = Account.__table__
+
+
+class UnbalancedPosting(ValueError):
+    """The entries of a posting do not sum to zero."""
+
+
+# -- Journal --
+# Every balance change is appended here in the same transaction as the
+# conditional UPDATE on account.balance. The UPDATE is what stops two
+# requests from spending the same money; the journal is the history the
+# balance can always be rebuilt and checked from.
+
+def append(kind, entries):
+    """Append one posting: `entries` is a list of (account_id, amount)
+    pairs, account_id None for the cash side, summing to zero."""
+    if abs(sum(amount for _, amount in entries)) > 0.005:
+        raise UnbalancedPosting(f"{kind} posting does not balance")
+    ref = uuid.uuid4().hex
+    now = datetime.utcnow()
+    db.session.execute(journal.insert(), [
+        {"posting_ref": ref, "account_id": account_id, "amount": amount, "kind": kind, "created_at": now}
+        for account_id, amount in entries
+    ])
+    return ref
+
+
+def close(account_ids):
+    """Post what closing accounts still hold back to the cash side, in the
+    caller's transaction. Their entries outlive them, and SQLite may give
+    a deleted account's id to the next new account, which must start at
+    zero."""
+    for account_id in account_ids:
+        balance = balance_of(account_id)
+        if balance:
+            append("Close", [(account_id, -balance), (None, balance)])
+
+
+def balance_of(account_id):
+    """Latest snapshot plus the journal entries appended after it."""
+    snapshot = db.session.execute(
+        db.select(snapshots.c.balance, snapshots.c.last_entry_id).where(snapshots.c.account_id == account_id)
+    ).first()
+    balance, last_entry_id = snapshot if snapshot else (0.0, 0)
+    tail = db.session.execute(
+        db.select(db.func.coalesce(db.func.sum(journal.c.amount), 0.0))
+        .where(journal.c.account_id == account_id, journal.c.id > last_entry_id)
+    ).scalar()
+    return round(balance + tail, 2)
+
+
+# -- Compaction --
+def compact(chunk_size=1000):
+    """Roll every snapshot forward to the newest journal entry, one range
+    of account ids per transaction. Returns the number of accounts touched."""
+    high = db.session.execute(db.select(db.func.max(journal.c.id))).scalar()
+    if high is None:
+        return 0
+
+    # Accounts that have entries but no snapshot yet start from zero
+    db.session.execute(snapshots.insert().from_select(
+        ["account_id", "balance", "last_entry_id", "taken_at"],
+        db.select(
+            journal.c.account_id, db.literal(0.0), db.literal(0), db.literal(datetime.utcnow())
+        ).where(
+            journal.c.account_id.isnot(None),
+            journal.c.account_id.not_in(db.select(snapshots.c.account_id)),
+        ).distinct(),
+    ))
+    db.session.commit()
+
+    tail = (
+        db.select(db.func.coalesce(db.func.sum(journal.c.amount), 0.0))
+        .where(
+            journal.c.account_id == snapshots.c.account_id,
+            journal.c.id > snapshots.c.last_entry_id,
+            journal.c.id <= high,
+        )
+        .scalar_subquery()
+    )
+    touched = 0
+    last_account = db.session.execute(db.select(db.func.max(snapshots.c.account_id))).scalar() or 0
+    for start in range(0, last_account + 1, chunk_size):
+        result = db.session.execute(
+            snapshots.update()
+            .where(
+                snapshots.c.account_id >= start,
+                snapshots.c.account_id < start + chunk_size,
+                snapshots.c.last_entry_id < high,
+            )
+            .values(balance=snapshots.c.balance + tail, last_entry_id=high, taken_at=datetime.utcnow())
+        )
+        db.session.commit()
+        touched += result.rowcount
+    return touched
+
+
+def drift(limit=None):
+    """(account_id, account.balance, ledger balance) for every account
+    whose stored balance disagrees with the journal."""
+    tail = (
+        db.select(
+            journal.c.account_id.label("account_id"),
+            db.func.sum(journal.c.amount).label("amount"),
+        )
+        .select_from(journal.outerjoin(snapshots, snapshots.c.account_id == journal.c.account_id))
+        .where(
+            journal.c.account_id.isnot(None),
+            journal.c.id > db.func.coalesce(snapshots.c.last_entry_id, 0),
+        )
+        .group_by(journal.c.account_id)
+        .subquery()
+    )
+    ledger_balance = (
+        db.func.coalesce(snapshots.c.balance, 0.0) + db.func.coalesce(tail.c.amount, 0.0)
+    )
+    query = (
+        db.select(accounts.c.id, accounts.c.balance, ledger_balance)
+        .select_from(
+            accounts
+            .outerjoin(snapshots, snapshots.c.account_id == accounts.c.id)
+            .outerjoin(tail, tail.c.account_id == accounts.c.id)
+        )
+        .where(db.func.abs(db.func.coalesce(accounts.c.balance, 0.0) - ledger_balance) > 0.005)
+        .order_by(accounts.c.id)
+    )
+    if limit:
+        query = query.limit(limit)
+    return db.session.execute(query).all()
@@ -0,0 +1,150 @@
+from datetime import datetime
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import String, type_coerce
+
+from . import amortization
+from .models import Loan, db
+
+loans = Loan.__table__
+APPROVED = "Approved"
+
+# (fingerprint of the loan book, projection made from it)
+_cached = None
+
+
+def invalidate():
+    global _cached
+    _cached = None
+
+
+def _month(column):
+    if db.session.get_bind().dialect.name == "postgresql":
+        return db.func.to_char(column, "YYYY-MM")
+    return type_coerce(db.func.strftime("%Y-%m", column), String)
+
+
+# -- Loading --
+def _fingerprint(this_month):
+    # Cheap enough to run on every page view; catches status changes made
+    # by other workers that this one's invalidate() never saw
+    count, latest, total, last_id = db.session.execute(
+        db.select(db.func.count(), db.func.max(loans.c.approved_at), db.func.sum(loans.c.amount), db.func.max(loans.c.id))
+        .where(loans.c.status == APPROVED)
+    ).one()
+    return (str(this_month), count, latest, total, last_id)
+
+
+def load_book():
+    """Approved loans summed per (rate, tenure, approval month) as arrays,
+    so the database does the heavy lifting and only distinct terms come
+    back. Terms missing on older loans fall back to LOAN_DEFAULT_RATE /
+    LOAN_DEFAULT_TENURE, and a missing approval date to the current month
+    (nothing repaid yet)."""
+    rate = db.func.coalesce(loans.c.interest_rate, current_app.config["LOAN_DEFAULT_RATE"])
+    tenure = db.func.coalesce(loans.c.tenure_months, current_app.config["LOAN_DEFAULT_TENURE"])
+    month = _month(loans.c.approved_at)
+    rows = db.session.execute(
+        db.select(rate, tenure, month, db.func.sum(loans.c.amount), db.func.count())
+        .where(loans.c.status == APPROVED)
+        .group_by(rate, tenure, month)
+    ).all()
+    rates, tenures, months, amounts, counts = zip(*rows) if rows else ((), (), (), (), ())
+    return {
+        "rate": np.array(rates, dtype=np.float64),
+        "tenure": np.clip(np.array(tenures, dtype=np.int64), 1, amortization.MAX_TENURE),
+        "approved": np.array(months, dtype="datetime64[M]"),
+        "amount": np.nan_to_num(np.array(amounts, dtype=np.float64)),
+        "count": np.array(counts, dtype=np.int64),
+    }
+
+
+# -- Projection --
+def project(book, today=None, chunk_size=2000):
+    """Outstanding principal, monthly cash flows and the maturity ladder
+    of the whole book.
+
+    `book` holds loan totals and counts per (rate, tenure, approval
+    month), as from load_book(). Schedules are linear in the principal,
+    so everything sharing (rate, tenure, payments made) is summed into
+    one group whose schedule is computed once for a principal of 1,
+    `chunk_size` groups at a time. Payments fall due monthly from the
+    month after approval; those up to the current month count as made,
+    and the projection starts next month.
+    """
+    this_month = np.datetime64(today or datetime.utcnow().date(), "M")
+    approved = np.where(np.isnat(book["approved"]), this_month, book["approved"])
+    made = np.clip((this_month - approved).astype(np.int64), 0, book["tenure"])
+
+    # One int64 key per (rate, tenure, payments made) keeps np.unique one-dimensional
+    rates, rate_code = np.unique(book["rate"], return_inverse=True)
+    span = amortization.MAX_TENURE + 1
+    keys, inverse = np.unique((rate_code.reshape(-1) * span + book["tenure"]) * span + made, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    group_rate = rates[keys // (span * span)]
+    group_tenure = (keys // span) % span
+    group_made = keys % span
+    principal = np.bincount(inverse, weights=book["amount"], minlength=len(keys))
+    remaining = group_tenure - group_made
+    horizon = int(remaining.max(initial=0))
+
+    flows = {name: np.zeros(horizon) for name in ("payment", "interest", "principal", "balance")}
+    outstanding = np.zeros(len(keys))
+    for start in range(0, len(keys), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        rate, tenure, paid = group_rate[chunk], group_tenure[chunk], group_made[chunk]
+        weight = principal[chunk]
+        payment, interest, principal_paid, balance = amortization.schedules(1.0, rate, tenure)
+
+        index = np.arange(len(rate))
+        unit_left = np.where(paid > 0, balance[index, np.maximum(paid - 1, 0)], 1.0)
+        outstanding[chunk] = np.where(paid < tenure, unit_left, 0.0) * weight
+
+        # Month j of a group's schedule lands j - paid months from now
+        month = np.arange(1, balance.shape[1] + 1)[None, :]
+        rows, columns = np.nonzero((month > paid[:, None]) & (month <= tenure[:, None]))
+        months_ahead = columns - paid[rows]
+        for name, values in (
+            ("payment", payment), ("interest", interest), ("principal", principal_paid), ("balance", balance),
+        ):
+            flows[name] += np.bincount(months_ahead, weights=values[rows, columns] * weight[rows], minlength=horizon)
+
+    # Maturity ladder: active loans and outstanding principal by years left to run
+    years_left = np.maximum(remaining - 1, 0) // 12
+    active_loans = np.bincount(inverse, weights=book["count"], minlength=len(keys)) * (remaining > 0)
+    ladder = np.bincount(years_left, weights=outstanding)
+    maturing = np.bincount(years_left, weights=active_loans)
+
+    months = (this_month + 1 + np.arange(horizon)).astype(str).tolist()
+    return {
+        "totals": {
+            "loans": int(book["count"].sum()),
+            "active": int(book["count"][made < book["tenure"]].sum()),
+            "originated": float(book["amount"].sum()),
+            "outstanding": float(outstanding.sum()),
+            "next_month_inflow": float(flows["payment"][0]) if horizon else 0.0,
+            "future_interest": float(flows["interest"].sum()),
+        },
+        "months": [
+            {"month": month, "payment": p, "interest": i, "principal": pp, "outstanding": b}
+            for month, p, i, pp, b in zip(
+                months, *(flows[name].round(2).tolist() for name in ("payment", "interest", "principal", "balance"))
+            )
+        ],
+        "ladder": [
+            {"years": years, "loans": int(count), "outstanding": round(amount, 2)}
+            for years, (count, amount) in enumerate(zip(maturing.tolist(), ladder.tolist()))
+            if count
+        ],
+    }
+
+
+def exposure(today=None):
+    """The book's projection, recomputed only when the approved loans (or
+    the month) have changed since the last call."""
+    global _cached
+    key = _fingerprint(np.datetime64(today or datetime.utcnow().date(), "M"))
+    if _cached is None or _cached[0] != key:
+        _cached = (key, project(load_book(), today, current_app.config["LOAN_PROJECTION_CHUNK_SIZE"]))
+    return _cached[1]
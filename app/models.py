@@ -2,7 +2,6 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from . import db, login_manager
 from datetime import datetime
-import random
 from werkzeug.security import generate_password_hash, check_password_hash
 import enum
 
@@ -31,7 +30,7 @@ class User(UserMixin, db.Model):
     mobile_number = db.Column(db.String(20), nullable=True)
     email = db.Column(db.String(150), unique=True, nullable=False)
     profile_image = db.Column(db.String(200), nullable=True)
-    is_staff = db.Column(db.Boolean, default=False)
+    is_staff = db.Column(db.Boolean, default=False, index=True)
     is_admin = db.Column(db.Boolean, default=False)
     face_encoding = db.Column(db.LargeBinary, nullable=True)
 
@@ -63,11 +62,16 @@ class User(UserMixin, db.Model):
 
 # -- Utility: Generate Unique Account Number --
 def generate_account_number():
-    for _ in range(10):
-        acc_num = str(random.randint(1000000000, 9999999999))
-        if not Account.query.filter_by(account_number=acc_num).first():
-            return acc_num
-    raise Exception("Failed to generate a unique account number")
+    from .account_numbers import next_account_number
+    return next_account_number()
+
+# -- Account Number Sequence Model --
+# Next unreserved serial per sequence; see account_numbers.py
+class AccountNumberSequence(db.Model):
+    __tablename__ = 'account_number_sequence'
+
+    name = db.Column(db.String(20), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False)
 
 # -- Account Model --
 class Account(db.Model):
@@ -76,11 +80,52 @@ class Account(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     account_number = db.Column(db.String(20), unique=True, nullable=False, default=generate_account_number)
     balance = db.Column(db.Float, default=0.0)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    # Savings a withdrawal must leave behind, and when that amount next
+    # grows (maintained by goal_progress.refresh_locks)
+    locked_amount = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    locked_until = db.Column(db.DateTime, nullable=True, index=True)
+
+# -- Journal Entry Model --
+# Append-only, double-entry: the entries of one posting share a
+# posting_ref and sum to zero. account_id is NULL for the cash side of
+# deposits and withdrawals, and is not a foreign key so the history of a
+# closed account survives it; closing posts the remaining balance back to
+# the cash side (ledger.close) since SQLite may reuse the id.
+class JournalEntry(db.Model):
+    __tablename__ = 'journal_entry'
+    __table_args__ = (
+        db.Index('ix_journal_entry_account_id_id', 'account_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    posting_ref = db.Column(db.String(32), nullable=False, index=True)
+    account_id = db.Column(db.Integer, nullable=True)
+    amount = db.Column(db.Float, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<JournalEntry {self.kind} {self.account_id} {self.amount:+}>"
+
+# -- Balance Snapshot Model --
+# Balance of an account as of journal entry last_entry_id; rolled
+# forward by `flask ledger compact`.
+class BalanceSnapshot(db.Model):
+    __tablename__ = 'balance_snapshot'
+
+    account_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    balance = db.Column(db.Float, nullable=False, default=0.0)
+    last_entry_id = db.Column(db.Integer, nullable=False, default=0)
+    taken_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 # -- Financial Goal Model --
 class FinancialGoal(db.Model):
     __tablename__ = "financial_goal"
+    __table_args__ = (
+        # Goal list per user and the savings-mode lookups on withdrawal
+        db.Index('ix_financial_goal_user_id_saving_mode_created_at', 'user_id', 'saving_mode', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
@@ -92,13 +137,57 @@ class FinancialGoal(db.Model):
     monthly_amount = db.Column(db.Float, default=0.0)
     yearly_amount = db.Column(db.Float, default=0.0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Money moved into the goal by contribution sweeps (goal_sweeps.py),
+    # and when the next contribution is due
+    saved_amount = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    next_contribution_at = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
         return f"<Goal ₹{self.target_amount} by {self.deadline}>"
 
+# -- Goal Sweep Models --
+# One row per contribution sweep. last_goal_id is the checkpoint: chunks
+# commit together with it, so a crashed sweep resumes after the last
+# goal it finished.
+class GoalSweep(db.Model):
+    __tablename__ = 'goal_sweep'
+
+    id = db.Column(db.Integer, primary_key=True)
+    as_of = db.Column(db.DateTime, nullable=False)
+    last_goal_id = db.Column(db.Integer, nullable=False, default=0)
+    goals_swept = db.Column(db.Integer, nullable=False, default=0)
+    amount_swept = db.Column(db.Float, nullable=False, default=0.0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True, index=True)
+
+# Contributions of the chunk being posted; emptied when the chunk commits
+class GoalSweepItem(db.Model):
+    __tablename__ = 'goal_sweep_item'
+
+    sweep_id = db.Column(db.Integer, primary_key=True)
+    goal_id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    funded = db.Column(db.Boolean, nullable=False, default=False)
+
 # -- Transaction Model --
 class Transaction(db.Model):
     __tablename__ = 'transaction'
+    __table_args__ = (
+        # Serves history pages: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        db.Index('ix_transaction_user_id_id', 'user_id', 'id'),
+        # Transaction search (app/search.py)
+        db.Index('ix_transaction_user_id_type_id', 'user_id', 'type', 'id'),
+        db.Index('ix_transaction_type_id', 'type', 'id'),
+        db.Index('ix_transaction_recipient_account_id', 'recipient_account', 'id'),
+        # Staff searches bounded only by date page on (timestamp, id)
+        db.Index('ix_transaction_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_transaction_reported_id', 'id',
+                 sqlite_where=db.text('reported = 1'), postgresql_where=db.text('reported')),
+        db.Index('ix_transaction_is_fraud_id', 'id',
+                 sqlite_where=db.text('is_fraud = 1'), postgresql_where=db.text('is_fraud')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(20))
@@ -114,9 +203,54 @@ class Transaction(db.Model):
     def __repr__(self):
         return f"<Transaction {self.type} ₹{self.amount}>"
 
+# -- Monthly Account Summary Model --
+# Per-account totals for one calendar month (UTC), kept up to date by
+# the posting paths; `flask rollups backfill` rebuilds it from Transaction.
+class MonthlyAccountSummary(db.Model):
+    __tablename__ = 'monthly_account_summary'
+
+    account_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    month = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    deposit_total = db.Column(db.Float, nullable=False, default=0.0)
+    deposit_count = db.Column(db.Integer, nullable=False, default=0)
+    withdrawal_total = db.Column(db.Float, nullable=False, default=0.0)
+    withdrawal_count = db.Column(db.Integer, nullable=False, default=0)
+    transfer_in_total = db.Column(db.Float, nullable=False, default=0.0)
+    transfer_in_count = db.Column(db.Integer, nullable=False, default=0)
+    transfer_out_total = db.Column(db.Float, nullable=False, default=0.0)
+    transfer_out_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<MonthlyAccountSummary {self.account_id} {self.month}>"
+
+# -- Idempotency Key Model --
+# First response to a POST sent with an Idempotency-Key header, replayed
+# to retries of the same request; status_code is NULL while the first
+# request is still running.
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_key'
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    key = db.Column(db.String(100), primary_key=True)
+    endpoint = db.Column(db.String(100), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    location = db.Column(db.String(500), nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.user_id} {self.key}>"
+
 # -- Loan Model --
 class Loan(db.Model):
     __tablename__ = 'loan'
+    __table_args__ = (
+        # Staff queues by status, customer loan list newest-first
+        db.Index('ix_loan_status_id', 'status', 'id'),
+        db.Index('ix_loan_user_id_id', 'user_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Float)
@@ -124,6 +258,10 @@ class Loan(db.Model):
     status = db.Column(db.String(20), default='Pending')
     emi_due = db.Column(db.Float, default=0.0)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # Terms fixed at approval (annual %, months); see loan_book.py
+    interest_rate = db.Column(db.Float, nullable=True)
+    tenure_months = db.Column(db.Integer, nullable=True)
+    approved_at = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
         return f"<Loan ₹{self.amount} - {self.status}>"
@@ -133,11 +271,11 @@ class SpamReport(db.Model):
     __tablename__ = 'spam_report'
 
     id = db.Column(db.Integer, primary_key=True)
-    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    reported_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    reported_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
     reason = db.Column(db.String(255))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     def __repr__(self):
         return f"<SpamReport Transaction {self.transaction_id}>"
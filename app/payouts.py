@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import bindparam
+
+from . import ledger, recipients, rollups
+from .models import db
+from .posting import AccountNotFound, PostingError, accounts, transactions, debit, parse_amount
+
+# Recipient lookups per IN query: SQLite's default limit on bound
+# parameters in one statement is 999
+LOOKUP_CHUNK = 900
+RESULT_FIELDS = ["row", "recipient_account", "amount", "status", "message"]
+
+
+# -- Parsing --
+def parse_csv(text):
+    """Rows of (recipient_account, amount); a header line is optional."""
+    rows = []
+    for record in csv.reader(io.StringIO(text)):
+        if not record or not any(cell.strip() for cell in record):
+            continue
+        if not rows and record[0].strip().lower() in ("recipient_account", "account", "account_number"):
+            continue
+        rows.append((record[0].strip(), record[1].strip() if len(record) > 1 else ""))
+    return rows
+
+
+def parse_json(data):
+    """A list of {"recipient_account": ..., "amount": ...} objects or [account, amount] pairs."""
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    if isinstance(data, dict):
+        data = data.get("payouts", [])
+    rows = []
+    for item in data:
+        if isinstance(item, dict):
+            rows.append((str(item.get("recipient_account", "")).strip(), item.get("amount")))
+        else:
+            account, amount = (list(item) + [None, None])[:2]
+            rows.append((str(account or "").strip(), amount))
+    return rows
+
+
+# -- Posting --
+def run_payouts(sender_user_id, rows):
+    """Post every valid row in one transaction; returns one result per row.
+
+    Recipients are resolved with a few IN queries, the sender is debited
+    the total once (conditionally, like any other debit), credits and
+    Transaction rows go out as executemany batches, and everything
+    commits together. If the sender cannot cover the total, nothing is
+    posted.
+    """
+    results = [
+        {"row": i, "recipient_account": account, "amount": amount, "status": "rejected", "message": ""}
+        for i, (account, amount) in enumerate(rows, start=1)
+    ]
+
+    valid = []
+    for result in results:
+        try:
+            result["amount"] = parse_amount(result["amount"])
+        except (TypeError, ValueError, PostingError):
+            result["message"] = "Invalid amount."
+            continue
+        if not result["recipient_account"]:
+            result["message"] = "Missing recipient account."
+            continue
+        valid.append(result)
+
+    sender = db.session.execute(
+        db.select(accounts.c.id, accounts.c.account_number).where(accounts.c.user_id == sender_user_id)
+    ).first()
+    if sender is None:
+        for result in valid:
+            result["message"] = "No account found."
+        return results
+
+    numbers = sorted({result["recipient_account"] for result in valid})
+    resolved = recipients.resolve_many(numbers, LOOKUP_CHUNK)
+
+    postable = []
+    for result in valid:
+        if result["recipient_account"] in resolved:
+            postable.append(result)
+        else:
+            result["message"] = "Invalid recipient."
+    if not postable:
+        return results
+
+    # (account id, account number) -> amount; both must still match when
+    # crediting, since a cached recipient's id may have been reused
+    credits = {}
+    for result in postable:
+        recipient = resolved[result["recipient_account"]]
+        key = (recipient.account_id, recipient.account_number)
+        credits[key] = credits.get(key, 0.0) + result["amount"]
+    total = sum(credits.values())
+
+    now = datetime.utcnow()
+    try:
+        debit(sender.id, total)
+        credited = db.session.execute(
+            accounts.update()
+            .where(accounts.c.id == bindparam("account_id"), accounts.c.account_number == bindparam("number"))
+            .values(balance=accounts.c.balance + bindparam("credit")),
+            [
+                {"account_id": account_id, "number": number, "credit": credit}
+                for (account_id, number), credit in credits.items()
+            ],
+        )
+        if credited.rowcount != len(credits):
+            # A recipient closed after it was resolved (or cached)
+            recipients.invalidate(*numbers)
+            raise AccountNotFound("A recipient account no longer exists; nothing was posted.")
+        ledger.append("Payout", [(sender.id, -total)] + [
+            (account_id, credit) for (account_id, _), credit in credits.items()
+        ])
+        tx_rows, rollup_rows = [], []
+        for result in postable:
+            recipient = resolved[result["recipient_account"]]
+            tx_rows.append({
+                "type": "Transfer Sent",
+                "amount": result["amount"],
+                "user_id": sender_user_id,
+                "recipient_account": result["recipient_account"],
+                "timestamp": now,
+            })
+            tx_rows.append({
+                "type": "Transfer Received",
+                "amount": result["amount"],
+                "user_id": recipient.user_id,
+                "recipient_account": sender.account_number,
+                "timestamp": now,
+            })
+            rollup_rows.append((sender.id, "Transfer Sent", result["amount"], now))
+            rollup_rows.append((recipient.account_id, "Transfer Received", result["amount"], now))
+        db.session.execute(transactions.insert(), tx_rows)
+        rollups.record(rollup_rows)
+        db.session.commit()
+    except PostingError as e:
+        db.session.rollback()
+        for result in postable:
+            result["message"] = str(e)
+        return results
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for result in postable:
+        result["status"] = "posted"
+    return results
+
+
+def results_csv(results):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS)
+    writer.writeheader()
+    writer.writerows(results)
+    return out.getvalue()
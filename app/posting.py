@@ -0,0 +1,163 @@
+from datetime import datetime
+
+from . import ledger, recipients, rollups
+from .models import Account, Transaction, db
+
+accounts = Account.__table__
+transactions = Transaction.__table__
+
+
+class PostingError(Exception):
+    """A posting was refused; the message is safe to show to the customer."""
+
+
+class AccountNotFound(PostingError):
+    pass
+
+
+class InsufficientFunds(PostingError):
+    pass
+
+
+class SavingsLocked(PostingError):
+    pass
+
+
+# -- Balance postings --
+# Every posting is a handful of Core statements in one short transaction:
+# balances change with conditional UPDATEs evaluated by the database, so
+# two concurrent requests can never both spend the same money, and no ORM
+# objects are loaded along the way. Each posting also appends its
+# double-entry lines to the journal (see ledger.py) and its amounts to the
+# monthly summaries (see rollups.py) in the same transaction.
+
+def account_row(user_id):
+    """(id, account_number, locked_until) of a user's account, or None."""
+    return db.session.execute(
+        db.select(accounts.c.id, accounts.c.account_number, accounts.c.locked_until)
+        .where(accounts.c.user_id == user_id)
+    ).first()
+
+
+def parse_amount(value):
+    amount = float(value)
+    if amount <= 0:
+        raise PostingError("Amount must be positive.")
+    return amount
+
+
+def credit(account_id, amount, account_number=None):
+    """Add `amount`; with `account_number`, only if the id still belongs to
+    that account (a cached recipient's id may since have been reused)."""
+    match = [accounts.c.id == account_id]
+    if account_number is not None:
+        match.append(accounts.c.account_number == account_number)
+    result = db.session.execute(
+        accounts.update()
+        .where(*match)
+        .values(balance=accounts.c.balance + amount)
+    )
+    if result.rowcount != 1:
+        raise AccountNotFound("Account not found." if account_number is None else "Invalid recipient.")
+
+
+def debit(account_id, amount, keep=0.0):
+    """Take `amount` only if at least `amount + keep` is available; `keep`
+    may be a column such as accounts.c.locked_amount."""
+    result = db.session.execute(
+        accounts.update()
+        .where(accounts.c.id == account_id, accounts.c.balance >= amount + keep)
+        .values(balance=accounts.c.balance - amount)
+    )
+    if result.rowcount == 1:
+        return
+    balance = db.session.execute(
+        db.select(accounts.c.balance).where(accounts.c.id == account_id)
+    ).scalar()
+    if balance is None:
+        raise AccountNotFound("Account not found.")
+    if balance < amount:
+        raise InsufficientFunds("Insufficient balance.")
+    raise SavingsLocked("Withdrawal not allowed. You have not met your savings goal.")
+
+
+def _post(work):
+    try:
+        result = work()
+        db.session.commit()
+        return result
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def deposit(account_id, user_id, amount):
+    amount = parse_amount(amount)
+
+    def work():
+        now = datetime.utcnow()
+        credit(account_id, amount)
+        ledger.append("Deposit", [(account_id, amount), (None, -amount)])
+        db.session.execute(transactions.insert().values(type="Deposit", amount=amount, user_id=user_id, timestamp=now))
+        rollups.record([(account_id, "Deposit", amount, now)])
+
+    _post(work)
+
+
+def withdraw(account_id, user_id, amount):
+    """Withdraw, leaving the account's locked savings goal money behind."""
+    amount = parse_amount(amount)
+
+    def work():
+        now = datetime.utcnow()
+        debit(account_id, amount, keep=accounts.c.locked_amount)
+        ledger.append("Withdraw", [(account_id, -amount), (None, amount)])
+        db.session.execute(transactions.insert().values(type="Withdraw", amount=amount, user_id=user_id, timestamp=now))
+        rollups.record([(account_id, "Withdraw", amount, now)])
+
+    _post(work)
+
+
+def transfer(sender_user_id, recipient_account_number, amount):
+    """Move money between accounts; returns the recipient account number."""
+    amount = parse_amount(amount)
+    sender = account_row(sender_user_id)
+    recipient = recipients.resolve(recipient_account_number)
+    if sender is None:
+        raise AccountNotFound("No account found.")
+    if recipient is None:
+        raise AccountNotFound("Invalid recipient.")
+
+    def work():
+        now = datetime.utcnow()
+        debit(sender.id, amount)
+        credit(recipient.account_id, amount, recipient.account_number)
+        ledger.append("Transfer", [(sender.id, -amount), (recipient.account_id, amount)])
+        db.session.execute(transactions.insert(), [
+            {
+                "type": "Transfer Sent",
+                "amount": amount,
+                "user_id": sender_user_id,
+                "recipient_account": recipient.account_number,
+                "timestamp": now,
+            },
+            {
+                "type": "Transfer Received",
+                "amount": amount,
+                "user_id": recipient.user_id,
+                "recipient_account": sender.account_number,
+                "timestamp": now,
+            },
+        ])
+        rollups.record([
+            (sender.id, "Transfer Sent", amount, now),
+            (recipient.account_id, "Transfer Received", amount, now),
+        ])
+
+    try:
+        _post(work)
+    except AccountNotFound:
+        # Cached recipient closed since it was resolved
+        recipients.invalidate(recipient.account_number)
+        raise
+    return recipient.account_number
@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+from werkzeug.datastructures import MultiDict
+
+from .models import Loan, SpamReport, Transaction, User, db
+
+
+# -- Hot queries --
+# One entry per customer/staff query that runs on every page view. Each
+# entry calls the same code the route does (search_page, statement_rows,
+# the rollup and goal readers, ...) and every statement it issues is run
+# through EXPLAIN QUERY PLAN; `flask queries check-plans` and
+# tests/test_query_plans.py fail if SQLite would scan a table or sort
+# rows itself. Add new hot paths here along with their index.
+def _search(query, everyone=False, **args):
+    from . import search
+    return search.search_page(query, MultiDict(args), everyone=everyone)
+
+
+def hot_queries():
+    from . import goal_progress, ledger, posting, recipients, rollups, statements
+
+    def by_number():
+        recipients.invalidate("1234567890")
+        return recipients.resolve("1234567890")
+
+    return {
+        "login by email": lambda: User.query.filter_by(email="a@example.com", is_staff=False).first(),
+        "staff customer list": lambda: User.query.filter_by(is_staff=False).all(),
+        "account of user": lambda: posting.account_row(1),
+        "account by number": by_number,
+        "transaction history page": lambda: _search(Transaction.query.filter_by(user_id=1), before="1000"),
+        "history search by type": lambda: _search(Transaction.query.filter_by(user_id=1), type="Deposit"),
+        "history search by date": lambda: _search(
+            Transaction.query.filter_by(user_id=1), start="2026-01-01", end="2026-01-31",
+        ),
+        "history search by amount": lambda: _search(Transaction.query.filter_by(user_id=1), min_amount="100"),
+        "staff search by type": lambda: _search(Transaction.query, True, type="Deposit"),
+        "staff search by recipient": lambda: _search(Transaction.query, True, recipient="1234567890"),
+        "staff search reported": lambda: _search(Transaction.query, True, reported="1"),
+        "staff search fraud": lambda: _search(Transaction.query, True, fraud="1"),
+        "staff search by date": lambda: _search(Transaction.query, True, start="2026-01-01", end="2026-01-31"),
+        "staff search by date, next page": lambda: _search(Transaction.query, True, end="2026-01-31", before="1000"),
+        "staff search by date and amount": lambda: _search(
+            Transaction.query, True, start="2026-01-01", min_amount="100", reported="0",
+        ),
+        "statement rows": lambda: list(statements.statement_rows(
+            1, datetime(2026, 1, 1), datetime(2026, 2, 1), chunk_size=1000,
+        )),
+        "monthly summary of account": lambda: rollups.account_months(1),
+        "journal tail of account": lambda: ledger.balance_of(1),
+        "goals of user": lambda: goal_progress.load_user(1),
+        "lock refresh": lambda: goal_progress.refresh_locks([1, 2]),
+        "accounts with due locks": lambda: db.session.execute(
+            goal_progress.due_locks(datetime(2026, 1, 1))
+        ).all(),
+        "loans by status": lambda: Loan.query.filter_by(status="Pending").all(),
+        "loans of user": lambda: Loan.query.filter_by(user_id=1).order_by(Loan.id.desc()).all(),
+        "spam reports newest first": lambda: SpamReport.query.order_by(SpamReport.timestamp.desc()).all(),
+        "spam reports by reporter": lambda: SpamReport.query.filter_by(user_id=1).all(),
+        "spam reports by reported user": lambda: SpamReport.query.filter_by(reported_user_id=1).all(),
+    }
+
+
+@contextmanager
+def _recorded():
+    """Collect (sql, parameters) of every SELECT/UPDATE/DELETE issued."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+def _is_full_scan(detail):
+    # "SCAN t" reads the whole table; "SCAN t USING [COVERING] INDEX" walks
+    # an index in order (only acceptable when the query has no WHERE, e.g.
+    # a sorted listing); temp B-trees mean a sort in memory. SCANs of
+    # subqueries (e.g. the capped count's anon_1) are not tables.
+    if detail.startswith("USE TEMP B-TREE"):
+        return True
+    words = detail.split()
+    return words[0] == "SCAN" and words[1] in db.metadata.tables and "USING" not in words
+
+
+def explain(sql, parameters=()):
+    """SQLite query plan of `sql` as a list of detail strings."""
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).all()
+    return [row[-1] for row in rows]
+
+
+def check(run):
+    """[(sql, plan lines, full-scan lines)] for every statement `run()`
+    issues. Whatever it wrote is rolled back."""
+    try:
+        with _recorded() as statements:
+            run()
+        results = []
+        for sql, parameters in statements:
+            plan = explain(sql, parameters)
+            results.append((sql, plan, [line for line in plan if _is_full_scan(line)]))
+        return results
+    finally:
+        db.session.rollback()
+
+
+def check_plans():
+    """{name: check() results} for every hot query."""
+    return {name: check(run) for name, run in hot_queries().items()}
@@ -0,0 +1,63 @@
+from collections import namedtuple
+
+from .models import Account, User, db
+from .utils import TTLCache
+
+accounts = Account.__table__
+users = User.__table__
+
+Recipient = namedtuple("Recipient", "account_id user_id account_number name")
+
+# account_number -> Recipient. Only hits are cached, so a new account is
+# visible at once. A deleted account is dropped here by the worker that
+# deletes it; other workers keep it until the TTL runs out. SQLite can
+# hand a deleted account's id to the next new account, so credits match
+# on both id and account_number: a stale entry then updates no row and
+# the transfer is refused as an invalid recipient.
+_cache = TTLCache()
+
+
+def configure(maxsize, ttl):
+    _cache.maxsize = maxsize
+    _cache.ttl = ttl
+    _cache.clear()
+
+
+def _query(numbers):
+    return db.session.execute(
+        db.select(accounts.c.id, accounts.c.user_id, accounts.c.account_number, users.c.name, users.c.username)
+        .select_from(accounts.join(users, users.c.id == accounts.c.user_id))
+        .where(accounts.c.account_number.in_(numbers))
+    ).all()
+
+
+def resolve_many(numbers, chunk_size=900):
+    """{account_number: Recipient} for the numbers that exist; cached ones
+    cost nothing, the rest are looked up with chunked IN queries."""
+    found, missing = {}, []
+    for number in numbers:
+        recipient = _cache.get(number)
+        if recipient is None:
+            missing.append(number)
+        else:
+            found[number] = recipient
+    for start in range(0, len(missing), chunk_size):
+        for account_id, user_id, number, name, username in _query(missing[start:start + chunk_size]):
+            recipient = Recipient(account_id, user_id, number, name or username)
+            _cache.set(number, recipient)
+            found[number] = recipient
+    return found
+
+
+def resolve(account_number):
+    return resolve_many([account_number]).get(account_number)
+
+
+def invalidate(*account_numbers):
+    for number in account_numbers:
+        _cache.pop(number)
+
+
+def masked_name(name):
+    """'Asha Menon' -> 'A*** M****': enough to confirm a payee, not to harvest names."""
+    return " ".join(part[0] + "*" * (len(part) - 1) for part in (name or "").split())
@@ -0,0 +1,124 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .models import Account, MonthlyAccountSummary, Transaction, db
+
+summaries = MonthlyAccountSummary.__table__
+accounts = Account.__table__
+transactions = Transaction.__table__
+
+# Transaction.type -> column prefix in monthly_account_summary
+KINDS = {
+    "Deposit": "deposit",
+    "Withdraw": "withdrawal",
+    "Transfer Received": "transfer_in",
+    "Transfer Sent": "transfer_out",
+}
+COLUMNS = [f"{kind}_{stat}" for kind in KINDS.values() for stat in ("total", "count")]
+
+
+def month_of(when):
+    return when.strftime("%Y-%m")
+
+
+def _upsert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(summaries)
+    if dialect == "postgresql":
+        return postgresql.insert(summaries)
+    raise RuntimeError(f"monthly rollups need INSERT ... ON CONFLICT, not available on {dialect}")
+
+
+# -- Incremental updates --
+def record(rows):
+    """Add postings to their month's summary, in the caller's transaction.
+
+    `rows` are (account_id, transaction type, amount, datetime); they are
+    folded per (account, month) first, so a bulk payout is still one
+    upsert per account touched.
+    """
+    deltas = {}
+    for account_id, tx_type, amount, when in rows:
+        kind = KINDS[tx_type]
+        delta = deltas.setdefault((account_id, month_of(when)), dict.fromkeys(COLUMNS, 0))
+        delta[f"{kind}_total"] += amount
+        delta[f"{kind}_count"] += 1
+    if not deltas:
+        return
+    insert = _upsert()
+    db.session.execute(
+        insert.on_conflict_do_update(
+            index_elements=["account_id", "month"],
+            set_={column: summaries.c[column] + insert.excluded[column] for column in COLUMNS},
+        ),
+        [{"account_id": account_id, "month": month, **delta} for (account_id, month), delta in deltas.items()],
+    )
+
+
+def forget(account_ids):
+    """Delete the summaries of accounts being closed, in the caller's
+    transaction. SQLite may give a deleted account's id to the next new
+    account, which would otherwise inherit its months."""
+    if account_ids:
+        db.session.execute(summaries.delete().where(summaries.c.account_id.in_(account_ids)))
+
+
+# -- Backfill --
+def _month_expression(column):
+    if db.session.get_bind().dialect.name == "postgresql":
+        return db.func.to_char(column, "YYYY-MM")
+    return db.func.strftime("%Y-%m", column)
+
+
+def backfill(chunk_size=1000):
+    """Rebuild the summaries from Transaction, one range of account ids
+    per transaction. Returns the number of summary rows written."""
+    month = _month_expression(transactions.c.timestamp)
+    aggregates = []
+    for tx_type, kind in KINDS.items():
+        matches = transactions.c.type == tx_type
+        aggregates.append(db.func.coalesce(db.func.sum(db.case((matches, transactions.c.amount), else_=0.0)), 0.0))
+        aggregates.append(db.func.coalesce(db.func.sum(db.case((matches, 1), else_=0)), 0))
+
+    written = 0
+    last_account = db.session.execute(db.select(db.func.max(accounts.c.id))).scalar() or 0
+    for start in range(0, last_account + 1, chunk_size):
+        in_chunk = (accounts.c.id >= start, accounts.c.id < start + chunk_size)
+        db.session.execute(summaries.delete().where(
+            summaries.c.account_id >= start, summaries.c.account_id < start + chunk_size,
+        ))
+        result = db.session.execute(summaries.insert().from_select(
+            ["account_id", "month", *COLUMNS],
+            db.select(accounts.c.id, month, *aggregates)
+            .select_from(transactions.join(accounts, accounts.c.user_id == transactions.c.user_id))
+            .where(*in_chunk, transactions.c.type.in_(KINDS), transactions.c.timestamp.isnot(None))
+            .group_by(accounts.c.id, month),
+        ))
+        db.session.commit()
+        written += max(result.rowcount, 0)
+    return written
+
+
+# -- Reads --
+def account_months(account_id, limit=12):
+    """The account's most recent monthly summaries, newest first."""
+    return db.session.execute(
+        db.select(summaries)
+        .where(summaries.c.account_id == account_id)
+        .order_by(summaries.c.month.desc())
+        .limit(limit)
+    ).all()
+
+
+def bank_months(limit=12):
+    """Totals across all accounts per month, newest first."""
+    return db.session.execute(
+        db.select(
+            summaries.c.month,
+            db.func.count().label("accounts"),
+            *(db.func.sum(summaries.c[column]).label(column) for column in COLUMNS),
+        )
+        .group_by(summaries.c.month)
+        .order_by(summaries.c.month.desc())
+        .limit(limit)
+    ).all()
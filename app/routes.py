@@ -1,5 +1,5 @@
 from flask import (
-    Blueprint, render_template, redirect, url_for, request, flash, current_app, make_response
+    Blueprint, render_template, redirect, url_for, request, flash, current_app, make_response, jsonify
 )
 from flask_login import login_user, login_required, logout_user, current_user
 from werkzeug.utils import secure_filename
@@ -10,15 +10,14 @@ from .forms import (
 from .models import (
     User, Account, Transaction, Loan, SpamReport, FinancialGoal, db, SavingMode
 )
-from datetime import datetime, timezone
+from datetime import datetime
 from functools import wraps
 import os
-import base64
-import pickle
-from io import BytesIO
-from PIL import Image
-import numpy as np
-import face_recognition
+from . import ledger, payouts, posting, recipients, rollups, search
+from .statements import statement_response
+from .idempotency import idempotent
+from .face_pool import encoder_pool, EncoderBusy
+from .face_preprocess import decode_data_url, ImageRejected
 
 main = Blueprint("main", __name__)
 
@@ -33,15 +32,6 @@ def nocache(view):
         return response
     return no_cache
 
-# Helper: Ensure account exists
-def get_or_create_account(user):
-    if not user.account:
-        account = Account(user_id=user.id)
-        db.session.add(account)
-        db.session.commit()
-        return account
-    return user.account
-
 @main.route("/")
 @nocache
 def home():
@@ -100,7 +90,7 @@ def logout():
     flash("Logged out.", "success")
     return redirect(url_for("main.landing"))
 
-from .utils import get_or_create_account 
+from .utils import get_or_create_account
 
 @main.route("/dashboard")
 @login_required
@@ -131,7 +121,10 @@ def goals():
             deadline=form.deadline.data,
             saving_mode=SavingMode[form.saving_mode.data]  # Use Enum
         )
+        from . import goal_progress, goal_sweeps
+        goal_sweeps.schedule(goal)
         db.session.add(goal)
+        goal_progress.refresh_locks([current_user.id])
         db.session.commit()
         flash("Goal set successfully.", "success")
         return redirect(url_for("main.goals"))  # Redirect to goals page
@@ -156,6 +149,9 @@ def saving_mode(goal_id):
         goal.weekly_amount = form.weekly_amount.data
         goal.monthly_amount = form.monthly_amount.data
         goal.yearly_amount = form.yearly_amount.data
+        from . import goal_progress, goal_sweeps
+        goal_sweeps.schedule(goal)
+        goal_progress.refresh_locks([current_user.id])
         db.session.commit()
         flash("Saving mode updated successfully.", "success")
         return redirect(url_for("main.goals"))
@@ -171,25 +167,42 @@ def delete_goal(goal_id):
         flash("Unauthorized action.", "danger")
         return redirect(url_for("main.goals"))
     
+    from . import goal_progress, goal_sweeps
+    try:
+        # Savings already swept into the goal go back to the account
+        goal_sweeps.refund(goal)
+    except posting.PostingError as e:
+        db.session.rollback()
+        flash(str(e), "danger")
+        return redirect(url_for("main.goals"))
     db.session.delete(goal)
+    goal_progress.refresh_locks([current_user.id])
     db.session.commit()
     flash("Goal deleted successfully.", "info")
     return redirect(url_for("main.goals"))
 
+# Route: Goal Progress (JSON)
+@main.route("/goals/progress")
+@login_required
+@nocache
+def goal_progress_json():
+    from . import goal_progress
+    return jsonify(goals=goal_progress.user_progress(current_user.id))
+
 # Route: Deposit Money
 @main.route("/deposit", methods=["GET", "POST"])
 @login_required
 @nocache
+@idempotent
 def deposit():
     form = DepositForm()
     if form.validate_on_submit():
-        account = get_or_create_account(current_user)
-        account.balance += form.amount.data
-        transaction = Transaction(
-            type="Deposit", amount=form.amount.data, user_id=current_user.id
-        )
-        db.session.add(transaction)
-        db.session.commit()
+        account = posting.account_row(current_user.id) or get_or_create_account(current_user)
+        try:
+            posting.deposit(account.id, current_user.id, form.amount.data)
+        except posting.PostingError as e:
+            flash(str(e), "danger")
+            return redirect(url_for("main.deposit"))
         flash("Amount deposited.", "success")
         return redirect(url_for("main.dashboard"))
     return render_template("deposit.html", form=form)
@@ -198,65 +211,25 @@ def deposit():
 @main.route("/withdraw", methods=["GET", "POST"])
 @login_required
 @nocache
+@idempotent
 def withdraw():
     form = WithdrawForm()
     if form.validate_on_submit():
-        account = get_or_create_account(current_user)
+        account = posting.account_row(current_user.id) or get_or_create_account(current_user)
         amount = form.amount.data
 
-        # 1. Fetch the User's Active Goal
-        goal = (
-            FinancialGoal.query.filter_by(user_id=current_user.id)
-            .filter(FinancialGoal.saving_mode != SavingMode.NONE)
-            .order_by(FinancialGoal.created_at.desc())
-            .first()
-        )
+        # The periodic advance has not reached this account yet
+        if account.locked_until is not None and account.locked_until <= datetime.utcnow():
+            from . import goal_progress
+            goal_progress.refresh_locks([current_user.id])
+            db.session.commit()
 
-        if goal:
-            # 2. Calculate Savings Progress
-            # 2. Calculate Savings Progress
-            today = datetime.now(timezone.utc).date()
-
-            if goal.saving_mode == SavingMode.DAILY:
-                days_since_creation = (today - goal.created_at.date()).days
-                expected_savings = goal.daily_amount * days_since_creation
-                weeks_since_creation = (today - goal.created_at.date()).days // 7
-                expected_savings = goal.weekly_amount * weeks_since_creation
-            elif goal.saving_mode == SavingMode.MONTHLY:
-                months_since_creation = (today.year - goal.created_at.year) * 12 + (
-                    today.month - goal.created_at.month
-                )
-                expected_savings = goal.monthly_amount * months_since_creation
-            elif goal.saving_mode == SavingMode.YEARLY:
-                years_since_creation = today.year - goal.created_at.year
-                expected_savings = goal.yearly_amount * years_since_creation
-            else:
-                expected_savings = 0.0
-
-            # 3. Check Savings Target
-            if account.balance < amount:
-                flash("Insufficient balance.", "danger")
-                return redirect(url_for("main.withdraw"))
-
-            if account.balance - amount < expected_savings:
-                flash(
-                    "Withdrawal not allowed. You have not met your savings goal.",
-                    "danger",
-                )
-                return redirect(url_for("main.withdraw"))
-
-        # 4. Prevent Withdrawal (If Necessary)
-        if amount > account.balance:
-            flash("Insufficient balance.", "danger")
+        # Debit only if the balance covers the amount plus the locked savings
+        try:
+            posting.withdraw(account.id, current_user.id, amount)
+        except posting.PostingError as e:
+            flash(str(e), "danger")
             return redirect(url_for("main.withdraw"))
-
-        # 5. Update Savings Progress (If Withdrawal Allowed)
-        account.balance -= amount
-        transaction = Transaction(
-            type="Withdraw", amount=amount, user_id=current_user.id
-        )
-        db.session.add(transaction)
-        db.session.commit()
         flash("Amount withdrawn.", "success")
         return redirect(url_for("main.dashboard"))
     return render_template("withdraw.html", form=form)
@@ -265,41 +238,69 @@ def withdraw():
 @main.route("/transfer", methods=["GET", "POST"])
 @login_required
 @nocache
+@idempotent
 def transfer():
     form = TransferForm()
     if form.validate_on_submit():
-        sender_account = get_or_create_account(current_user)
-        recipient_account = Account.query.filter_by(
-            account_number=form.recipient_account.data
-        ).first()
-        if not recipient_account:
-            flash("Invalid recipient.", "danger")
-            return redirect(url_for("main.transfer"))
-        if form.amount.data > sender_account.balance:
-            flash("Insufficient balance.", "danger")
+        try:
+            posting.transfer(current_user.id, form.recipient_account.data, form.amount.data)
+        except posting.PostingError as e:
+            flash(str(e), "danger")
             return redirect(url_for("main.transfer"))
-        sender_account.balance -= form.amount.data
-        recipient_account.balance += form.amount.data
-
-        sender_tx = Transaction(
-            type="Transfer Sent",
-            amount=form.amount.data,
-            user_id=current_user.id,
-            recipient_account=recipient_account.account_number,
-        )
-        recipient_tx = Transaction(
-            type="Transfer Received",
-            amount=form.amount.data,
-            user_id=recipient_account.user_id,
-            recipient_account=sender_account.account_number,
-        )
-        db.session.add(sender_tx)
-        db.session.add(recipient_tx)
-        db.session.commit()
         flash("Transfer completed.", "success")
         return redirect(url_for("main.dashboard"))
     return render_template("transfer.html", form=form)
 
+# Route: Bulk Payouts
+@main.route("/payouts", methods=["GET", "POST"])
+@login_required
+@nocache
+def bulk_payouts():
+    if request.method == "GET":
+        return render_template("payouts.html")
+
+    upload = request.files.get("file")
+    try:
+        if upload and upload.filename:
+            text = upload.read().decode("utf-8-sig")
+            if upload.filename.lower().endswith(".json"):
+                rows = payouts.parse_json(text)
+            else:
+                rows = payouts.parse_csv(text)
+        else:
+            rows = payouts.parse_json(request.get_data(as_text=True) or "[]")
+    except (UnicodeDecodeError, ValueError, TypeError):
+        if request.is_json:
+            return jsonify(error="Unreadable payout list."), 400
+        flash("Unreadable payout file. Upload a CSV or JSON list of account, amount rows.", "danger")
+        return redirect(url_for("main.bulk_payouts"))
+
+    limit = current_app.config["PAYOUT_MAX_ROWS"]
+    if not rows or len(rows) > limit:
+        message = f"A payout list must have between 1 and {limit} rows."
+        if request.is_json:
+            return jsonify(error=message), 400
+        flash(message, "danger")
+        return redirect(url_for("main.bulk_payouts"))
+
+    results = payouts.run_payouts(current_user.id, rows)
+    if request.is_json:
+        return jsonify(results=results)
+    response = make_response(payouts.results_csv(results))
+    response.headers["Content-Type"] = "text/csv"
+    response.headers["Content-Disposition"] = "attachment; filename=payout_results.csv"
+    return response
+
+# Route: Recipient Preview
+@main.route("/transfer/recipient")
+@login_required
+@nocache
+def recipient_preview():
+    recipient = recipients.resolve(request.args.get("account_number", "").strip())
+    if recipient is None:
+        return jsonify(error="Invalid recipient."), 404
+    return jsonify(account_number=recipient.account_number, name=recipients.masked_name(recipient.name))
+
 # Route: Loan Application
 @main.route("/loan", methods=["GET", "POST"])
 @login_required
@@ -362,17 +363,27 @@ def profile():
 @main.route("/profile/delete", methods=["POST"])
 @login_required
 def delete_profile():
-    user = current_user
+    # The real object: the current_user proxy turns anonymous on logout
+    user = current_user._get_current_object()
     logout_user()
     # Delete related data first to avoid foreign key constraints if any
     Loan.query.filter_by(user_id=user.id).delete()
     FinancialGoal.query.filter_by(user_id=user.id).delete()
     Transaction.query.filter_by(user_id=user.id).delete()
+    closed = db.session.query(Account.id, Account.account_number).filter_by(user_id=user.id).all()
+    account_numbers = [number for _, number in closed]
+    ledger.close([account_id for account_id, _ in closed])
+    rollups.forget([account_id for account_id, _ in closed])
     Account.query.filter_by(user_id=user.id).delete()
     SpamReport.query.filter_by(user_id=user.id).delete()
     SpamReport.query.filter_by(reported_user_id=user.id).delete()
+    user_id = user.id
     db.session.delete(user)
     db.session.commit()
+    # Deferred so numpy is only loaded by workers that touch face data
+    from .face_index import face_index
+    face_index.remove(user_id)
+    recipients.invalidate(*account_numbers)
     flash("Your account has been deleted successfully.", "success")
     return redirect(url_for("main.landing"))
 
@@ -389,12 +400,45 @@ def my_loans():
 @login_required
 @nocache
 def transactions():
-    transactions = (
-        Transaction.query.filter_by(user_id=current_user.id)
-        .order_by(Transaction.id.desc())
-        .all()
-    )
-    return render_template("transactions.html", transactions=transactions)
+    as_json = request.args.get("format") == "json"
+    try:
+        page = search.search_page(Transaction.query.filter_by(user_id=current_user.id), request.args)
+    except ValueError as e:
+        if as_json:
+            return jsonify(error=str(e)), 400
+        flash(str(e), "danger")
+        return redirect(url_for("main.transactions"))
+    if as_json:
+        return jsonify(search.page_json(page))
+    return render_template("transactions.html", types=search.TYPES, **page)
+
+# Route: Monthly Summary
+@main.route("/summary")
+@login_required
+@nocache
+def monthly_summary():
+    account = get_or_create_account(current_user)
+    months = rollups.account_months(account.id, limit=request.args.get("months", 12, type=int))
+    if request.args.get("format") == "json":
+        return jsonify(months=[dict(row._mapping) for row in months])
+    return render_template("monthly_summary.html", months=months)
+
+# Route: Account Statement
+@main.route("/statement")
+@login_required
+@nocache
+def statement():
+    if not request.args.get("format"):
+        return render_template("statement.html")
+    try:
+        return statement_response(
+            current_user.id,
+            f"SmartBank statement - {current_user.username}",
+            "statement", request.args,
+        )
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("main.statement"))
 
 # Route: Report Suspicious Transaction
 @main.route("/report_spam/<int:transaction_id>", methods=["POST"])
@@ -453,31 +497,33 @@ def face_login():
         return redirect(url_for("main.login"))
 
     try:
-        header, encoded = face_data_url.split(",", 1)
-        img_bytes = base64.b64decode(encoded)
-        img = Image.open(BytesIO(img_bytes)).convert("RGB")
-        img_np = np.array(img)
-
-        encodings = face_recognition.face_encodings(img_np)
-        if not encodings:
+        img_bytes = decode_data_url(face_data_url, current_app.config["FACE_MAX_IMAGE_BYTES"])
+        login_encoding, timings = encoder_pool.encode(img_bytes)
+        current_app.logger.info(
+            "face_login timings (ms): %s", ", ".join(f"{k}={v:.1f}" for k, v in timings.items())
+        )
+        if login_encoding is None:
             flash("No face detected in image", "danger")
             return redirect(url_for("main.login"))
 
-        login_encoding = encodings[0]
-
-        users = User.query.all()
-        for user in users:
-            if user.face_encoding:
-                saved_encoding = pickle.loads(user.face_encoding)
-                match = face_recognition.compare_faces([saved_encoding], login_encoding, tolerance=0.5)[0]
-                if match:
-                    login_user(user)
-                    flash("Face login successful!", "success")
-                    return redirect(url_for("main.dashboard"))
+        from .face_index import face_index, matches_stored
+        tolerance = current_app.config["FACE_MATCH_TOLERANCE"]
+        user_id = face_index.match(login_encoding, tolerance)
+        user = User.query.get(user_id) if user_id is not None else None
+        if user and matches_stored(user.face_encoding, login_encoding, tolerance):
+            login_user(user)
+            flash("Face login successful!", "success")
+            return redirect(url_for("main.dashboard"))
 
         flash("No matching user found", "danger")
         return redirect(url_for("main.login"))
 
+    except ImageRejected as e:
+        flash(str(e), "danger")
+        return redirect(url_for("main.login"))
+    except EncoderBusy:
+        flash("Face login is busy right now. Please try again in a moment.", "warning")
+        return render_template("login.html", form=LoginForm()), 503
     except Exception as e:
         flash("Face login failed", "danger")
         print("Face login error:", str(e))
@@ -0,0 +1,151 @@
+from flask import current_app
+
+from .models import Transaction, db
+from .statements import parse_range
+from .utils import keyset_page, transaction_dict
+
+FILTER_ARGS = ("start", "end", "type", "min_amount", "max_amount", "recipient", "reported", "fraud")
+TYPES = ("Deposit", "Withdraw", "Transfer Sent", "Transfer Received", "Goal Contribution", "Goal Refund")
+
+
+def _amount(value, name):
+    try:
+        amount = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number.")
+    if amount < 0:
+        raise ValueError(f"{name} must not be negative.")
+    return amount
+
+
+def _flag(value, name):
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+    raise ValueError(f"{name} must be 1 or 0.")
+
+
+def parse_filters(args):
+    """Validated filters from request args; only the ones given are present.
+    Raises ValueError with a message fit to show the user."""
+    raw = {name: args.get(name, "").strip() for name in FILTER_ARGS}
+    filters = {}
+    if raw["start"] or raw["end"]:
+        filters["start_at"], filters["end_at"] = parse_range(raw["start"], raw["end"])
+    if raw["type"]:
+        if raw["type"] not in TYPES:
+            raise ValueError("Unknown transaction type.")
+        filters["type"] = raw["type"]
+    if raw["min_amount"]:
+        filters["min_amount"] = _amount(raw["min_amount"], "Minimum amount")
+    if raw["max_amount"]:
+        filters["max_amount"] = _amount(raw["max_amount"], "Maximum amount")
+    if raw["recipient"]:
+        filters["recipient"] = raw["recipient"]
+    if raw["reported"]:
+        filters["reported"] = _flag(raw["reported"], "reported")
+    if raw["fraud"]:
+        filters["fraud"] = _flag(raw["fraud"], "fraud")
+    return filters
+
+
+def filter_args(args):
+    """The raw filter args that were set, to carry over into page links."""
+    return {name: args[name] for name in FILTER_ARGS if args.get(name)}
+
+
+# -- Query building --
+# Each filter is a plain predicate; which index serves it depends on the
+# combination (see the Transaction indexes). Per-user searches lead with
+# user_id and page on id. Staff searches over everyone need an anchor:
+# type, recipient or reported/fraud = 1 (paged on id through their
+# indexes), or a date range, which is paged on (timestamp, id) instead.
+# Amount and reported/fraud = 0 are only residual filters on top of an
+# anchor, so on their own they are refused rather than scanning the table.
+def apply_filters(query, filters):
+    if filters.get("start_at"):
+        query = query.filter(Transaction.timestamp >= filters["start_at"])
+    if filters.get("end_at"):
+        query = query.filter(Transaction.timestamp < filters["end_at"])
+    if "type" in filters:
+        query = query.filter(Transaction.type == filters["type"])
+    if "min_amount" in filters:
+        query = query.filter(Transaction.amount >= filters["min_amount"])
+    if "max_amount" in filters:
+        query = query.filter(Transaction.amount <= filters["max_amount"])
+    if "recipient" in filters:
+        query = query.filter(Transaction.recipient_account == filters["recipient"])
+    if "reported" in filters:
+        query = query.filter(Transaction.reported == filters["reported"])
+    if "fraud" in filters:
+        query = query.filter(Transaction.is_fraud == filters["fraud"])
+    return query
+
+
+def _has_id_index(filters):
+    """Whether a filter's own index can serve pages on id."""
+    return "type" in filters or "recipient" in filters or filters.get("reported") or filters.get("fraud")
+
+
+def date_page(query, before=None, size=50):
+    """Like keyset_page, newest first by (timestamp, id) so a date range is
+    one range scan of ix_transaction_timestamp_id. The cursor is still a
+    transaction id; its timestamp is looked up to resume after it."""
+    if before is not None:
+        stamp = db.session.execute(
+            db.select(Transaction.timestamp).where(Transaction.id == before)
+        ).scalar()
+        if stamp is None:
+            query = query.filter(Transaction.id < before)
+        else:
+            query = query.filter(
+                Transaction.timestamp <= stamp,
+                db.or_(Transaction.timestamp < stamp, Transaction.id < before),
+            )
+    rows = query.order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(size + 1).all()
+    next_cursor = rows[size - 1].id if len(rows) > size else None
+    return rows[:size], next_cursor
+
+
+def count_estimate(query, cap):
+    """(count, exact): counts at most `cap` + 1 matching rows, so the cost is
+    bounded however many rows match; exact is False when the cap was hit."""
+    count = query.order_by(None).limit(cap + 1).count()
+    return min(count, cap), count <= cap
+
+
+def search_page(query, args, everyone=False):
+    """One keyset page of `query` narrowed by the filters in `args`, as
+    template/JSON context. `everyone` marks a staff search not limited to
+    one customer. Raises ValueError on bad or unanchored filters."""
+    filters = parse_filters(args)
+    query = apply_filters(query, filters)
+    before = args.get("before", type=int)
+    size = current_app.config["TRANSACTIONS_PAGE_SIZE"]
+    if everyone and not _has_id_index(filters):
+        if not (filters.get("start_at") or filters.get("end_at")):
+            raise ValueError(
+                "Searching all customers needs a date range, type, recipient, or reported/fraud = 1 filter."
+            )
+        transactions, next_cursor = date_page(query, before, size)
+    else:
+        transactions, next_cursor = keyset_page(query, Transaction.id, before, size)
+    count, exact = count_estimate(query, current_app.config["SEARCH_COUNT_CAP"])
+    return {
+        "transactions": transactions,
+        "before": before,
+        "next_cursor": next_cursor,
+        "count": count,
+        "count_exact": exact,
+        "filters": filter_args(args),
+    }
+
+
+def page_json(page):
+    return {
+        "transactions": [transaction_dict(tx) for tx in page["transactions"]],
+        "next": page["next_cursor"],
+        "count": page["count"],
+        "count_exact": page["count_exact"],
+    }
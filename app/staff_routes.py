@@ -1,9 +1,12 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, session, jsonify
 from flask_login import login_user, logout_user, current_user, login_required
 from .models import User, Transaction, Loan, SpamReport, db
 from .staff_form import StaffLoginForm, StaffRegisterForm, ForgotUsernameForm, ForgotPasswordForm
 from .decorators import staff_required
 from .utils import nocache
+from .statements import statement_response
+from . import rollups, search
+from datetime import datetime
 import random
 import string
 
@@ -121,7 +124,17 @@ def update_loan_status(loan_id):
     new_status = request.form.get('status')
     if new_status in ['Approved', 'Rejected']:
         loan.status = new_status
+        if new_status == 'Approved':
+            loan.approved_at = datetime.utcnow()
+            if loan.interest_rate is None:
+                loan.interest_rate = current_app.config['LOAN_DEFAULT_RATE']
+            if loan.tenure_months is None:
+                loan.tenure_months = current_app.config['LOAN_DEFAULT_TENURE']
+            from . import amortization
+            loan.emi_due = amortization.quote(loan.amount, loan.interest_rate, loan.tenure_months).emi
         db.session.commit()
+        from . import loan_book
+        loan_book.invalidate()
         flash(f"Loan #{loan.id} has been {new_status.lower()}.", "success")
     else:
         flash("Invalid status update.", "danger")
@@ -136,6 +149,15 @@ def approved_loans():
     loans = Loan.query.filter_by(status='Approved').all()
     return render_template('approved_loans.html', loans=loans)
 
+@staff_bp.route('/loan_exposure')
+@nocache
+@staff_required
+def loan_exposure():
+    if not current_user.is_authenticated or not current_user.is_staff:
+        return redirect(url_for('main.home'))
+    from . import loan_book
+    return render_template('staff_loan_exposure.html', **loan_book.exposure())
+
 @staff_bp.route('/rejected_loans')
 @nocache
 @staff_required
@@ -179,8 +201,68 @@ def view_user_transactions(user_id):
     if not current_user.is_authenticated or not current_user.is_staff:
         return redirect(url_for('main.home'))
     user = User.query.get_or_404(user_id)
-    transactions = Transaction.query.filter_by(user_id=user.id).all()
-    return render_template('staff_user_transactions.html', user=user, transactions=transactions)
+    as_json = request.args.get('format') == 'json'
+    try:
+        page = search.search_page(Transaction.query.filter_by(user_id=user.id), request.args)
+    except ValueError as e:
+        if as_json:
+            return jsonify(error=str(e)), 400
+        flash(str(e), 'danger')
+        return redirect(url_for('staff.view_user_transactions', user_id=user.id))
+    if as_json:
+        return jsonify(search.page_json(page))
+    return render_template('staff_user_transactions.html', user=user, **page)
+
+@staff_bp.route('/transactions/search')
+@nocache
+@staff_required
+def search_transactions():
+    if not current_user.is_authenticated or not current_user.is_staff:
+        return redirect(url_for('main.home'))
+    query = Transaction.query
+    user_id = request.args.get('user_id', type=int)
+    if user_id:
+        query = query.filter_by(user_id=user_id)
+    try:
+        page = search.search_page(query, request.args, everyone=not user_id)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(search.page_json(page))
+
+@staff_bp.route('/customer/<int:user_id>/statement')
+@nocache
+@staff_required
+def user_statement(user_id):
+    if not current_user.is_authenticated or not current_user.is_staff:
+        return redirect(url_for('main.home'))
+    user = User.query.get_or_404(user_id)
+    try:
+        return statement_response(
+            user.id, f"SmartBank statement - {user.username}",
+            f"statement_{user.id}", request.args,
+        )
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('staff.view_user_transactions', user_id=user.id))
+
+@staff_bp.route('/monthly_summary')
+@nocache
+@staff_required
+def monthly_summary():
+    if not current_user.is_authenticated or not current_user.is_staff:
+        return redirect(url_for('main.home'))
+    months = rollups.bank_months(limit=request.args.get('months', 12, type=int))
+    return render_template('staff_monthly_summary.html', months=months)
+
+@staff_bp.route('/goal_analytics')
+@nocache
+@staff_required
+def goal_analytics():
+    if not current_user.is_authenticated or not current_user.is_staff:
+        return redirect(url_for('main.home'))
+    from . import goal_progress
+    stats = goal_progress.analytics(chunk_size=current_app.config['GOAL_PROGRESS_CHUNK_SIZE'])
+    return render_template('staff_goal_analytics.html', **stats)
 
 @staff_bp.route('/create_key', methods=['POST'])
 @login_required
@@ -0,0 +1,167 @@
+import csv
+import io
+import unicodedata
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, stream_with_context
+
+from .models import Transaction, db
+
+transactions = Transaction.__table__
+CSV_FIELDS = ["id", "timestamp", "type", "amount", "recipient_account"]
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError("Dates must be in YYYY-MM-DD format.")
+
+
+def parse_range(start, end):
+    """(start, end-exclusive) datetimes from YYYY-MM-DD strings; either may be
+    empty. Raises ValueError with a message fit to show the user."""
+    start_at = _date(start) if start else None
+    end_at = _date(end) + timedelta(days=1) if end else None
+    if start_at and end_at and start_at >= end_at:
+        raise ValueError("The start date must not be after the end date.")
+    return start_at, end_at
+
+
+# -- Rows --
+def statement_rows(user_id, start_at=None, end_at=None, chunk_size=1000):
+    """Yield the user's transactions oldest-first, `chunk_size` rows per query.
+
+    Each chunk is a separate keyset query on (user_id, id), so only one
+    chunk of plain rows is held in memory however long the history is.
+    """
+    query = db.select(
+        transactions.c.id, transactions.c.timestamp, transactions.c.type,
+        transactions.c.amount, transactions.c.recipient_account,
+    ).where(transactions.c.user_id == user_id)
+    if start_at:
+        query = query.where(transactions.c.timestamp >= start_at)
+    if end_at:
+        query = query.where(transactions.c.timestamp < end_at)
+    query = query.order_by(transactions.c.id).limit(chunk_size)
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(transactions.c.id > last_id)).all()
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1].id
+
+
+# -- CSV --
+def csv_chunks(rows, chunk_size=1000):
+    """Encode rows as CSV text, one string per `chunk_size` rows."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_FIELDS)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow([
+            row.id,
+            row.timestamp.strftime("%Y-%m-%d %H:%M:%S") if row.timestamp else "",
+            row.type,
+            f"{row.amount:.2f}" if row.amount is not None else "",
+            row.recipient_account or "",
+        ])
+        if i % chunk_size == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue()
+
+
+# -- PDF --
+# fpdf's core fonts only cover latin-1. Other characters (the rupee sign,
+# non-Latin names) are spelled out or stripped of accents where that
+# works, and otherwise replaced with "?" rather than failing the download.
+_PDF_REPLACEMENTS = str.maketrans({
+    "\u20b9": "Rs.", "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"', "\u2013": "-", "\u2014": "-",
+})
+
+
+def _pdf_text(text):
+    text = text.translate(_PDF_REPLACEMENTS)
+    if all(ord(char) < 256 for char in text):
+        return text
+    out = []
+    for char in text:
+        if ord(char) > 255:
+            char = "".join(c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c))
+            char = char.encode("latin-1", "replace").decode("latin-1")
+        out.append(char)
+    return "".join(out)
+
+
+def pdf_statement(title, rows, max_rows):
+    """Render rows to a PDF table page by page; returns the document bytes.
+
+    fpdf 1.7 keeps the document in memory until output(), so the row
+    count is capped at `max_rows`; larger ranges should use the CSV
+    export. Returns None when the cap is exceeded.
+    """
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    widths = (20, 45, 40, 35, 50)
+    headers = ("ID", "Date", "Type", "Amount (INR)", "Recipient")
+
+    def header_row():
+        pdf.set_font("Arial", "B", 9)
+        for width, text in zip(widths, headers):
+            pdf.cell(width, 7, text, border=1)
+        pdf.ln()
+        pdf.set_font("Arial", "", 9)
+
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, _pdf_text(title), ln=1)
+    header_row()
+    count = 0
+    for row in rows:
+        count += 1
+        if count > max_rows:
+            return None
+        if pdf.get_y() > pdf.h - 25:
+            pdf.add_page()
+            header_row()
+        cells = (
+            str(row.id),
+            row.timestamp.strftime("%Y-%m-%d %H:%M") if row.timestamp else "",
+            row.type or "",
+            f"{row.amount:.2f}" if row.amount is not None else "",
+            row.recipient_account or "-",
+        )
+        for width, text in zip(widths, cells):
+            pdf.cell(width, 6, _pdf_text(text), border=1)
+        pdf.ln()
+    if not count:
+        pdf.cell(0, 8, "No transactions in this period.", ln=1)
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def statement_response(user_id, title, filename, args):
+    """CSV (streamed) or PDF download for ?format=&start=&end= query args.
+
+    Raises ValueError with a user-facing message on bad input.
+    """
+    start_at, end_at = parse_range(args.get("start"), args.get("end"))
+    chunk_size = current_app.config["STATEMENT_CHUNK_SIZE"]
+    rows = statement_rows(user_id, start_at, end_at, chunk_size)
+
+    if args.get("format") == "pdf":
+        max_rows = current_app.config["STATEMENT_PDF_MAX_ROWS"]
+        document = pdf_statement(title, rows, max_rows)
+        if document is None:
+            raise ValueError(f"PDF statements are limited to {max_rows} transactions. Narrow the dates or download CSV.")
+        return Response(document, mimetype="application/pdf", headers={
+            "Content-Disposition": f"attachment; filename={filename}.pdf",
+        })
+    return Response(stream_with_context(csv_chunks(rows, chunk_size)), mimetype="text/csv", headers={
+        "Content-Disposition": f"attachment; filename={filename}.csv",
+    })
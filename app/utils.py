@@ -1,4 +1,7 @@
+from collections import OrderedDict
 from functools import wraps
+import threading
+import time
 from flask import make_response, Response
 
 def nocache(view) -> callable:
@@ -12,13 +15,84 @@ def nocache(view) -> callable:
         return response
     return no_cache
 
+# Small per-process cache: least recently used entries are evicted past
+# `maxsize`, and entries older than `ttl` seconds are treated as missing.
+class TTLCache:
+    _MISSING = object()
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, self._MISSING)
+            if item is self._MISSING:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store `value` for `ttl` seconds (the cache's ttl by default)."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def purge(self):
+        """Drop expired entries; returns how many were dropped."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires, _) in self._data.items() if expires < now]
+            for key in expired:
+                del self._data[key]
+            return len(expired)
+
+    def __len__(self):
+        return len(self._data)
+
 from .models import Account, db
-import random
+from .account_numbers import next_account_number
+
+# Keyset pagination: rows come newest-first by `column`, and the cursor is
+# the last value seen, so every page is one index range scan no matter
+# how deep into the history it is.
+def keyset_page(query, column, before=None, size=50):
+    if before is not None:
+        query = query.filter(column < before)
+    rows = query.order_by(column.desc()).limit(size + 1).all()
+    next_cursor = getattr(rows[size - 1], column.key) if len(rows) > size else None
+    return rows[:size], next_cursor
+
+def transaction_dict(tx):
+    return {
+        'id': tx.id,
+        'type': tx.type,
+        'amount': tx.amount,
+        'recipient_account': tx.recipient_account,
+        'timestamp': tx.timestamp.isoformat() if tx.timestamp else None,
+        'reported': bool(tx.reported),
+    }
 
 def get_or_create_account(user):
     if not user.account:
-        account_number = "SB" + str(random.randint(10000000, 99999999))
-        account = Account(user_id=user.id, account_number=account_number, balance=0.0)
+        account = Account(user_id=user.id, account_number=next_account_number(), balance=0.0)
         db.session.add(account)
         db.session.commit()
     return user.account
@@ -0,0 +1,147 @@
+"""Benchmark the face-login match path on synthetic enrolments.
+
+    python benchmarks/face_matching.py [--sizes 1000,10000,100000,1000000]
+                                       [--queries 200] [--backend shared]
+
+For every size a scratch SQLite database is filled with that many `User`
+rows carrying synthetic 128-d encodings. Logins are then posted to
+/face_login through the Flask test client with the encoder pool stubbed
+out, so the numbers cover everything after face detection: request
+handling, index lookup, user load and login. Half of the probes are noisy
+copies of enrolled faces (must log in as that user), half are strangers
+(must be rejected). Runs offline; no camera, dlib or models needed.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.face_codec import ENCODING_DIM, encode_face  # noqa: E402
+from app.face_index import face_index  # noqa: E402
+from app.face_pool import encoder_pool  # noqa: E402
+from app.models import User  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Spread of real dlib encodings: strangers sit ~1.0 apart, the same person
+# photographed twice usually within ~0.35.
+COMPONENT_STD = 0.09
+SAME_PERSON_STD = 0.3 / np.sqrt(ENCODING_DIM)
+INSERT_CHUNK = 10000
+PLACEHOLDER_IMAGE = "data:image/jpeg;base64,AAAA"
+
+
+def peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def populate(size, rng):
+    """Insert `size` users with random encodings; returns (ids, encodings)."""
+    encodings = rng.normal(0.0, COMPONENT_STD, (size, ENCODING_DIM)).astype(np.float32)
+    for start in range(0, size, INSERT_CHUNK):
+        db.session.execute(User.__table__.insert(), [
+            {
+                "username": f"bench{i}",
+                "email": f"bench{i}@example.com",
+                "password_hash": "-",
+                "face_encoding": encode_face(encodings[i]),
+            }
+            for i in range(start, min(start + INSERT_CHUNK, size))
+        ])
+    db.session.commit()
+    ids = np.array(db.session.execute(db.select(User.id).order_by(User.id)).scalars().all())
+    return ids, encodings
+
+
+def run_size(size, queries, backend, workdir, rng):
+    scratch = tempfile.mkdtemp(dir=workdir)
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(scratch, "bench.db"),
+        "FACE_INDEX_BACKEND": backend,
+        "FACE_STORE_DIR": os.path.join(scratch, "face_store"),
+        "FACE_INDEX_PATH": None,
+        "TESTING": True,
+    })
+    probe = {}
+    encoder_pool.encode = lambda img_bytes: (probe["vector"], {})
+    face_index.reset()
+
+    try:
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            ids, encodings = populate(size, rng)
+            populate_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            face_index.ensure_loaded()
+            load_s = time.perf_counter() - start
+
+        picks = rng.choice(size, queries, replace=True)
+        known = rng.random(queries) < 0.5
+        latencies, correct = [], 0
+        for pick, is_known in zip(picks, known):
+            if is_known:
+                vector = encodings[pick] + rng.normal(0.0, SAME_PERSON_STD, ENCODING_DIM)
+                expected = str(ids[pick])
+            else:
+                vector = rng.normal(0.0, COMPONENT_STD, ENCODING_DIM)
+                expected = None
+            probe["vector"] = vector.astype(np.float32)
+
+            client = app.test_client()
+            start = time.perf_counter()
+            client.post("/face_login", data={"face_image": PLACEHOLDER_IMAGE})
+            latencies.append(time.perf_counter() - start)
+            with client.session_transaction() as session:
+                correct += session.get("_user_id") == expected
+
+        latencies = np.array(latencies) * 1000
+        return {
+            "size": size,
+            "populate_s": populate_s,
+            "load_s": load_s,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "peak_rss_mb": peak_rss_mb(),
+            "accuracy": correct / queries,
+        }
+    finally:
+        face_index.reset()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backend", default="shared", help="FACE_INDEX_BACKEND to benchmark.")
+    parser.add_argument("--workdir", default=None, help="Where scratch databases go (default: system temp).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"backend={args.backend} queries={args.queries}")
+    print(f"{'users':>9} {'populate s':>10} {'load s':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak MB':>8} {'accuracy':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        r = run_size(size, args.queries, args.backend, args.workdir, rng)
+        print(f"{r['size']:>9} {r['populate_s']:>10.1f} {r['load_s']:>8.2f} {r['p50_ms']:>8.2f} "
+              f"{r['p99_ms']:>8.2f} {r['peak_rss_mb']:>8.0f} {r['accuracy']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure how long `create_app()` takes from a cold interpreter.
+
+    python benchmarks/startup.py [--runs 5]
+
+Each run is a fresh `python -X importtime` process, so nothing is cached
+between runs. Prints the median wall time, the slowest imports and
+whether any of the heavy face modules were pulled in during start-up.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("numpy", "PIL", "face_recognition", "dlib", "cv2")
+
+SNIPPET = (
+    "import sys\n"
+    "from app import create_app\n"
+    "create_app()\n"
+    "print(','.join(m for m in %r if m in sys.modules))\n" % (HEAVY_MODULES,)
+)
+
+
+def run_once():
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SNIPPET],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under their parent; keep top-level ones
+        if not name[1:].startswith(" "):
+            imports.append((int(cumulative_us), name.strip()))
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return elapsed, imports, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list.")
+    args = parser.parse_args()
+
+    timings, imports, loaded = [], [], []
+    for _ in range(args.runs):
+        elapsed, imports, loaded = run_once()
+        timings.append(elapsed)
+
+    print(f"create_app() cold start over {args.runs} runs: "
+          f"median {statistics.median(timings) * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms")
+    print("Slowest top-level imports (cumulative, last run):")
+    for us, name in sorted(imports, reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    print("Heavy modules loaded at start-up: " + (", ".join(loaded) if loaded else "none"))
+    return 1 if loaded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
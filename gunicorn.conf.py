@@ -0,0 +1,14 @@
+# Picked up automatically by `gunicorn run:app` (Procfile / render.yaml)
+
+
+def post_worker_init(worker):
+    app = worker.wsgi
+    # -w may differ from WEB_CONCURRENCY, which create_app() saw
+    from app import check_web_workers
+    from app.face_pool import encoder_pool, pool_size
+    app.config['WEB_WORKERS'] = worker.cfg.workers
+    check_web_workers(app.config, worker.cfg.workers)
+    encoder_pool.resize(pool_size(app.config))
+    if app.config.get('FACE_WARMUP'):
+        from app.face_pool import warm_up
+        warm_up(app)
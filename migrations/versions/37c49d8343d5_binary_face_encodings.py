@@ -0,0 +1,102 @@
+"""Store face encodings in the binary format instead of pickle
+
+Revision ID: 37c49d8343d5
+Revises: 960067b15322
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+import io
+import pickle
+import struct
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '37c49d8343d5'
+down_revision = '960067b15322'
+branch_labels = None
+depends_on = None
+
+CHUNK_SIZE = 1000
+
+# The stored format as of this revision, copied here so the migration
+# does not change when app.face_codec does: b"FE", version 1, one
+# reserved byte, then 128 little-endian float32.
+ENCODING_DIM = 128
+HEADER = struct.Struct('<2sBx').pack(b'FE', 1)
+PAYLOAD_DTYPE = np.dtype('<f4')
+BLOB_SIZE = len(HEADER) + ENCODING_DIM * PAYLOAD_DTYPE.itemsize
+
+users = sa.table('user', sa.column('id', sa.Integer), sa.column('face_encoding', sa.LargeBinary))
+
+
+def encode_face(encoding):
+    return HEADER + np.asarray(encoding, dtype=PAYLOAD_DTYPE).reshape(ENCODING_DIM).tobytes()
+
+
+def is_current(blob):
+    return blob is not None and len(blob) == BLOB_SIZE and bytes(blob[:len(HEADER)]) == HEADER
+
+
+def decode_face(blob):
+    return np.frombuffer(blob, dtype=PAYLOAD_DTYPE, count=ENCODING_DIM, offset=len(HEADER))
+
+
+class LegacyUnpickler(pickle.Unpickler):
+    # Old rows are pickled ndarrays; refuse anything else
+    ALLOWED = {
+        ('numpy', 'ndarray'),
+        ('numpy', 'dtype'),
+        ('numpy.core.multiarray', '_reconstruct'),
+        ('numpy._core.multiarray', '_reconstruct'),
+        ('numpy.core.numeric', '_frombuffer'),
+        ('numpy._core.numeric', '_frombuffer'),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f'Refusing to load {module}.{name}')
+        return super().find_class(module, name)
+
+
+def upgrade():
+    bind = op.get_bind()
+    update = users.update().where(users.c.id == sa.bindparam('user_id')).values(face_encoding=sa.bindparam('blob'))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(users.c.id, users.c.face_encoding)
+            .where(users.c.id > last_id, users.c.face_encoding.isnot(None))
+            .order_by(users.c.id)
+            .limit(CHUNK_SIZE)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        updates = [
+            {'user_id': user_id, 'blob': encode_face(LegacyUnpickler(io.BytesIO(blob)).load())}
+            for user_id, blob in rows
+            if not is_current(blob)
+        ]
+        if updates:
+            bind.execute(update, updates)
+
+
+def downgrade():
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(users.c.id, users.c.face_encoding).where(users.c.face_encoding.isnot(None))
+    ).all()
+    updates = [
+        {'user_id': user_id, 'blob': pickle.dumps(decode_face(blob).astype(np.float64))}
+        for user_id, blob in rows
+        if is_current(blob)
+    ]
+    if updates:
+        bind.execute(
+            users.update().where(users.c.id == sa.bindparam('user_id')).values(face_encoding=sa.bindparam('blob')),
+            updates,
+        )
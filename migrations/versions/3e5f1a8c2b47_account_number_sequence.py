@@ -0,0 +1,31 @@
+"""Account number sequence for block allocation
+
+Revision ID: 3e5f1a8c2b47
+Revises: 0a9d4e6f7b25
+Create Date: 2026-10-18 18:03:27.915530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e5f1a8c2b47'
+down_revision = '0a9d4e6f7b25'
+branch_labels = None
+depends_on = None
+
+FIRST_SERIAL = 1_000_000_000
+
+
+def upgrade():
+    sequence = op.create_table('account_number_sequence',
+    sa.Column('name', sa.String(length=20), nullable=False),
+    sa.Column('next_value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(sequence, [{'name': 'account', 'next_value': FIRST_SERIAL}])
+
+
+def downgrade():
+    op.drop_table('account_number_sequence')
@@ -0,0 +1,30 @@
+"""Loan terms and approval date
+
+Revision ID: 4c8e2b7d1f60
+Revises: d2a7c5e9f184
+Create Date: 2026-10-18 21:48:31.502716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8e2b7d1f60'
+down_revision = 'd2a7c5e9f184'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('loan') as batch_op:
+        batch_op.add_column(sa.Column('interest_rate', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('tenure_months', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('approved_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('loan') as batch_op:
+        batch_op.drop_column('approved_at')
+        batch_op.drop_column('tenure_months')
+        batch_op.drop_column('interest_rate')
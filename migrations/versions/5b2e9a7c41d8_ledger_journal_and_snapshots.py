@@ -0,0 +1,65 @@
+"""Append-only journal and balance snapshots
+
+Revision ID: 5b2e9a7c41d8
+Revises: 37c49d8343d5
+Create Date: 2026-10-18 11:02:17.540913
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e9a7c41d8'
+down_revision = '37c49d8343d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('journal_entry',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('posting_ref', sa.String(length=32), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_journal_entry_posting_ref', 'journal_entry', ['posting_ref'], unique=False)
+    op.create_index('ix_journal_entry_account_id_id', 'journal_entry', ['account_id', 'id'], unique=False)
+    op.create_table('balance_snapshot',
+    sa.Column('account_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('balance', sa.Float(), nullable=False),
+    sa.Column('last_entry_id', sa.Integer(), nullable=False),
+    sa.Column('taken_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('account_id')
+    )
+
+    # Existing balances predate the journal: they become the opening snapshots
+    account = sa.table('account', sa.column('id', sa.Integer), sa.column('balance', sa.Float))
+    snapshot = sa.table(
+        'balance_snapshot',
+        sa.column('account_id', sa.Integer),
+        sa.column('balance', sa.Float),
+        sa.column('last_entry_id', sa.Integer),
+        sa.column('taken_at', sa.DateTime),
+    )
+    op.execute(snapshot.insert().from_select(
+        ['account_id', 'balance', 'last_entry_id', 'taken_at'],
+        sa.select(
+            account.c.id,
+            sa.func.coalesce(account.c.balance, 0.0),
+            sa.literal(0),
+            sa.literal(datetime.utcnow(), sa.DateTime),
+        ),
+    ))
+
+
+def downgrade():
+    op.drop_table('balance_snapshot')
+    op.drop_index('ix_journal_entry_account_id_id', table_name='journal_entry')
+    op.drop_index('ix_journal_entry_posting_ref', table_name='journal_entry')
+    op.drop_table('journal_entry')
@@ -0,0 +1,25 @@
+"""Index transaction (timestamp, id) for date-bounded staff search
+
+Revision ID: 6f1d3b8e9a27
+Revises: 4c8e2b7d1f60
+Create Date: 2026-10-19 09:12:40.318274
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1d3b8e9a27'
+down_revision = '4c8e2b7d1f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index('ix_transaction_timestamp', table_name='transaction')
+    op.create_index('ix_transaction_timestamp_id', 'transaction', ['timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_transaction_timestamp_id', table_name='transaction')
+    op.create_index('ix_transaction_timestamp', 'transaction', ['timestamp'], unique=False)
@@ -0,0 +1,23 @@
+"""Index transaction history by (user_id, id)
+
+Revision ID: 8d3f0b6e2a91
+Revises: 5b2e9a7c41d8
+Create Date: 2026-10-18 12:26:05.118342
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3f0b6e2a91'
+down_revision = '5b2e9a7c41d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_transaction_user_id_id', 'transaction', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_transaction_user_id_id', table_name='transaction')
@@ -0,0 +1,38 @@
+"""Locked savings amount on account
+
+Revision ID: 9b4d6e1f3a58
+Revises: 3e5f1a8c2b47
+Create Date: 2026-10-18 19:12:40.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4d6e1f3a58'
+down_revision = '3e5f1a8c2b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('account') as batch_op:
+        batch_op.add_column(sa.Column('locked_amount', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('locked_until', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_account_locked_until', ['locked_until'], unique=False)
+
+    # Locks start out due for everyone with a saving goal, so the first
+    # `flask goals advance-locks` (or that customer's next withdrawal)
+    # computes them
+    op.execute(
+        "UPDATE account SET locked_until = '1970-01-01 00:00:00' WHERE user_id IN "
+        "(SELECT user_id FROM financial_goal WHERE saving_mode != 'NONE')"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('account') as batch_op:
+        batch_op.drop_index('ix_account_locked_until')
+        batch_op.drop_column('locked_until')
+        batch_op.drop_column('locked_amount')
@@ -0,0 +1,37 @@
+"""Secondary indexes for the customer and staff queries
+
+Revision ID: c7a19e4d5f02
+Revises: 8d3f0b6e2a91
+Create Date: 2026-10-18 13:40:52.907715
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a19e4d5f02'
+down_revision = '8d3f0b6e2a91'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_user_is_staff', 'user', ['is_staff']),
+    ('ix_account_user_id', 'account', ['user_id']),
+    ('ix_financial_goal_user_id_saving_mode_created_at', 'financial_goal', ['user_id', 'saving_mode', 'created_at']),
+    ('ix_loan_status_id', 'loan', ['status', 'id']),
+    ('ix_loan_user_id_id', 'loan', ['user_id', 'id']),
+    ('ix_spam_report_timestamp', 'spam_report', ['timestamp']),
+    ('ix_spam_report_transaction_id', 'spam_report', ['transaction_id']),
+    ('ix_spam_report_user_id', 'spam_report', ['user_id']),
+    ('ix_spam_report_reported_user_id', 'spam_report', ['reported_user_id']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,60 @@
+"""Goal contribution sweeps
+
+Revision ID: d2a7c5e9f184
+Revises: 9b4d6e1f3a58
+Create Date: 2026-10-18 20:26:05.647193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7c5e9f184'
+down_revision = '9b4d6e1f3a58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('financial_goal') as batch_op:
+        batch_op.add_column(sa.Column('saved_amount', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('next_contribution_at', sa.DateTime(), nullable=True))
+
+    # Existing saving goals are due at the first sweep and keep that rhythm
+    op.execute(
+        "UPDATE financial_goal SET next_contribution_at = CURRENT_TIMESTAMP WHERE saving_mode != 'NONE'"
+    )
+
+    op.create_table('goal_sweep',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('as_of', sa.DateTime(), nullable=False),
+    sa.Column('last_goal_id', sa.Integer(), nullable=False),
+    sa.Column('goals_swept', sa.Integer(), nullable=False),
+    sa.Column('amount_swept', sa.Float(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_goal_sweep_finished_at', 'goal_sweep', ['finished_at'], unique=False)
+
+    op.create_table('goal_sweep_item',
+    sa.Column('sweep_id', sa.Integer(), nullable=False),
+    sa.Column('goal_id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('funded', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('sweep_id', 'goal_id')
+    )
+    op.create_index('ix_goal_sweep_item_account_id', 'goal_sweep_item', ['account_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_goal_sweep_item_account_id', table_name='goal_sweep_item')
+    op.drop_table('goal_sweep_item')
+    op.drop_index('ix_goal_sweep_finished_at', table_name='goal_sweep')
+    op.drop_table('goal_sweep')
+    with op.batch_alter_table('financial_goal') as batch_op:
+        batch_op.drop_column('next_contribution_at')
+        batch_op.drop_column('saved_amount')
@@ -0,0 +1,37 @@
+"""Monthly account summary rollup
+
+Revision ID: e41b7c9a3d66
+Revises: c7a19e4d5f02
+Create Date: 2026-10-18 14:51:30.662184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b7c9a3d66'
+down_revision = 'c7a19e4d5f02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('monthly_account_summary',
+    sa.Column('account_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('deposit_total', sa.Float(), nullable=False),
+    sa.Column('deposit_count', sa.Integer(), nullable=False),
+    sa.Column('withdrawal_total', sa.Float(), nullable=False),
+    sa.Column('withdrawal_count', sa.Integer(), nullable=False),
+    sa.Column('transfer_in_total', sa.Float(), nullable=False),
+    sa.Column('transfer_in_count', sa.Integer(), nullable=False),
+    sa.Column('transfer_out_total', sa.Float(), nullable=False),
+    sa.Column('transfer_out_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('account_id', 'month')
+    )
+    # Populate it with `flask rollups backfill` once the app is deployed
+
+
+def downgrade():
+    op.drop_table('monthly_account_summary')
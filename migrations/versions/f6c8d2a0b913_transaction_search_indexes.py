@@ -0,0 +1,37 @@
+"""Indexes for transaction search
+
+Revision ID: f6c8d2a0b913
+Revises: e41b7c9a3d66
+Create Date: 2026-10-18 15:58:44.203671
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6c8d2a0b913'
+down_revision = 'e41b7c9a3d66'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_transaction_user_id_type_id', 'transaction', ['user_id', 'type', 'id'], unique=False)
+    op.create_index('ix_transaction_type_id', 'transaction', ['type', 'id'], unique=False)
+    op.create_index('ix_transaction_recipient_account_id', 'transaction', ['recipient_account', 'id'], unique=False)
+    op.create_index('ix_transaction_timestamp', 'transaction', ['timestamp'], unique=False)
+    # Partial: only the few flagged rows are indexed
+    op.create_index('ix_transaction_reported_id', 'transaction', ['id'], unique=False,
+                    sqlite_where=sa.text('reported = 1'), postgresql_where=sa.text('reported'))
+    op.create_index('ix_transaction_is_fraud_id', 'transaction', ['id'], unique=False,
+                    sqlite_where=sa.text('is_fraud = 1'), postgresql_where=sa.text('is_fraud'))
+
+
+def downgrade():
+    op.drop_index('ix_transaction_is_fraud_id', table_name='transaction')
+    op.drop_index('ix_transaction_reported_id', table_name='transaction')
+    op.drop_index('ix_transaction_timestamp', table_name='transaction')
+    op.drop_index('ix_transaction_recipient_account_id', table_name='transaction')
+    op.drop_index('ix_transaction_type_id', table_name='transaction')
+    op.drop_index('ix_transaction_user_id_type_id', table_name='transaction')
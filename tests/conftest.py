@@ -0,0 +1,48 @@
+import pytest
+
+from app import create_app, db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+        "FACE_INDEX_BACKEND": "exact",
+        "FACE_STORE_DIR": str(tmp_path / "face_store"),
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def make_customer(app):
+    """Factory for a customer with an account; returns (user id, account id)."""
+    from app.models import Account, User
+
+    def make(name, balance=0.0):
+        user = User(username=name, email=f"{name}@example.com")
+        user.set_password("password")
+        db.session.add(user)
+        db.session.flush()
+        account = Account(user_id=user.id, account_number=f"{name.upper()}001", balance=balance)
+        db.session.add(account)
+        db.session.commit()
+        return user.id, account.id
+    return make
+
+
+@pytest.fixture
+def login(app):
+    """Test client logged in as the given user id."""
+    def client_for(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+            session["_fresh"] = True
+        return client
+    return client_for
@@ -0,0 +1,80 @@
+import pytest
+
+from app import account_numbers, db
+from app.account_numbers import FIRST_SERIAL, is_valid, luhn_digit, sequences
+from app.models import Account, User
+
+
+@pytest.fixture
+def allocator(app, monkeypatch):
+    # The module's allocator, which the session events are hooked up to
+    allocator = account_numbers.allocator
+    for name, value in (("block_size", 3), ("_next", 0), ("_end", 0), ("_pid", None), ("_owner", None)):
+        monkeypatch.setattr(allocator, name, value)
+    return allocator
+
+
+def next_value():
+    return db.session.execute(db.select(sequences.c.next_value)).scalar()
+
+
+def serial(number):
+    return int(number[:-1])
+
+
+def test_luhn_check_digit():
+    assert luhn_digit("7992739871") == "3"
+    assert is_valid("79927398713")
+    assert not is_valid("79927398710")
+    assert not is_valid("7992739871")
+    assert not is_valid("SB12345678X")
+    number = f"{FIRST_SERIAL}{luhn_digit(str(FIRST_SERIAL))}"
+    assert is_valid(number)
+    # Any single changed digit is caught
+    for i in range(len(number)):
+        changed = number[:i] + str((int(number[i]) + 1) % 10) + number[i + 1:]
+        assert not is_valid(changed)
+
+
+def test_blocks_roll_over(allocator):
+    numbers = [allocator.next() for _ in range(7)]
+    db.session.commit()
+
+    assert [serial(n) for n in numbers] == list(range(FIRST_SERIAL, FIRST_SERIAL + 7))
+    assert all(is_valid(n) for n in numbers)
+    # Three blocks of three reserved
+    assert next_value() == FIRST_SERIAL + 9
+
+
+def test_a_new_process_reserves_its_own_block(allocator, monkeypatch):
+    first = allocator.next()
+    db.session.commit()
+    monkeypatch.setattr(account_numbers.os, "getpid", lambda: -1)
+    forked = allocator.next()
+    db.session.commit()
+
+    assert serial(forked) == serial(first) + 3
+    assert next_value() == FIRST_SERIAL + 6
+
+
+def test_allocating_after_a_flush_in_the_same_transaction(app):
+    # Creating the account through the column default, after the user row
+    # was written in the same transaction
+    user = User(username="alice", email="alice@example.com", password_hash="x")
+    db.session.add(user)
+    db.session.flush()
+    account = Account(user_id=user.id)
+    db.session.add(account)
+    db.session.commit()
+    assert is_valid(account.account_number)
+
+
+def test_a_rolled_back_block_is_given_up(allocator):
+    rolled_back = allocator.next()
+    db.session.rollback()
+    assert next_value() is None
+
+    number = allocator.next()
+    db.session.commit()
+    assert number == rolled_back
+    assert allocator.next() != number
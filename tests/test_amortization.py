@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from app import amortization
+from app.amortization import QuoteError, emi, parse_terms, pricing_grid, quote, quotes, schedules
+
+TERMS = [(100000.0, 10.5, 60), (2500.0, 0.0, 7), (1.0, 100.0, 1), (750000.0, 8.25, 600), (999.99, 0.01, 13)]
+
+
+def reference_emi(principal, rate, tenure):
+    r = rate / 1200.0
+    if r == 0:
+        return principal / tenure
+    return principal * r * (1 + r) ** tenure / ((1 + r) ** tenure - 1)
+
+
+def reference_schedule(principal, rate, tenure):
+    """(payment, interest, principal, balance) per month, month by month."""
+    r = rate / 1200.0
+    payment = reference_emi(principal, rate, tenure)
+    balance, rows = principal, []
+    for month in range(1, tenure + 1):
+        interest = balance * r
+        paid = balance if month == tenure else payment - interest
+        balance -= paid
+        rows.append((paid + interest, interest, paid, balance))
+    return rows
+
+
+@pytest.mark.parametrize("principal, rate, tenure", TERMS)
+def test_emi_matches_the_scalar_formula(principal, rate, tenure):
+    assert float(emi(principal, rate, tenure)) == pytest.approx(reference_emi(principal, rate, tenure), rel=1e-12)
+
+
+def test_pricing_grid_is_emi_of_every_pair():
+    rates, tenures = [0.0, 7.5, 12.0], [12, 36, 240, 600]
+    grid = pricing_grid(50000, rates, tenures)
+    assert grid.shape == (3, 4)
+    for i, rate in enumerate(rates):
+        for j, tenure in enumerate(tenures):
+            assert grid[i, j] == pytest.approx(reference_emi(50000, rate, tenure), rel=1e-12)
+
+
+def test_schedules_match_the_month_by_month_loop():
+    principal, rate, tenure = (np.array(column) for column in zip(*TERMS))
+    payment, interest, principal_paid, balance = schedules(principal, rate, tenure)
+    assert payment.shape == (len(TERMS), 600)
+
+    for row, terms in enumerate(TERMS):
+        n = terms[2]
+        expected = np.array(reference_schedule(*terms))
+        for column, values in enumerate((payment, interest, principal_paid, balance)):
+            assert values[row, :n] == pytest.approx(expected[:, column], rel=1e-9, abs=1e-6)
+            assert not values[row, n:].any()
+        assert principal_paid[row].sum() == pytest.approx(terms[0], rel=1e-12)
+
+
+def test_quotes_match_quote(app):
+    amortization._cached_quote = None
+    assert quotes(TERMS) == [quote(*terms) for terms in TERMS]
+    assert quotes([]) == []
+
+
+@pytest.mark.parametrize("args", [("x", 10, 12), (0, 10, 12), (1000, 101, 12), (1000, 10, 0), (1000, 10, 601)])
+def test_parse_terms_refuses_bad_input(args):
+    with pytest.raises(QuoteError):
+        parse_terms(*args)
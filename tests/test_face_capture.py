@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+import pytest
+
+from app import face_capture
+from app.face_capture import FaceCaptureEngine
+
+
+@pytest.fixture
+def frames(tmp_path):
+    """A directory of 20 blank frames, read by ImageDirectorySource."""
+    for i in range(20):
+        cv2.imwrite(str(tmp_path / f"{i:03}.png"), np.zeros((40, 40, 3), dtype=np.uint8))
+    return str(tmp_path)
+
+
+class StillTracker:
+    def init(self, frame, box):
+        self.box = box
+
+    def update(self, frame):
+        return True, self.box
+
+
+def test_empty_scene_only_detects_on_schedule(frames, monkeypatch):
+    engine = FaceCaptureEngine(detect_every=5, scale=0.5, display=False)
+    monkeypatch.setattr(engine, "_detect", lambda small_rgb: None)
+
+    assert engine.run(frames) is None
+    assert engine.stats["frames"] == 20
+    assert engine.stats["detections"] == 4
+    assert engine.stats["skipped"] == 16
+    assert engine.stats["tracked"] == engine.stats["encodings"] == 0
+
+
+def test_tracked_face_is_encoded_once_steady(frames, monkeypatch):
+    engine = FaceCaptureEngine(detect_every=5, scale=0.5, stable_frames=3, display=False)
+    monkeypatch.setattr(engine, "_detect", lambda small_rgb: (5, 5, 10, 10))
+    monkeypatch.setattr(engine, "_encode", lambda frame, box: ("encoding", box))
+    monkeypatch.setattr(face_capture.cv2, "TrackerMIL_create", StillTracker)
+
+    assert engine.run(frames) == ("encoding", (5, 5, 10, 10))
+    assert engine.stats["frames"] == 4
+    assert (engine.stats["detections"], engine.stats["tracked"], engine.stats["encodings"]) == (1, 3, 1)
+
+
+def test_iou():
+    assert face_capture._iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert face_capture._iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(50 / 150)
+    assert face_capture._iou((0, 0, 10, 10), (20, 20, 5, 5)) == 0.0
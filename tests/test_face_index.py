@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+from app import db
+from app.face_codec import encode_face
+from app.face_index import ExactSearch, FaceIndex, IVFSearch, measure_recall
+from app.models import User
+
+
+def enrol(encodings, start=0):
+    db.session.execute(User.__table__.insert(), [
+        dict(username=f"u{i}", email=f"u{i}@example.com", password_hash="x", face_encoding=encode_face(e))
+        for i, e in enumerate(encodings, start=start)
+    ])
+    db.session.commit()
+
+
+@pytest.fixture
+def faces():
+    return np.random.default_rng(0).normal(0.0, 0.1, (2000, 128)).astype(np.float32)
+
+
+def test_rebuild_reads_the_user_table_not_the_saved_file(app, tmp_path, faces):
+    path = tmp_path / "index.npz"
+    app.config.update(FACE_INDEX_BACKEND="ivf", FACE_INDEX_PATH=str(path), FACE_INDEX_NLIST=0)
+    enrol(faces[:1500])
+    index = FaceIndex()
+    index.ensure_loaded()
+    assert path.exists()
+    assert index.backend.state()["centroids"].shape[0] > 5
+
+    enrol(faces[1500:], start=1500)
+    app.config["FACE_INDEX_NLIST"] = 5
+    index.rebuild()
+
+    assert len(index) == 2000
+    assert index.backend.state()["centroids"].shape == (5, 128)
+    with np.load(path) as saved:
+        assert saved["centroids"].shape == (5, 128)
+        assert len(saved["ids"]) == 2000
+
+    # A fresh worker restores what the rebuild wrote
+    restored = FaceIndex()
+    restored.ensure_loaded()
+    assert len(restored) == 2000
+    assert restored.backend.state()["centroids"].shape == (5, 128)
+
+
+def test_rebuild_shared_store(app, faces):
+    app.config["FACE_INDEX_BACKEND"] = "shared"
+    enrol(faces[:100])
+    index = FaceIndex()
+    index.ensure_loaded()
+    enrol(faces[100:150], start=100)
+    index.rebuild()
+    assert len(index) == 150
+    assert index.match(faces[120], tolerance=0.01) is not None
+
+
+@pytest.mark.parametrize("backend", ["exact", "ivf", "shared"])
+def test_match_finds_the_enrolled_face(app, faces, backend):
+    app.config["FACE_INDEX_BACKEND"] = backend
+    enrol(faces[:500])
+    index = FaceIndex()
+    user_id = db.session.execute(db.select(User.id).where(User.username == "u42")).scalar()
+    assert index.match(faces[42] + 0.001, tolerance=0.5) == user_id
+    assert index.match(np.full(128, 5.0), tolerance=0.5) is None
+
+
+def test_ivf_recall_against_exact(faces):
+    ids = np.arange(1, len(faces) + 1)
+    ivf = IVFSearch(nlist=20, nprobe=20)
+    ivf.build(ids, faces)
+    # Probing every list is exact search
+    assert measure_recall(ivf, sample_size=200)["recall"] == 1.0
+
+    ivf.nprobe = 4
+    assert measure_recall(ivf, sample_size=200)["recall"] >= 0.9
+
+
+def test_exact_add_and_remove():
+    exact = ExactSearch()
+    vectors = np.eye(128, dtype=np.float32)[:70]
+    for user_id, vector in enumerate(vectors, start=1):
+        exact.add(user_id, vector)
+    assert len(exact) == 70
+    assert exact.search(vectors[65])[0] == 66
+    exact.remove(66)
+    assert len(exact) == 69
+    assert exact.search(vectors[65])[0] != 66
+
+
+@pytest.mark.parametrize("backend", ["exact", "ivf"])
+def test_restore_reconciles_reused_ids(app, tmp_path, faces, backend):
+    app.config.update(FACE_INDEX_BACKEND=backend, FACE_INDEX_PATH=str(tmp_path / "index.npz"))
+    enrol(faces[:300])
+    FaceIndex().ensure_loaded()
+
+    # SQLite gives the next user the deleted user's id
+    deleted = User.query.filter_by(username="u299").one()
+    deleted_id = deleted.id
+    db.session.delete(deleted)
+    db.session.commit()
+    enrol(faces[300:301], start=300)
+    assert User.query.filter_by(username="u300").one().id == deleted_id
+
+    restored = FaceIndex()
+    restored.ensure_loaded()
+    assert restored.match(faces[299], tolerance=0.01) is None
+    assert restored.match(faces[300], tolerance=0.01) == deleted_id
+    assert len(restored) == 300
+
+
+def test_face_login_checks_the_stored_encoding(app, faces, monkeypatch):
+    from app.face_index import face_index
+    from app.face_pool import encoder_pool
+
+    enrol(faces[:10])
+    face_index.reset()
+    face_index.ensure_loaded()
+    # The row changes behind this worker's index (another worker, a reused id)
+    user = User.query.filter_by(username="u3").one()
+    user.face_encoding = encode_face(faces[10])
+    db.session.commit()
+
+    client = app.test_client()
+    monkeypatch.setattr(encoder_pool, "encode", lambda img_bytes: (faces[3], {}))
+    response = client.post("/face_login", data={"face_image": "data:image/jpeg;base64,AAAA"})
+    assert response.headers["Location"].endswith("/login")
+
+    face_index.reset()
+    response = client.post("/face_login", data={"face_image": "data:image/jpeg;base64,AAAA"})
+    assert response.headers["Location"].endswith("/login")
+    monkeypatch.setattr(encoder_pool, "encode", lambda img_bytes: (faces[10], {}))
+    response = client.post("/face_login", data={"face_image": "data:image/jpeg;base64,AAAA"})
+    assert not response.headers["Location"].endswith("/login")
+    face_index.reset()
+
+
+def test_per_process_backends_need_a_single_worker(tmp_path):
+    from app import create_app
+
+    config = {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}", "WEB_WORKERS": 4}
+    for backend in ("exact", "ivf"):
+        with pytest.raises(RuntimeError, match="shared"):
+            create_app({**config, "FACE_INDEX_BACKEND": backend})
+    create_app({**config, "FACE_INDEX_BACKEND": "shared"})
+    create_app({**config, "FACE_INDEX_BACKEND": "exact", "WEB_WORKERS": 1})
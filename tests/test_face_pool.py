@@ -0,0 +1,86 @@
+from concurrent.futures import Future
+
+import pytest
+
+from app import face_pool
+from app.face_pool import EncoderBusy, FaceEncoderPool, pool_size
+
+
+class HeldExecutor:
+    """Stands in for the process pool: jobs start running and finish only
+    when the test says so (or at once with `done`)."""
+
+    def __init__(self, done=False):
+        self.done = done
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self.futures.append(future)
+        if self.done:
+            future.set_result(([0.0] * 128, {"detect": 1.0}))
+        return future
+
+    def finish(self, future):
+        future.set_result((None, {}))
+
+
+def make_pool(executor, max_pending=2, timeout=0.01):
+    pool = FaceEncoderPool()
+    pool.configure(workers=1, max_pending=max_pending, timeout=timeout)
+    pool._get_executor = lambda: executor
+    return pool
+
+
+def test_encode_returns_the_encoding_and_timings():
+    pool = make_pool(HeldExecutor(done=True))
+    encoding, timings = pool.encode(b"jpeg")
+    assert len(encoding) == 128
+    assert timings["detect"] == 1.0
+    assert timings["total"] >= timings["queue"]
+
+
+def test_pending_jobs_are_bounded():
+    executor = HeldExecutor()
+    pool = make_pool(executor, max_pending=2)
+    for _ in range(2):
+        with pytest.raises(EncoderBusy, match="timed out"):
+            pool.encode(b"jpeg")
+
+    # Both timed-out jobs are still running in the pool and hold their slots
+    with pytest.raises(EncoderBusy, match="saturated"):
+        pool.encode(b"jpeg")
+    assert len(executor.futures) == 2
+
+    executor.finish(executor.futures[0])
+    executor.done = True
+    assert pool.encode(b"jpeg")[0] is not None
+
+
+def test_failed_submit_gives_its_slot_back():
+    class Failing:
+        def submit(self, fn, *args):
+            raise RuntimeError("boom")
+
+    pool = make_pool(Failing(), max_pending=1)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            pool.encode(b"jpeg")
+
+
+def test_pool_size_splits_the_cpus_between_web_workers(monkeypatch):
+    monkeypatch.setattr(face_pool.os, "cpu_count", lambda: 8)
+    assert pool_size({"FACE_POOL_WORKERS": 0, "WEB_WORKERS": 1}) == 8
+    assert pool_size({"FACE_POOL_WORKERS": 0, "WEB_WORKERS": 4}) == 2
+    assert pool_size({"FACE_POOL_WORKERS": 0, "WEB_WORKERS": 16}) == 1
+    assert pool_size({"FACE_POOL_WORKERS": 3, "WEB_WORKERS": 4}) == 3
+
+
+def test_create_app_sizes_the_pool_from_web_concurrency(tmp_path, monkeypatch):
+    from app import create_app
+
+    monkeypatch.setattr(face_pool.os, "cpu_count", lambda: 8)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}"})
+    assert face_pool.encoder_pool._workers == 2
@@ -0,0 +1,64 @@
+import base64
+import sys
+import types
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.face_preprocess import ImageRejected, decode_data_url, encode_face_image
+
+
+def png(width, height):
+    out = BytesIO()
+    Image.new("RGB", (width, height)).save(out, format="PNG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    """face_recognition stand-in: one face at a fixed box of the small
+    image, and the crop and box each encoding was asked for."""
+    calls = {}
+
+    def face_locations(image):
+        calls["detect_shape"] = image.shape
+        return [(60, 200, 140, 120), (0, 10, 10, 0)]
+
+    def face_encodings(image, known_face_locations):
+        calls["crop_shape"], calls["locations"] = image.shape, known_face_locations
+        return [np.ones(128)]
+
+    module = types.SimpleNamespace(face_locations=face_locations, face_encodings=face_encodings)
+    monkeypatch.setitem(sys.modules, "face_recognition", module)
+    return calls
+
+
+def test_decode_data_url():
+    data = base64.b64encode(b"image bytes").decode()
+    assert decode_data_url(f"data:image/jpeg;base64,{data}", 100) == b"image bytes"
+    with pytest.raises(ImageRejected, match="too large"):
+        decode_data_url(f"data:image/jpeg;base64,{data}", 4)
+    for bad in ("no comma", "data:image/jpeg;base64,!!!"):
+        with pytest.raises(ImageRejected, match="Malformed"):
+            decode_data_url(bad, 100)
+
+
+def test_detects_small_and_encodes_the_largest_face_crop(detector):
+    encoding, timings = encode_face_image(png(640, 480), detect_size=320)
+
+    assert encoding is not None
+    assert set(timings) == {"decode", "detect", "encode"}
+    assert detector["detect_shape"] == (240, 320, 3)
+    # The largest box, doubled to full size, plus a 25% margin each side
+    assert detector["crop_shape"] == (240, 240, 3)
+    assert detector["locations"] == [(40, 200, 200, 40)]
+
+
+def test_large_images_are_refused_or_shrunk(detector):
+    with pytest.raises(ImageRejected):
+        encode_face_image(png(2000, 2000), max_pixels=1_000_000)
+    encode_face_image(png(2560, 1920), max_side=1280, detect_size=320)
+    assert detector["detect_shape"] == (240, 320, 3)
+    assert detector["crop_shape"] == (480, 480, 3)
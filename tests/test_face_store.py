@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+
+from app.face_store import LEGACY_META, SharedFaceStore
+
+
+def rows(ids):
+    """Vectors whose first component is the user id, to check pairing."""
+    matrix = np.zeros((len(ids), 128), dtype=np.float32)
+    matrix[:, 0] = ids
+    return np.array(ids, dtype=np.int64), matrix
+
+
+def pairs(store):
+    vectors, _, ids, count = store.snapshot()
+    return [(int(i), float(v)) for i, v in zip(ids[:count], vectors[:count, 0]) if i >= 0]
+
+
+def test_append_remove_and_rebuild(tmp_path):
+    store = SharedFaceStore(str(tmp_path))
+    store.rebuild(*rows([1, 2, 3]))
+    store.append(*rows([3, 4]))
+    store.remove(2)
+    assert pairs(store) == [(1, 1.0), (3, 3.0), (4, 4.0)]
+    assert store.max_id() == 4
+
+    store.rebuild(*rows([7, 8]))
+    assert pairs(SharedFaceStore(str(tmp_path))) == [(7, 7.0), (8, 8.0)]
+    # Only the live epoch's files are left
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("ids")) == ["ids.4.i64"]
+
+
+def test_rebuild_publishes_only_through_the_meta(tmp_path, monkeypatch):
+    writer = SharedFaceStore(str(tmp_path))
+    writer.rebuild(*rows([1, 2, 3]))
+    reader = SharedFaceStore(str(tmp_path))
+    vectors, _, ids, _ = reader.snapshot()
+
+    seen = []
+    write_meta = writer._write_meta
+
+    def read_then_write_meta(*args):
+        # A worker that remaps after the data files are written but
+        # before the meta is replaced
+        seen.append(pairs(SharedFaceStore(str(tmp_path))))
+        write_meta(*args)
+
+    monkeypatch.setattr(writer, "_write_meta", read_then_write_meta)
+    writer.rebuild(*rows([5, 6, 7, 8]))
+
+    assert seen == [[(1, 1.0), (2, 2.0), (3, 3.0)]]
+    # Maps of the old epoch stay readable and consistent after it is replaced
+    assert ids.tolist() == vectors[:, 0].tolist() == [1, 2, 3]
+    assert pairs(reader) == [(5, 5.0), (6, 6.0), (7, 7.0), (8, 8.0)]
+
+
+def test_reads_and_rebuilds_a_store_without_epochs(tmp_path):
+    ids, matrix = rows([1, 2])
+    matrix.tofile(tmp_path / "vectors.f32")
+    np.einsum("ij,ij->i", matrix, matrix).astype(np.float32).tofile(tmp_path / "norms.f32")
+    ids.tofile(tmp_path / "ids.i64")
+    (tmp_path / "meta").write_bytes(LEGACY_META.pack(4, 2))
+
+    store = SharedFaceStore(str(tmp_path))
+    assert pairs(store) == [(1, 1.0), (2, 2.0)]
+    store.append(*rows([3]))
+    assert pairs(store) == [(1, 1.0), (2, 2.0), (3, 3.0)]
+
+    store.rebuild(*rows([9]))
+    assert pairs(store) == [(9, 9.0)]
+    assert not (tmp_path / "ids.i64").exists()
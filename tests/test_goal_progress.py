@@ -0,0 +1,112 @@
+import calendar
+import math
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from app.goal_progress import DAILY, MAX_PERIODS, MONTHLY, NONE, WEEKLY, YEARLY, compute
+
+
+def add_months(day, months, day_of_month):
+    year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+    return date(year, month + 1, min(day_of_month, calendar.monthrange(year, month + 1)[1]))
+
+
+def reference(goal, today):
+    """compute() for one goal, the way the old view worked it out."""
+    created = goal["created"] or today
+    mode = goal["mode"]
+    periods, rate = 0, 0.0
+    if mode == DAILY:
+        periods, rate = (today - created).days, goal["daily"]
+    elif mode == WEEKLY:
+        periods, rate = (today - created).days // 7, goal["weekly"]
+    elif mode == MONTHLY:
+        periods, rate = (today.year - created.year) * 12 + today.month - created.month, goal["monthly"]
+    elif mode == YEARLY:
+        periods, rate = today.year - created.year, goal["yearly"]
+    periods = max(periods, 0)
+    target = goal["target"]
+
+    expected = min(rate * periods, target)
+    actual = min(max(goal["saved"] + max(goal["balance"], 0.0), 0.0), target)
+    remaining = target - actual
+
+    projected = None
+    if remaining <= 0:
+        projected = today
+    elif rate > 0 and math.ceil(remaining / rate) <= MAX_PERIODS[mode]:
+        needed = math.ceil(remaining / rate)
+        projected = {
+            DAILY: lambda: today + timedelta(days=needed),
+            WEEKLY: lambda: today + timedelta(weeks=needed),
+            MONTHLY: lambda: add_months(today, needed, today.day),
+            YEARLY: lambda: add_months(today, 12 * needed, today.day),
+        }[mode]()
+
+    next_increase = None
+    if rate > 0 and expected < target:
+        next_increase = {
+            DAILY: today + timedelta(days=1),
+            WEEKLY: created + timedelta(weeks=periods + 1),
+            MONTHLY: add_months(today, 1, 1),
+            YEARLY: date(today.year + 1, 1, 1),
+        }[mode]
+
+    return {
+        "expected": expected,
+        "actual": actual,
+        "shortfall": max(expected - actual, 0.0),
+        "on_track": actual >= expected,
+        "completed": remaining <= 0,
+        "projected": projected,
+        "next_increase": next_increase,
+    }
+
+
+def random_goals(n, today, seed):
+    rng = np.random.default_rng(seed)
+    # Rates of 0 (never), 0.001 (past the century limit) and ordinary ones
+    rates = rng.choice([0.0, 0.001, 1.0, 25.0, 333.33], size=(n, 4))
+    offsets = rng.integers(-3000, 40, n)
+    created = [today + timedelta(days=-int(d)) for d in offsets]
+    created[:1] = [None]
+    return {
+        "id": np.arange(n, dtype=np.int64),
+        "user_id": np.arange(n, dtype=np.int64),
+        "mode": rng.choice([NONE, DAILY, WEEKLY, MONTHLY, YEARLY], n).astype(np.int8),
+        "target": rng.choice([0.0, 100.0, 5000.0, 1e6], n),
+        "daily": rates[:, 0],
+        "weekly": rates[:, 1],
+        "monthly": rates[:, 2],
+        "yearly": rates[:, 3],
+        "saved": rng.choice([0.0, 50.0, 2000.0], n),
+        "created": np.array(created, dtype="datetime64[D]"),
+        "deadline": np.full(n, np.datetime64("NaT"), dtype="datetime64[D]"),
+        "balance": rng.choice([-100.0, 0.0, 40.0, 4000.0], n),
+    }
+
+
+@pytest.mark.parametrize("today", [date(2026, 1, 31), date(2024, 2, 29), date(2026, 12, 15)])
+def test_compute_matches_the_scalar_reference(today):
+    cols = random_goals(2000, today, seed=today.toordinal())
+    result = compute(cols, today)
+
+    for i in range(len(cols["id"])):
+        created = cols["created"][i]
+        goal = {key: values[i].item() for key, values in cols.items() if key != "created"}
+        goal["created"] = None if np.isnat(created) else created.item()
+        expected = reference(goal, today)
+        for key in ("expected", "actual", "shortfall"):
+            assert result[key][i] == pytest.approx(expected[key]), (i, key, goal)
+        for key in ("on_track", "completed"):
+            assert bool(result[key][i]) == expected[key], (i, key, goal)
+        for key in ("projected", "next_increase"):
+            value = result[key][i]
+            assert (None if np.isnat(value) else value.item()) == expected[key], (i, key, goal)
+
+
+def test_compute_handles_no_goals():
+    result = compute(random_goals(0, date(2026, 1, 1), seed=0), date(2026, 1, 1))
+    assert all(len(values) == 0 for values in result.values())
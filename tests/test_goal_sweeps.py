@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, goal_progress, goal_sweeps, ledger, posting
+from app.models import Account, FinancialGoal, GoalSweep, GoalSweepItem, SavingMode, Transaction
+
+AS_OF = datetime(2026, 3, 10, 12, 0)
+
+
+@pytest.fixture
+def customer(make_customer):
+    """Factory for a customer with `balance` deposited; returns (user id, account id)."""
+    def make(name, balance):
+        user_id, account_id = make_customer(name)
+        posting.deposit(account_id, user_id, balance)
+        return user_id, account_id
+    return make
+
+
+def add_goal(user_id, amount=10.0, target=100.0, due=AS_OF - timedelta(hours=1)):
+    goal = FinancialGoal(
+        user_id=user_id, target_amount=target, saving_mode=SavingMode.DAILY, daily_amount=amount,
+        created_at=AS_OF - timedelta(days=3), next_contribution_at=due,
+    )
+    db.session.add(goal)
+    db.session.commit()
+    return goal.id
+
+
+def balance(account_id):
+    db.session.expire_all()
+    return db.session.get(Account, account_id).balance
+
+
+def saved(goal_id):
+    db.session.expire_all()
+    return db.session.get(FinancialGoal, goal_id).saved_amount
+
+
+def test_funded_account_pays_its_goals(app, customer):
+    user_id, account_id = customer("alice", 100)
+    first, second = add_goal(user_id, 10.0), add_goal(user_id, 25.0, target=20.0)
+
+    sweep = goal_sweeps.run(now=AS_OF)
+
+    assert (sweep["goals_swept"], sweep["amount_swept"]) == (2, 30.0)
+    assert (saved(first), saved(second)) == (10.0, 20.0)
+    assert balance(account_id) == 70.0
+    assert db.session.get(FinancialGoal, first).next_contribution_at == AS_OF + timedelta(days=1) - timedelta(hours=1)
+    assert Transaction.query.filter_by(type=goal_sweeps.CONTRIBUTION).count() == 2
+    assert GoalSweepItem.query.count() == 0
+    assert ledger.drift() == []
+
+
+def test_underfunded_account_pays_none_of_its_goals(app, customer):
+    poor, poor_account = customer("alice", 15)
+    rich, rich_account = customer("bob", 100)
+    poor_goals = [add_goal(poor), add_goal(poor)]
+    rich_goal = add_goal(rich)
+
+    sweep = goal_sweeps.run(now=AS_OF)
+
+    assert sweep["goals_swept"] == 1
+    assert [saved(goal_id) for goal_id in poor_goals] == [0.0, 0.0]
+    assert balance(poor_account) == 15.0
+    assert (saved(rich_goal), balance(rich_account)) == (10.0, 90.0)
+    # Missed contributions move on to the next period all the same
+    assert all(
+        db.session.get(FinancialGoal, goal_id).next_contribution_at > AS_OF for goal_id in poor_goals
+    )
+    assert ledger.drift() == []
+
+
+def test_a_failed_chunk_resumes_from_the_checkpoint(app, customer, monkeypatch):
+    user_ids = [customer(name, 100)[0] for name in ("alice", "bob", "carol")]
+    goal_ids = [add_goal(user_id) for user_id in user_ids]
+    refresh_locks = goal_progress.refresh_locks
+    calls = []
+
+    def fail_on_second_chunk(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError("worker killed")
+        refresh_locks(*args)
+
+    monkeypatch.setattr(goal_progress, "refresh_locks", fail_on_second_chunk)
+    with pytest.raises(RuntimeError):
+        goal_sweeps.run(chunk_size=1, now=AS_OF)
+
+    interrupted = GoalSweep.query.one()
+    assert (interrupted.last_goal_id, interrupted.finished_at) == (goal_ids[0], None)
+    assert [saved(goal_id) for goal_id in goal_ids] == [10.0, 0.0, 0.0]
+
+    sweep = goal_sweeps.run(chunk_size=1, now=AS_OF + timedelta(hours=6))
+    assert sweep["id"] == interrupted.id
+    assert sweep["as_of"] == AS_OF
+    assert sweep["goals_swept"] == 3
+    assert [saved(goal_id) for goal_id in goal_ids] == [10.0, 10.0, 10.0]
+    assert ledger.drift() == []
+
+
+@pytest.mark.parametrize("behind", [1, 3])
+def test_rerunning_the_same_as_of_posts_nothing(app, customer, behind):
+    user_id, account_id = customer("alice", 100)
+    goal_id = add_goal(user_id, due=AS_OF - timedelta(days=behind - 1, hours=1))
+
+    goal_sweeps.run(now=AS_OF)
+    again = goal_sweeps.run(now=AS_OF)
+
+    assert again["goals_swept"] == 0
+    assert saved(goal_id) == 10.0
+    assert balance(account_id) == 90.0
+    assert db.session.get(FinancialGoal, goal_id).next_contribution_at > AS_OF
+
+
+def test_refund_returns_the_savings(app, customer):
+    user_id, account_id = customer("alice", 100)
+    goal_id = add_goal(user_id)
+    goal_sweeps.run(now=AS_OF)
+
+    goal = db.session.get(FinancialGoal, goal_id)
+    goal_sweeps.refund(goal)
+    db.session.commit()
+
+    assert (saved(goal_id), balance(account_id)) == (0.0, 100.0)
+    assert Transaction.query.filter_by(type=goal_sweeps.REFUND).one().amount == 10.0
+    assert ledger.drift() == []
+    assert ledger.balance_of(account_id) == 100.0
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+from app import db, idempotency
+from app.models import Account, IdempotencyKey, Transaction
+
+
+def balance(account_id):
+    return db.session.get(Account, account_id).balance
+
+
+def test_retry_replays_the_first_response(app, make_customer, login):
+    user_id, account_id = make_customer("alice", 100.0)
+    client = login(user_id)
+    headers = {"Idempotency-Key": "k1"}
+
+    first = client.post("/deposit", data={"amount": 50}, headers=headers)
+    idempotency._cache.clear()  # the retry lands on another worker
+    retry = client.post("/deposit", data={"amount": 50}, headers=headers)
+    again = client.post("/deposit", data={"amount": 50}, headers=headers)
+
+    assert first.status_code == retry.status_code == again.status_code == 302
+    assert retry.headers["Location"] == first.headers["Location"]
+    assert retry.headers["Idempotent-Replayed"] == again.headers["Idempotent-Replayed"] == "true"
+    db.session.expire_all()
+    assert balance(account_id) == 150.0
+    assert Transaction.query.count() == 1
+
+
+def test_key_reused_for_a_different_request(app, make_customer, login):
+    user_id, account_id = make_customer("alice", 100.0)
+    client = login(user_id)
+    client.post("/deposit", data={"amount": 50}, headers={"Idempotency-Key": "k1"})
+    response = client.post("/deposit", data={"amount": 60}, headers={"Idempotency-Key": "k1"})
+    assert response.status_code == 422
+    db.session.expire_all()
+    assert balance(account_id) == 150.0
+
+
+def test_request_still_in_progress(app, make_customer, login):
+    user_id, account_id = make_customer("alice", 100.0)
+    with app.test_request_context("/deposit", method="POST", data={"amount": 1}):
+        request_hash = idempotency._request_hash()
+    # Reserved by the same request, still running elsewhere
+    db.session.add(IdempotencyKey(
+        user_id=user_id, key="busy", endpoint="main.deposit", request_hash=request_hash,
+        created_at=datetime.utcnow(),
+    ))
+    db.session.commit()
+    response = login(user_id).post("/deposit", data={"amount": 1}, headers={"Idempotency-Key": "busy"})
+    assert response.status_code == 409
+    db.session.expire_all()
+    assert balance(account_id) == 100.0
+
+
+def test_replay_does_not_extend_the_cached_lifetime(app, make_customer, login):
+    app.config["IDEMPOTENCY_TTL"] = 60
+    user_id, account_id = make_customer("alice", 100.0)
+    client = login(user_id)
+    client.post("/deposit", data={"amount": 50}, headers={"Idempotency-Key": "k1"})
+
+    # The key was created 50 of its 60 seconds ago
+    db.session.execute(db.update(IdempotencyKey).values(created_at=datetime.utcnow() - timedelta(seconds=50)))
+    db.session.commit()
+    idempotency._cache.clear()
+    client.post("/deposit", data={"amount": 50}, headers={"Idempotency-Key": "k1"})
+    expires, _ = idempotency._cache._data[(user_id, "k1")]
+    assert expires - idempotency.time.monotonic() <= 10
+
+    # Once the row has expired, the same key is a new request
+    db.session.execute(db.update(IdempotencyKey).values(created_at=datetime.utcnow() - timedelta(seconds=61)))
+    db.session.commit()
+    idempotency._cache.clear()
+    response = client.post("/deposit", data={"amount": 50}, headers={"Idempotency-Key": "k1"})
+    assert "Idempotent-Replayed" not in response.headers
+    db.session.expire_all()
+    assert balance(account_id) == 200.0
+
+
+def test_abandoned_reservation_is_taken_over(app, make_customer, login):
+    user_id, account_id = make_customer("alice", 100.0)
+    with app.test_request_context("/deposit", method="POST", data={"amount": 1}):
+        request_hash = idempotency._request_hash()
+    # Reserved by a worker that was killed before it stored a response
+    db.session.add(IdempotencyKey(
+        user_id=user_id, key="orphan", endpoint="main.deposit", request_hash=request_hash,
+        created_at=datetime.utcnow() - timedelta(seconds=app.config["IDEMPOTENCY_LOCK_TIMEOUT"] + 1),
+    ))
+    db.session.commit()
+    client = login(user_id)
+
+    first = client.post("/deposit", data={"amount": 1}, headers={"Idempotency-Key": "orphan"})
+    retry = client.post("/deposit", data={"amount": 1}, headers={"Idempotency-Key": "orphan"})
+
+    assert first.status_code == retry.status_code == 302
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    db.session.expire_all()
+    assert balance(account_id) == 101.0
+    assert db.session.get(IdempotencyKey, (user_id, "orphan")).status_code == 302
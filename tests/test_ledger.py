@@ -0,0 +1,51 @@
+import pytest
+
+from app import db, ledger, posting
+from app.models import Account
+
+
+def test_unbalanced_postings_are_refused(app):
+    with pytest.raises(ledger.UnbalancedPosting):
+        ledger.append("Deposit", [(1, 10.0), (None, -9.0)])
+
+
+def test_compaction_keeps_every_balance(app, make_customer):
+    alice, alice_account = make_customer("alice")
+    bob, bob_account = make_customer("bob")
+    posting.deposit(alice_account, alice, 100)
+    posting.transfer(alice, "BOB001", 40)
+
+    assert ledger.compact(chunk_size=1) == 2
+    posting.withdraw(bob_account, bob, 15)
+
+    assert ledger.balance_of(alice_account) == 60.0
+    assert ledger.balance_of(bob_account) == 25.0
+    assert ledger.compact() == 2
+    assert ledger.balance_of(bob_account) == 25.0
+    assert ledger.drift() == []
+
+
+def test_drift_lists_balances_changed_outside_the_journal(app, make_customer):
+    alice, alice_account = make_customer("alice")
+    posting.deposit(alice_account, alice, 100)
+    db.session.get(Account, alice_account).balance = 150.0
+    db.session.commit()
+
+    assert ledger.drift() == [(alice_account, 150.0, 100.0)]
+
+
+@pytest.mark.parametrize("delete_url", ["/profile/delete", "/customer/delete_account"])
+def test_closing_an_account_zeroes_its_id(app, make_customer, login, delete_url):
+    alice, alice_account = make_customer("alice")
+    posting.deposit(alice_account, alice, 700)
+    ledger.compact()
+    login(alice).post(delete_url)
+
+    # SQLite gives the next account the deleted one's id
+    _, bob_account = make_customer("bob")
+    assert bob_account == alice_account
+    assert ledger.balance_of(bob_account) == 0.0
+    assert ledger.drift() == []
+    # The closed account's history stays in the journal
+    kinds = db.session.execute(db.select(ledger.journal.c.kind).where(ledger.journal.c.account_id == alice_account))
+    assert sorted(kinds.scalars()) == ["Close", "Deposit"]
@@ -0,0 +1,56 @@
+from app import db, ledger, posting
+from app.models import Account, Transaction
+from app.payouts import parse_csv, run_payouts
+
+
+def balance(account_id):
+    db.session.expire_all()
+    return db.session.get(Account, account_id).balance
+
+
+def test_parse_csv_skips_the_header_and_blank_lines():
+    text = "recipient_account,amount\nBOB001, 10\n\n CAROL001 ,2.5\n"
+    assert parse_csv(text) == [("BOB001", "10"), ("CAROL001", "2.5")]
+
+
+def test_payouts_post_every_valid_row(app, make_customer):
+    alice, alice_account = make_customer("alice")
+    _, bob_account = make_customer("bob")
+    _, carol_account = make_customer("carol")
+    posting.deposit(alice_account, alice, 100)
+
+    results = run_payouts(alice, [("BOB001", "10"), ("CAROL001", "5"), ("BOB001", "2.5"), ("NOBODY", "1"), ("BOB001", "-1")])
+
+    assert [r["status"] for r in results] == ["posted", "posted", "posted", "rejected", "rejected"]
+    assert [r["message"] for r in results[3:]] == ["Invalid recipient.", "Invalid amount."]
+    assert (balance(alice_account), balance(bob_account), balance(carol_account)) == (82.5, 12.5, 5.0)
+    assert Transaction.query.filter_by(type="Transfer Sent").count() == 3
+    assert ledger.drift() == []
+
+
+def test_payouts_the_sender_cannot_cover_post_nothing(app, make_customer):
+    alice, alice_account = make_customer("alice")
+    _, bob_account = make_customer("bob")
+    posting.deposit(alice_account, alice, 10)
+
+    results = run_payouts(alice, [("BOB001", "6"), ("BOB001", "6")])
+
+    assert {r["status"] for r in results} == {"rejected"}
+    assert results[0]["message"] == "Insufficient balance."
+    assert (balance(alice_account), balance(bob_account)) == (10.0, 0.0)
+    assert Transaction.query.count() == 1
+    assert ledger.drift() == []
+
+
+def test_payouts_to_a_reused_cached_id_post_nothing(app, make_customer):
+    alice, alice_account = make_customer("alice")
+    _, bob_account = make_customer("bob")
+    posting.deposit(alice_account, alice, 100)
+    run_payouts(alice, [("BOB001", "10")])  # caches BOB001 -> bob_account
+    db.session.get(Account, bob_account).account_number = "BOB002"
+    db.session.commit()
+
+    results = run_payouts(alice, [("BOB001", "10")])
+
+    assert results[0]["status"] == "rejected"
+    assert (balance(alice_account), balance(bob_account)) == (90.0, 10.0)
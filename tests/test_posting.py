@@ -0,0 +1,73 @@
+import pytest
+
+from app import db, ledger, posting
+from app.models import Account, Transaction
+
+
+def balance(account_id):
+    db.session.expire_all()
+    return db.session.get(Account, account_id).balance
+
+
+@pytest.fixture
+def accounts(make_customer):
+    alice, alice_account = make_customer("alice")
+    bob, bob_account = make_customer("bob")
+    posting.deposit(alice_account, alice, 100)
+    return alice, alice_account, bob, bob_account
+
+
+def test_withdraw_refuses_an_overdraft(app, accounts):
+    alice, alice_account, _, _ = accounts
+    with pytest.raises(posting.InsufficientFunds):
+        posting.withdraw(alice_account, alice, 100.01)
+    posting.withdraw(alice_account, alice, 100)
+    assert balance(alice_account) == 0.0
+    assert [tx.type for tx in Transaction.query.order_by(Transaction.id)] == ["Deposit", "Withdraw"]
+
+
+def test_withdraw_leaves_locked_savings_behind(app, accounts):
+    alice, alice_account, _, _ = accounts
+    db.session.get(Account, alice_account).locked_amount = 60.0
+    db.session.commit()
+
+    with pytest.raises(posting.SavingsLocked):
+        posting.withdraw(alice_account, alice, 50)
+    posting.withdraw(alice_account, alice, 40)
+    assert balance(alice_account) == 60.0
+
+
+def test_transfer_moves_money_both_ways_or_not_at_all(app, accounts):
+    alice, alice_account, bob, bob_account = accounts
+    assert posting.transfer(alice, "BOB001", 30) == "BOB001"
+    with pytest.raises(posting.InsufficientFunds):
+        posting.transfer(alice, "BOB001", 80)
+    with pytest.raises(posting.AccountNotFound):
+        posting.transfer(alice, "NOBODY", 10)
+
+    assert (balance(alice_account), balance(bob_account)) == (70.0, 30.0)
+    assert Transaction.query.filter_by(type="Transfer Received", user_id=bob).count() == 1
+
+
+def test_transfer_to_a_reused_cached_id_is_refused(app, accounts):
+    alice, alice_account, _, bob_account = accounts
+    posting.transfer(alice, "BOB001", 10)  # caches BOB001 -> bob_account
+    db.session.get(Account, bob_account).account_number = "BOB002"
+    db.session.commit()
+
+    with pytest.raises(posting.AccountNotFound):
+        posting.transfer(alice, "BOB001", 10)
+    assert balance(alice_account) == 90.0
+
+
+def test_balances_agree_with_the_journal(app, accounts):
+    alice, alice_account, bob, bob_account = accounts
+    posting.transfer(alice, "BOB001", 25)
+    posting.withdraw(bob_account, bob, 5)
+    with pytest.raises(posting.InsufficientFunds):
+        posting.withdraw(alice_account, alice, 1000)
+
+    assert ledger.drift() == []
+    assert ledger.balance_of(alice_account) == balance(alice_account) == 75.0
+    assert ledger.balance_of(bob_account) == balance(bob_account) == 20.0
+    assert db.session.execute(db.select(db.func.sum(ledger.journal.c.amount))).scalar() == pytest.approx(0.0)
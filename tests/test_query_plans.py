@@ -0,0 +1,30 @@
+import pytest
+
+from app import query_plans
+
+
+@pytest.mark.parametrize("name", sorted(query_plans.hot_queries()))
+def test_hot_query_uses_an_index(app, name):
+    results = query_plans.check(query_plans.hot_queries()[name])
+    assert results, "the hot path issued no statements"
+    for sql, plan, scans in results:
+        assert not scans, f"{sql}\n" + "\n".join(plan)
+
+
+def test_full_scan_detection(app):
+    assert query_plans._is_full_scan("SCAN transaction")
+    assert query_plans._is_full_scan("USE TEMP B-TREE FOR ORDER BY")
+    assert not query_plans._is_full_scan("SCAN transaction USING INDEX ix_transaction_type_id")
+    assert not query_plans._is_full_scan("SEARCH account USING INDEX ix_account_user_id (user_id=?)")
+    assert not query_plans._is_full_scan("SCAN anon_1")
+
+
+@pytest.mark.parametrize("args", [{}, {"min_amount": "100"}, {"reported": "0"}, {"fraud": "0", "max_amount": "5"}])
+def test_staff_search_without_an_indexed_filter_is_refused(app, args):
+    from werkzeug.datastructures import MultiDict
+
+    from app import search
+    from app.models import Transaction
+
+    with pytest.raises(ValueError, match="needs a date range"):
+        search.search_page(Transaction.query, MultiDict(args), everyone=True)
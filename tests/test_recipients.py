@@ -0,0 +1,27 @@
+import pytest
+
+from app import db, payouts, posting, recipients
+from app.models import Account
+
+
+def test_stale_cached_recipient_is_not_credited_to_a_reused_id(app, make_customer):
+    alice, alice_account = make_customer("alice", 100.0)
+    _, bob_account = make_customer("bob")
+    assert recipients.resolve("BOB001").account_id == bob_account
+
+    # Another worker closes Bob's account; SQLite gives its id to the next one
+    db.session.execute(db.delete(Account).where(Account.id == bob_account))
+    db.session.commit()
+    _, carol_account = make_customer("carol")
+    assert carol_account == bob_account
+
+    with pytest.raises(posting.AccountNotFound, match="Invalid recipient"):
+        posting.transfer(alice, "BOB001", 10)
+    results = payouts.run_payouts(alice, [("BOB001", 10)])
+    assert results[0]["status"] == "rejected"
+
+    db.session.expire_all()
+    assert db.session.get(Account, carol_account).balance == 0.0
+    assert db.session.get(Account, alice_account).balance == 100.0
+    # The stale entry is gone, so the next lookup misses
+    assert recipients.resolve("BOB001") is None
@@ -0,0 +1,18 @@
+import pytest
+
+from app import posting, rollups
+
+
+@pytest.mark.parametrize("delete_url", ["/profile/delete", "/customer/delete_account"])
+def test_a_reused_account_id_starts_without_summaries(app, make_customer, login, delete_url):
+    alice, alice_account = make_customer("alice")
+    posting.deposit(alice_account, alice, 700)
+    assert rollups.account_months(alice_account)[0].deposit_total == 700.0
+
+    login(alice).post(delete_url)
+    # SQLite gives the next account the deleted one's id
+    bob, bob_account = make_customer("bob")
+    assert bob_account == alice_account
+
+    assert rollups.account_months(bob_account) == []
+    assert b"700.00" not in login(bob).get("/summary").data
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from werkzeug.datastructures import MultiDict
+
+from app import db, search
+from app.models import Transaction
+
+
+def test_staff_date_search_pages_newest_first(app):
+    app.config["TRANSACTIONS_PAGE_SIZE"] = 4
+    start = datetime(2026, 1, 1)
+    # Out of id order, with ties on the timestamp
+    stamps = [start + timedelta(hours=hour) for hour in (5, 1, 3, 3, 9, 0, 3, 7, 2, 30, 3)]
+    db.session.add_all(Transaction(type="Deposit", amount=1.0, user_id=1, timestamp=stamp) for stamp in stamps)
+    db.session.commit()
+
+    seen, before = [], None
+    while True:
+        args = {"start": "2026-01-01", "end": "2026-01-01"}
+        if before:
+            args["before"] = str(before)
+        page = search.search_page(Transaction.query, MultiDict(args), everyone=True)
+        seen += [(tx.timestamp, tx.id) for tx in page["transactions"]]
+        before = page["next_cursor"]
+        if before is None:
+            break
+
+    expected = sorted(((stamp, i) for i, stamp in enumerate(stamps, start=1) if stamp.day == 1), reverse=True)
+    assert seen == expected
+    assert page["count"] == 10
+
+
+def test_customer_search_keeps_id_order(app):
+    db.session.add_all([
+        Transaction(type="Deposit", amount=5.0, user_id=1, timestamp=datetime(2026, 1, 2)),
+        Transaction(type="Deposit", amount=5.0, user_id=1, timestamp=datetime(2026, 1, 1)),
+        Transaction(type="Deposit", amount=5.0, user_id=2, timestamp=datetime(2026, 1, 1)),
+    ])
+    db.session.commit()
+    page = search.search_page(Transaction.query.filter_by(user_id=1), MultiDict({"start": "2026-01-01"}))
+    assert [tx.id for tx in page["transactions"]] == [2, 1]
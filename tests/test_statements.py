@@ -0,0 +1,30 @@
+from collections import namedtuple
+from datetime import datetime
+
+from app import db
+from app.models import Transaction, User
+from app.statements import _pdf_text, pdf_statement
+
+Row = namedtuple("Row", "id timestamp type amount recipient_account")
+
+
+def test_pdf_text_fits_latin1():
+    assert _pdf_text("Amount ₹500") == "Amount Rs.500"
+    assert _pdf_text("Śarmā José") == "Sarma José"
+    assert _pdf_text("Анна") == "????"
+
+
+def test_pdf_statement_with_non_latin1_text():
+    rows = [Row(1, datetime(2026, 1, 1), "Transfer – ₹", 10.0, "हि")]
+    document = pdf_statement("Statement for Анна Śarmā", iter(rows), 100)
+    assert document.startswith(b"%PDF")
+
+
+def test_statement_download_for_a_non_latin1_name(app, make_customer, login):
+    user_id, _ = make_customer("anna")
+    db.session.get(User, user_id).username = "Анна ₹"
+    db.session.add(Transaction(type="Deposit", amount=5.0, user_id=user_id, timestamp=datetime(2026, 1, 1)))
+    db.session.commit()
+    response = login(user_id).get("/statement?format=pdf")
+    assert response.status_code == 200
+    assert response.data.startswith(b"%PDF")